@@ -0,0 +1,160 @@
+"""
+Replay an ART cache address trace, captured with se_board.py --art-trace,
+through a space of ART cache configurations in one pass, e.g.
+
+    python3 art_replay.py --trace m5out/art_icache.trc.gz \
+        --regions m5out/regions.jsonl \
+        --sizes 256B,512B,1KiB,2KiB --assocs 1,2,4,8,16,32 \
+        --block-sizes 8,16 --blocks-per-sector 1,2,4 --prefetch on,off
+
+Reports the hit rate and the estimated flash stall cycles of every
+configuration in every measured region. This script runs with the host
+Python and needs NumPy, not gem5.
+"""
+
+import argparse
+import csv
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from cache.replay import ARTConfig, ARTReplay, read_packet_trace, save_trace
+from results.records import read_records
+
+UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 * 1024}
+
+def parse_size(value: str) -> int:
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(value[:-len(unit)]) * UNITS[unit]
+    return int(value, 0)
+
+def parse_list(value: str, parse=int) -> list:
+    return [parse(item) for item in value.split(",") if item]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay an ART cache trace through many cache "
+            "configurations."
+    )
+    parser.add_argument(
+        "--trace", type=str, required=True,
+        help="Packet trace from se_board.py --art-trace, or its .npz form"
+    )
+    parser.add_argument(
+        "--regions", type=str, default=None,
+        help="Region records of the traced run. Without them the whole trace "
+            "is reported as a single region"
+    )
+    parser.add_argument(
+        "--save-npz", type=str, default=None,
+        help="Also save the filtered trace in the compact .npz form, which "
+            "loads much faster than the packet trace"
+    )
+    parser.add_argument(
+        "--flash-start", type=lambda value: int(value, 0), default=0x08000000,
+        help="Start address of the flash, accesses outside it are ignored"
+    )
+    parser.add_argument(
+        "--flash-size", type=str, default="512KiB", help="Size of the flash"
+    )
+    parser.add_argument("--sizes", type=str, default="1KiB")
+    parser.add_argument("--assocs", type=str, default="32")
+    parser.add_argument("--block-sizes", type=str, default="8")
+    parser.add_argument("--blocks-per-sector", type=str, default="4")
+    parser.add_argument(
+        "--prefetch", type=str, default="off", help="on, off or on,off"
+    )
+    parser.add_argument(
+        "--miss-penalty", type=int, default=5,
+        help="Core cycles the pipeline stalls on a flash access, i.e. the "
+            "flash wait states plus one"
+    )
+    parser.add_argument(
+        "--output", type=str, default="art_replay.csv",
+        help="CSV file for the per-region, per-configuration results"
+    )
+    args = parser.parse_args()
+
+    trace = read_packet_trace(Path(args.trace))
+    flash_end = args.flash_start + parse_size(args.flash_size)
+    in_flash = (trace["addrs"] >= args.flash_start) & \
+        (trace["addrs"] < flash_end)
+    trace = {key: value[in_flash] for key, value in trace.items()}
+    if args.save_npz:
+        save_trace(trace, Path(args.save_npz))
+    print(f"Loaded {len(trace['addrs'])} flash accesses")
+
+    regions = np.zeros(len(trace["addrs"]), dtype=np.int64)
+    region_ids = [0]
+    if args.regions:
+        regions[:] = -1
+        region_ids = []
+        for record in read_records(Path(args.regions)):
+            if record.get("begin_tick") in (None, ""):
+                raise ValueError("The region records have no begin_tick and "
+                                 "end_tick, re-run se_board.py.")
+            first, last = np.searchsorted(
+                trace["ticks"],
+                [int(record["begin_tick"]), int(record["end_tick"])]
+            )
+            regions[first:last] = len(region_ids)
+            region_ids.append(int(record["region"]))
+
+    configs = []
+    for size, assoc, block_size, blocks_per_sector, prefetch in \
+            itertools.product(
+                parse_list(args.sizes, parse_size),
+                parse_list(args.assocs),
+                parse_list(args.block_sizes),
+                parse_list(args.blocks_per_sector),
+                parse_list(args.prefetch, lambda value: value == "on"),
+            ):
+        config = ARTConfig(size, assoc, block_size, blocks_per_sector,
+                           prefetch)
+        try:
+            config.validate()
+        except ValueError as error:
+            print(f"Skipping {config.label()}: {error}")
+            continue
+        configs.append(config)
+    if not configs:
+        print("No valid configuration to replay.")
+        return 1
+
+    start = time.monotonic()
+    counts = ARTReplay(configs).run(
+        trace["addrs"].astype(np.int64), regions, len(region_ids)
+    )
+    print(f"Replayed {len(configs)} configuration(s) in "
+          f"{time.monotonic() - start:.1f} s")
+
+    with open(args.output, "w", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow([
+            "region", "size", "assoc", "block_size", "blocks_per_sector",
+            "prefetch", "accesses", "hits", "misses", "hit_rate",
+            "prefetches", "useful_prefetches", "stall_cycles"
+        ])
+        for i, region in enumerate(region_ids):
+            for j, config in enumerate(configs):
+                accesses = counts["accesses"][i, j]
+                misses = counts["misses"][i, j]
+                writer.writerow([
+                    region, config.size, config.assoc, config.block_size,
+                    config.blocks_per_sector,
+                    "on" if config.prefetch else "off",
+                    accesses, counts["hits"][i, j], misses,
+                    counts["hits"][i, j] / accesses if accesses else "",
+                    counts["prefetches"][i, j],
+                    counts["useful_prefetches"][i, j],
+                    misses * args.miss_penalty,
+                ])
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+from m5.objects import (
+    AddrRange,
+    BadAddr,
+    CommMonitor,
+    MemTraceProbe,
+    NoncoherentXBar,
+    Process,
+    SimpleMemory,
+    SrcClockDomain,
+    System,
+    VoltageDomain,
+)
+try:
+    # built into gem5 from gem5-extras
+    from m5.objects import CortexMDMA, CortexMPrivatePeripherals
+except ImportError:
+    CortexMDMA = None
+    CortexMPrivatePeripherals = None
+
+from gem5.components.processors.base_cpu_core import BaseCPUCore
+
+from boards.spec import (
+    CODE_REGION_END,
+    DMA_SIZE,
+    M5OP_SIZE,
+    PPB_SIZE,
+    parse_address,
+)
+from cache.ART import ARTICache, ARTDCache
+from memory.flash import STM32Flash, flash_wait_states
+
+class MCUSystem(System):
+    """
+    The memories, buses and ART caches of an MCU described by a board spec
+    (see boards/spec.py). The cores are attached afterwards with
+    `connect_core()`.
+
+    Like a Cortex-M4, every core has three buses: the I-Code bus behind its
+    ART I-Cache for instruction fetches and the D-Code bus behind its ART
+    D-Cache for loads and stores, both for the code region below
+    0x20000000, and the System bus for everything above it. The buses meet
+    in a bus matrix with one layer per memory, `matrix_<memory>`, which
+    grants the memory to one request at a time and serves the waiting ones
+    in arrival order. Instruction fetches and constant loads from flash so
+    contend for the flash, and the cores of a dual-core part for every
+    memory. Routing is by physical address, so a data alias of a code region
+    memory, like the CCM SRAM at 0x20018000, is still reached through the
+    D-Code bus.
+
+    The DMA controller, `dma`, is a bus master of its own: its `dma_bus`
+    reaches every memory through the matrix, so its bursts contend with the
+    cores for the memory they access. Its completion interrupts go to core
+    0, see `connect_dma_interrupt()`.
+
+    The flash is `flash_memory`, every other memory is a child of the system
+    under its name in the spec. Aliases of a memory, like the data alias of
+    the STM32G4 CCM SRAM, are mapped onto it in the page table by
+    `map_process()`.
+    """
+    def __init__(
+        self, spec: dict, num_cores: int = 1, art_trace: bool = False
+    ):
+        super().__init__()
+        self._spec = spec
+
+        self.clk_domain = SrcClockDomain()
+        self.clk_domain.clock = spec["clock"]
+        voltage_range = spec["voltage_ranges"][spec["voltage_range"]]
+        self.clk_domain.voltage_domain = VoltageDomain(
+            voltage=voltage_range["voltage"]
+        )
+        self.cache_line_size = spec["cache_line_size"]
+
+        # ==== setup memory ranges ====
+        self._flash_range = AddrRange(
+            start=parse_address(spec["flash"]["start"]),
+            size=spec["flash"]["size"]
+        )
+        self._memory_ranges = {}
+        self._alias_ranges = {}
+        for name, memory in spec["memories"].items():
+            self._memory_ranges[name] = AddrRange(
+                start=parse_address(memory["start"]), size=memory["size"]
+            )
+            self._alias_ranges[name] = [
+                AddrRange(start=parse_address(alias), size=memory["size"])
+                for alias in memory["aliases"]
+            ]
+        self._m5op_range = AddrRange(
+            start=parse_address(spec["m5op_base"]), size=M5OP_SIZE
+        )
+        self._ppb_range = AddrRange(
+            start=parse_address(spec["ppb_base"]), size=PPB_SIZE
+        )
+        self._dma_range = AddrRange(
+            start=parse_address(spec["dma"]["base"]), size=DMA_SIZE
+        )
+        # record memory ranges in system
+        self.mem_ranges = [self._flash_range, *self._memory_ranges.values()]
+        # ==== end of memory ranges setup ====
+
+        # ==== setup the memories ====
+        flash = spec["flash"]
+        self._wait_states = flash["wait_states"]
+        if self._wait_states is None:
+            self._wait_states = flash_wait_states(
+                spec["clock"], voltage_range["flash_wait_state_limits_mhz"]
+            )
+        self.flash_memory = STM32Flash(
+            addr_range=self._flash_range,
+            clock=spec["clock"],
+            wait_states=self._wait_states,
+            line_bytes=flash["line_bytes"]
+        )
+        if flash["latency"] is not None:
+            self.flash_memory.latency = flash["latency"]
+        # the ports of the bus matrix slaves, by name
+        slave_ports = {"flash_memory": self.flash_memory.port}
+
+        for name, memory in spec["memories"].items():
+            ram = SimpleMemory(
+                range=self._memory_ranges[name],
+                latency=memory["latency"],
+                bandwidth=memory["bandwidth"]
+            )
+            setattr(self, name, ram)
+            slave_ports[name] = ram.port
+
+        # DWT cycle counter and SysTick, clocked by the core clock, so
+        # firmware can time itself as on the board
+        if CortexMPrivatePeripherals is not None:
+            self.ppb = CortexMPrivatePeripherals(
+                pio_addr=self._ppb_range.start
+            )
+            slave_ports["ppb"] = self.ppb.pio
+        else:
+            print("Warning: gem5 is built without gem5-extras, DWT and "
+                  "SysTick accesses will hit the bad address responder")
+
+        # the DMA controller's channel registers are a System bus slave
+        self._has_dma = False
+        if spec["dma"]["channels"]:
+            if CortexMDMA is not None:
+                self.dma = CortexMDMA(
+                    pio_addr=self._dma_range.start,
+                    channels=spec["dma"]["channels"],
+                    burst_size=spec["dma"]["burst_size"],
+                )
+                slave_ports["dma"] = self.dma.pio
+                self._has_dma = True
+            else:
+                print("Warning: gem5 is built without gem5-extras, the board "
+                      "has no DMA controller")
+        # ==== end of memories setup ====
+
+        # ==== setup the bus matrix ====
+        buses = spec["buses"]
+        # every slave has a layer of the bus matrix in front of it, which
+        # grants the slave to one master at a time and serves the waiting
+        # ones in arrival order
+        self._slaves = {}
+        for name, port in slave_ports.items():
+            layer = NoncoherentXBar(**buses["matrix"])
+            layer.mem_side_ports = port
+            setattr(self, f"matrix_{name}", layer)
+            self._slaves[name] = layer
+        # the flash and the memories in the code region are on the I-Code
+        # and D-Code buses, the other memories and the PPB on the System bus
+        code_slaves = ["flash_memory"] + [
+            name for name, memory in spec["memories"].items()
+            if parse_address(memory["start"]) < CODE_REGION_END
+        ]
+        system_slaves = [
+            name for name in self._slaves if name not in code_slaves
+        ]
+
+        # every core has its own ART I-Cache+prefetcher and D-Cache, they only
+        # cache the flash, on its I-Code and D-Code bus, and its own System
+        # bus. With a single core the lists hold one object each, which gem5
+        # names without an index, e.g. system.icache and system.icode_bus.
+        self._num_cores = num_cores
+        self.icache = [
+            ARTICache(flash_addr_range=self._flash_range, **spec["icache"])
+            for _ in range(num_cores)
+        ]
+        self.dcache = [
+            ARTDCache(flash_addr_range=self._flash_range, **spec["dcache"])
+            for _ in range(num_cores)
+        ]
+        self.icode_bus = [
+            NoncoherentXBar(**buses["icode"]) for _ in range(num_cores)
+        ]
+        self.dcode_bus = [
+            NoncoherentXBar(**buses["dcode"]) for _ in range(num_cores)
+        ]
+        self.system_bus = [
+            NoncoherentXBar(**buses["system"]) for _ in range(num_cores)
+        ]
+        for i in range(num_cores):
+            self.icache[i].mem_side = self.icode_bus[i].cpu_side_ports
+            self.dcache[i].mem_side = self.dcode_bus[i].cpu_side_ports
+            for code_bus in [self.icode_bus[i], self.dcode_bus[i]]:
+                for name in code_slaves:
+                    self._slaves[name].cpu_side_ports = \
+                        code_bus.mem_side_ports
+                # fetches and loads above the code region, e.g. code in
+                # SRAM, leave through the System bus
+                code_bus.default = self.system_bus[i].cpu_side_ports
+            for name in system_slaves:
+                self._slaves[name].cpu_side_ports = \
+                    self.system_bus[i].mem_side_ports
+            # bad address responder so when the CPU accesses an unmapped
+            # address, the simulation will panic
+            self.system_bus[i].badaddr_responder = BadAddr()
+            self.system_bus[i].default = \
+                self.system_bus[i].badaddr_responder.pio
+        # the layers of every bus, numbered in the order its mem-side ports
+        # were connected, the default port last
+        self._bus_layers = {
+            "icode": len(code_slaves) + 1,
+            "dcode": len(code_slaves) + 1,
+            "system": len(system_slaves) + 1,
+        }
+
+        if self._has_dma:
+            # the DMA controller moves data between the memories, its own
+            # registers and the PPB are out of its reach
+            dma_slaves = [
+                name for name in self._slaves if name not in ["ppb", "dma"]
+            ]
+            self.dma_bus = NoncoherentXBar(**buses["system"])
+            self.dma.dma = self.dma_bus.cpu_side_ports
+            for name in dma_slaves:
+                self._slaves[name].cpu_side_ports = \
+                    self.dma_bus.mem_side_ports
+            self.dma_bus.badaddr_responder = BadAddr()
+            self.dma_bus.default = self.dma_bus.badaddr_responder.pio
+            self._bus_layers["dma"] = len(dma_slaves) + 1
+
+        self._icache_ports = [icache.cpu_side for icache in self.icache]
+        self._dcache_ports = [dcache.cpu_side for dcache in self.dcache]
+        if art_trace:
+            # communication monitors between the cores and the ART caches
+            # write every request they see to a compressed packet trace
+            suffixes = [""] if num_cores == 1 else range(num_cores)
+            self.icache_monitor = [
+                CommMonitor(
+                    trace=MemTraceProbe(
+                        trace_file=f"art_icache{suffix}.trc.gz"
+                    )
+                ) for suffix in suffixes
+            ]
+            self.dcache_monitor = [
+                CommMonitor(
+                    trace=MemTraceProbe(
+                        trace_file=f"art_dcache{suffix}.trc.gz"
+                    )
+                ) for suffix in suffixes
+            ]
+            for i in range(num_cores):
+                self.icache_monitor[i].mem_side_port = self.icache[i].cpu_side
+                self._icache_ports[i] = self.icache_monitor[i].cpu_side_port
+                self.dcache_monitor[i].mem_side_port = self.dcache[i].cpu_side
+                self._dcache_ports[i] = self.dcache_monitor[i].cpu_side_port
+
+        # set the system port for functional access from the simulator, the
+        # D-Code bus of core 0 reaches every memory
+        self.system_port = self.dcode_bus[0].cpu_side_ports
+        self.m5ops_base = self._m5op_range.start
+        # ==== end of bus matrix setup ====
+
+    def connect_core(self, core: BaseCPUCore, index: int) -> None:
+        # this part bypasses the cache hierarchy and connects the core to its
+        # ART caches, which only cache flash, and through them to its I-Code
+        # and D-Code buses
+        core.connect_icache(self._icache_ports[index])
+        core.connect_dcache(self._dcache_ports[index])
+        # because Cortex M-class does not have an MMU, the walker ports are
+        # not used. However, we still need to connect them to something, so
+        # we connect them to the System bus due to the tightly coupled nature
+        # of the MinorCPU with the MMU
+        core.connect_walker_ports(
+            self.system_bus[index].cpu_side_ports,
+            self.system_bus[index].cpu_side_ports
+        )
+        core.connect_interrupt()
+
+    def connect_dma_interrupt(self, cores: list[BaseCPUCore]) -> None:
+        """
+        Sends the DMA completion interrupts to the interrupt controller that
+        `connect_core()` set up, of whichever of `cores` is running. With
+        switchable cores, give every core that takes the place of core 0.
+        """
+        if self._has_dma:
+            self.dma.cpus = [core.get_simobject() for core in cores]
+
+    def map_process(self, process: Process) -> None:
+        """
+        Maps the memories, their aliases and the m5op, PPB and DMA register
+        regions.
+        """
+        for name, addr_range in self._memory_ranges.items():
+            process.map(addr_range.start, addr_range.start, addr_range.size())
+            # every alias maps to the same physical memory
+            for alias in self._alias_ranges[name]:
+                process.map(alias.start, addr_range.start, alias.size())
+        process.map(
+            self._m5op_range.start, self._m5op_range.start,
+            self._m5op_range.size()
+        )
+        if CortexMPrivatePeripherals is not None:
+            # device registers must not be cached by the ART D-Cache
+            process.map(
+                self._ppb_range.start, self._ppb_range.start,
+                self._ppb_range.size(), cacheable=False
+            )
+        if self._has_dma:
+            process.map(
+                self._dma_range.start, self._dma_range.start,
+                self._dma_range.size(), cacheable=False
+            )
+
+    def get_placement_regions(self) -> dict[str, list[AddrRange]]:
+        regions = {"flash": [self._flash_range]}
+        for name, addr_range in self._memory_ranges.items():
+            regions[name] = [addr_range, *self._alias_ranges[name]]
+        return regions
+
+    def get_memory_names(self) -> list[str]:
+        return ["flash_memory", *self._memory_ranges]
+
+    def get_bus_layer(self, memory: str) -> str:
+        """
+        Path of the bus matrix layer in front of `memory`. Its occupancy is
+        the time the memory was busy serving any bus.
+        """
+        return f"{self._slaves[memory].path()}.reqLayer0"
+
+    def has_dma(self) -> bool:
+        return self._has_dma
+
+    def get_dma_bus_layers(self) -> list[str]:
+        """
+        Paths of the layers of the DMA controller's bus, their summed
+        occupancy is the time the DMA controller held the bus.
+        """
+        return [
+            f"{self.dma_bus.path()}.reqLayer{layer}"
+            for layer in range(self._bus_layers["dma"])
+        ]
+
+    def get_core_bus_layers(self, index: int) -> dict[str, list[str]]:
+        """
+        Paths of the layers of the I-Code, D-Code and System bus of core
+        `index`. Their summed occupancy is the time the bus was busy.
+        """
+        buses = {
+            "icode": self.icode_bus[index],
+            "dcode": self.dcode_bus[index],
+            "system": self.system_bus[index],
+        }
+        return {
+            name: [
+                f"{bus.path()}.reqLayer{layer}"
+                for layer in range(self._bus_layers[name])
+            ] for name, bus in buses.items()
+        }
+
+    def get_icache(self, index: int) -> ARTICache:
+        return self.icache[index]
+
+    def get_dcache(self, index: int) -> ARTDCache:
+        return self.dcache[index]
+
+    def get_num_cores(self) -> int:
+        return self._num_cores
+
+    def get_wait_states(self) -> int:
+        return self._wait_states
+
+    def get_spec(self) -> dict:
+        return self._spec
@@ -0,0 +1,315 @@
+"""
+Declarative board specs: the memory map, memory timings, bus and ART cache
+geometry of an MCU as a JSON (or, with PyYAML installed, YAML) file.
+
+Presets for the supported parts live next to this module in presets/, a spec
+file anywhere else can be given by path. Every parameter can be overridden
+with a "key.path=value" string, e.g. "memories.sram1.latency=5ns".
+"""
+
+import copy
+import json
+from pathlib import Path
+
+from m5.util.convert import (
+    toFrequency,
+    toLatency,
+    toMemoryBandwidth,
+    toMemorySize,
+    toVoltage,
+)
+
+PRESET_DIR = Path(__file__).resolve().parent / "presets"
+
+class BoardSpecError(ValueError):
+    pass
+
+def parse_address(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not an address")
+    if isinstance(value, int):
+        return value
+    return int(value, 0)
+
+def parse_size(value) -> int:
+    return value if isinstance(value, int) else toMemorySize(value)
+
+def _positive_int(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"{value!r} is not a non-negative integer")
+    return value
+
+def _power_of_two(value) -> int:
+    value = _positive_int(value)
+    if value == 0 or value & (value - 1):
+        raise ValueError(f"{value} is not a power of two")
+    return value
+
+def _flag(value) -> bool:
+    if not isinstance(value, bool):
+        raise ValueError(f"{value!r} is not true or false")
+    return value
+
+def _text(value) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"{value!r} is not a string")
+    return value
+
+def _optional(check):
+    return lambda value: None if value is None else check(value)
+
+def _list_of(check):
+    def checked(value):
+        if not isinstance(value, list):
+            raise ValueError(f"{value!r} is not a list")
+        return [check(item) for item in value]
+    return checked
+
+def _mhz_limits(value) -> list:
+    limits = _list_of(lambda limit: float(limit))(value)
+    if not limits or limits != sorted(limits):
+        raise ValueError("the limits must be a non-empty increasing list")
+    return limits
+
+# width in bytes and latencies in cycles of one bus
+_BUS = {
+    "width": _power_of_two,
+    "frontend_latency": _positive_int,
+    "forward_latency": _positive_int,
+    "response_latency": _positive_int,
+}
+
+# every key a spec may have, with the check of its value. A dict is a nested
+# section, a one-element list a section of named entries of that layout.
+SCHEMA = {
+    "name": _text,
+    "description": _text,
+    "clock": toFrequency,
+    "voltage_range": _text,
+    "voltage_ranges": [{
+        "voltage": toVoltage,
+        # maximum HCLK frequency for 0, 1, 2, ... flash wait states
+        "flash_wait_state_limits_mhz": _mhz_limits,
+    }],
+    "cache_line_size": _power_of_two,
+    "flash": {
+        "start": parse_address,
+        "size": parse_size,
+        "line_bytes": _power_of_two,
+        "wait_states": _optional(_positive_int),
+        "latency": _optional(toLatency),
+    },
+    "memories": [{
+        "start": parse_address,
+        "size": parse_size,
+        "latency": toLatency,
+        "bandwidth": toMemoryBandwidth,
+        "aliases": _list_of(parse_address),
+    }],
+    # the I-Code, D-Code and System buses of every core and the layers of
+    # the bus matrix in front of every memory
+    "buses": {
+        "icode": _BUS,
+        "dcode": _BUS,
+        "system": _BUS,
+        "matrix": _BUS,
+    },
+    "icache": {
+        "size": parse_size,
+        "assoc": _power_of_two,
+        "block_size": _power_of_two,
+        "blocks_per_sector": _power_of_two,
+        "tag_latency": _positive_int,
+        "data_latency": _positive_int,
+        "response_latency": _positive_int,
+        "mshrs": _power_of_two,
+        "tgts_per_mshr": _positive_int,
+        "prefetch": _flag,
+    },
+    "dcache": {
+        "size": parse_size,
+        "assoc": _power_of_two,
+        "tag_latency": _positive_int,
+        "data_latency": _positive_int,
+        "response_latency": _positive_int,
+        "mshrs": _power_of_two,
+        "tgts_per_mshr": _positive_int,
+    },
+    "m5op_base": parse_address,
+    "ppb_base": parse_address,
+    # preset name or path of the power model (see power/model.py) of the
+    # part, null for none
+    "power_model": _optional(_text),
+    # the DMA controller, a bus master of its own on the bus matrix. Zero
+    # channels leave it out.
+    "dma": {
+        "base": parse_address,
+        "channels": _positive_int,
+        "burst_size": _power_of_two,
+    },
+}
+
+# the m5op and private peripheral bus regions are 1 MiB each
+M5OP_SIZE = 1 << 20
+PPB_SIZE = 1 << 20
+# the DMA channel registers, 0x20 bytes per channel
+DMA_SIZE = 0x400
+DMA_CHANNEL_STRIDE = 0x20
+# largest burst the DMA controller buffers
+DMA_MAX_BURST = 256
+# the Cortex-M code region, reached through the I-Code and D-Code buses, ends
+# here. Everything above is reached through the System bus.
+CODE_REGION_END = 0x20000000
+
+# children of the system that a memory name must not shadow
+RESERVED_NAMES = {
+    "flash", "flash_memory", "icode_bus", "dcode_bus", "system_bus",
+    "icache", "dcache", "icache_monitor", "dcache_monitor", "ppb", "dma",
+    "dma_bus",
+    "processor", "workload", "clk_domain",
+}
+
+def presets() -> list[str]:
+    return sorted(path.stem for path in PRESET_DIR.glob("*.json"))
+
+def _read(path: Path) -> dict:
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise BoardSpecError(f"Reading '{path.as_posix()}' needs PyYAML, "
+                                 "use a JSON spec or install it.")
+        with open(path) as f:
+            return yaml.safe_load(f)
+    with open(path) as f:
+        return json.load(f)
+
+def _check_section(spec, schema, where: str) -> None:
+    if not isinstance(spec, dict):
+        raise BoardSpecError(f"{where or 'The spec'} must be a mapping.")
+    unknown = sorted(set(spec) - set(schema))
+    if unknown:
+        raise BoardSpecError(f"Unknown key(s) {', '.join(unknown)} in "
+                             f"{where or 'the spec'}.")
+    missing = sorted(set(schema) - set(spec))
+    if missing:
+        raise BoardSpecError(f"Missing key(s) {', '.join(missing)} in "
+                             f"{where or 'the spec'}.")
+    for key, check in schema.items():
+        path = f"{where}.{key}" if where else key
+        if isinstance(check, dict):
+            _check_section(spec[key], check, path)
+        elif isinstance(check, list):
+            if not isinstance(spec[key], dict) or not spec[key]:
+                raise BoardSpecError(f"{path} must be a non-empty mapping of "
+                                     "named entries.")
+            for name, entry in spec[key].items():
+                _check_section(entry, check[0], f"{path}.{name}")
+        else:
+            try:
+                check(spec[key])
+            except (ValueError, TypeError, AttributeError) as error:
+                raise BoardSpecError(f"Bad value {spec[key]!r} for {path}: "
+                                     f"{error}")
+
+def _check_cache(cache: dict, sector_size: int, what: str) -> None:
+    num_sets = parse_size(cache["size"]) // (sector_size * cache["assoc"])
+    if num_sets < 1 or num_sets & (num_sets - 1):
+        raise BoardSpecError(f"The {what} geometry gives {num_sets} sets, "
+                             "which is not a power of two.")
+
+def validate(spec: dict) -> None:
+    """Raises a BoardSpecError for the first problem found in `spec`."""
+    _check_section(spec, SCHEMA, "")
+    if spec["voltage_range"] not in spec["voltage_ranges"]:
+        raise BoardSpecError(f"voltage_range {spec['voltage_range']!r} is not "
+                             f"one of {', '.join(spec['voltage_ranges'])}.")
+    for name in spec["memories"]:
+        # the memories become children of the system under their names
+        if not name.isidentifier() or name in RESERVED_NAMES:
+            raise BoardSpecError(f"{name!r} cannot name a memory, memory "
+                                 "names must be identifiers other than "
+                                 f"{', '.join(sorted(RESERVED_NAMES))}.")
+    for name, memory in spec["memories"].items():
+        start = parse_address(memory["start"])
+        end = start + parse_size(memory["size"])
+        if start < CODE_REGION_END < end:
+            raise BoardSpecError(f"Memory {name} [{start:#x}, {end:#x}) "
+                                 "crosses the end of the code region at "
+                                 f"{CODE_REGION_END:#x}, so it is on neither "
+                                 "the code buses nor the System bus.")
+    dma = spec["dma"]
+    if dma["channels"] * DMA_CHANNEL_STRIDE > DMA_SIZE:
+        raise BoardSpecError(f"dma.channels is {dma['channels']}, the "
+                             "register region has room for "
+                             f"{DMA_SIZE // DMA_CHANNEL_STRIDE}.")
+    if not 4 <= dma["burst_size"] <= DMA_MAX_BURST:
+        raise BoardSpecError(f"dma.burst_size is {dma['burst_size']}, it "
+                             f"must be 4 to {DMA_MAX_BURST} bytes.")
+    icache = spec["icache"]
+    _check_cache(icache, icache["block_size"] * icache["blocks_per_sector"],
+                 "ART I-Cache")
+    _check_cache(spec["dcache"], spec["cache_line_size"], "ART D-Cache")
+
+    regions = [("flash", parse_address(spec["flash"]["start"]),
+                parse_size(spec["flash"]["size"]))]
+    for name, memory in spec["memories"].items():
+        size = parse_size(memory["size"])
+        regions.append((name, parse_address(memory["start"]), size))
+        regions += [
+            (f"{name} alias", parse_address(alias), size)
+            for alias in memory["aliases"]
+        ]
+    regions.append(("m5op", parse_address(spec["m5op_base"]), M5OP_SIZE))
+    regions.append(("ppb", parse_address(spec["ppb_base"]), PPB_SIZE))
+    if dma["channels"]:
+        regions.append(("dma", parse_address(dma["base"]), DMA_SIZE))
+    regions.sort(key=lambda region: region[1])
+    for (name, start, size), (next_name, next_start, _) in zip(
+        regions, regions[1:]
+    ):
+        if start + size > next_start:
+            raise BoardSpecError(f"The {name} region [{start:#x}, "
+                                 f"{start + size:#x}) overlaps {next_name} at "
+                                 f"{next_start:#x}.")
+
+def _parse_value(text: str):
+    # numbers, booleans, null and lists are given in JSON, anything else is
+    # taken as a string, so "latency=5ns" needs no quotes
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+def apply_override(spec: dict, override: str) -> None:
+    """Applies one "key.path=value" override to `spec` in place."""
+    path, sep, text = override.partition("=")
+    if not sep or not path:
+        raise BoardSpecError(f"Override {override!r} is not key.path=value.")
+    keys = path.split(".")
+    section = spec
+    for depth, key in enumerate(keys[:-1]):
+        if not isinstance(section.get(key), dict):
+            raise BoardSpecError(f"{'.'.join(keys[:depth + 1])} in override "
+                                 f"{override!r} is not a section of the "
+                                 "spec.")
+        section = section[key]
+    # a misspelled key is left to validate(), which rejects unknown keys
+    section[keys[-1]] = _parse_value(text)
+
+def load_spec(board: str, overrides: list[str] = ()) -> dict:
+    """
+    Loads the preset called `board`, or the spec file at that path, applies
+    the overrides in order and validates the result.
+    """
+    path = Path(board)
+    if not path.is_file():
+        path = PRESET_DIR / f"{board}.json"
+        if not path.is_file():
+            raise BoardSpecError(f"'{board}' is neither a spec file nor one "
+                                 f"of the presets {', '.join(presets())}.")
+    spec = copy.deepcopy(_read(path))
+    for override in overrides:
+        apply_override(spec, override)
+    validate(spec)
+    return spec
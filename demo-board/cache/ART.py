@@ -10,44 +10,69 @@ from m5.objects import (
 
 class ARTICache(ARTCache):
     def __init__(
-        self, flash_addr_range: AddrRange
+        self,
+        flash_addr_range: AddrRange,
+        size: str = "1KiB",
+        assoc: int = 32,
+        prefetch: bool = True,
+        block_size: int = 8,
+        blocks_per_sector: int = 4,
+        tag_latency: int = 1,
+        data_latency: int = 1,
+        response_latency: int = 0,
+        mshrs: int = 1,
+        tgts_per_mshr: int = 4
     ):
         super().__init__(
-            size="1KiB",
+            size=size,
             # num_sets = size / (block_size × num_blocks_per_sector × assoc)
-            assoc=32,
-            tag_latency=1,
-            data_latency=1,
-            response_latency=0,
-            mshrs=1,
-            tgts_per_mshr=4,
+            assoc=assoc,
+            tag_latency=tag_latency,
+            data_latency=data_latency,
+            response_latency=response_latency,
+            mshrs=mshrs,
+            tgts_per_mshr=tgts_per_mshr,
             writeback_clean=False,  # ART I-Cache is not write-back
             is_read_only=True,  # I-Cache is read-only
             addr_ranges=[flash_addr_range],
             bypass_cache=False,
-            bypass_prefetch=True,
-            cache_blk_size=8,
+            # the ART prefetcher fetches the next sequential flash line to
+            # hide the flash wait states for sequential code,
+            # check_art_prefetch.py measures the stall cycles it saves
+            bypass_prefetch=not prefetch,
+            # a block is one flash line, 64 bits on the STM32G4
+            cache_blk_size=block_size,
             tags=SectorTags(
-                num_blocks_per_sector=4, # 4 sectors per cache line
-                block_size=8
+                num_blocks_per_sector=blocks_per_sector,
+                block_size=block_size
             )
         )
 
 class ARTDCache(NoncoherentCache):
-    def __init__(self, flash_addr_range: AddrRange):
-        self._size = "256B"
+    def __init__(
+        self,
+        flash_addr_range: AddrRange,
+        size: str = "256B",
+        assoc: int = 8,
+        tag_latency: int = 1,
+        data_latency: int = 1,
+        response_latency: int = 0,
+        mshrs: int = 1,
+        tgts_per_mshr: int = 4
+    ):
+        self._size = size
         # Make it fully associative
-        self._assoc = 8
+        self._assoc = assoc
 
-        self._response_latency = 0
-        self._tag_latency = 1
-        self._data_latency = 1
+        self._response_latency = response_latency
+        self._tag_latency = tag_latency
+        self._data_latency = data_latency
 
         # The STM32G4 ART I-Cache doesn't allocate MSHRs but also STM32G4 has
         # no out-of-order execution and with a single issue core, 1 MSHR is 
         # sufficient to the model.
-        self._mshrs = 1
-        self._tgts_per_mshr = 4
+        self._mshrs = mshrs
+        self._tgts_per_mshr = tgts_per_mshr
 
         # This is a DCache, so read-write
         self._is_read_only = False
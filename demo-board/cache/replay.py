@@ -0,0 +1,408 @@
+"""
+Offline replay of ART cache configurations over an address trace captured at
+the CPU-side port of ARTICache or ARTDCache (se_board.py --art-trace).
+
+All configurations are simulated in one pass over the trace. Replacement is
+LRU, like the ART caches in gem5, so the configurations that only differ in
+their associativity share one stack per set (see ARTReplay), and the lookups
+in different sets are replayed side by side: a chunk of the trace takes as
+many NumPy steps as its busiest set has lookups.
+
+The sets of a fully associative configuration see every access, so it takes
+one step per access and one more for its prefetches, at about 60 us per
+step whatever the number of configurations. On the development host, the
+260 configurations of 256B-2KiB x 1-32 ways x 8/16 B blocks x 1-4 blocks
+per sector x prefetch on/off replay at about 150 us per access, the 880
+of 128B-8KiB x 1-32 ways x 4-32 B blocks x 1-4 blocks per sector x
+prefetch on/off at about 300 us, i.e. 3 million fetches take 8 and 15
+minutes.
+
+This module runs with the host Python and needs NumPy, not gem5.
+"""
+
+import gzip
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# "gem5" in little endian, the first word of every gem5 protobuf stream
+PROTO_MAGIC = 0x356D6567
+# field numbers of the Packet message in gem5's src/proto/packet.proto
+PACKET_TICK = 1
+PACKET_ADDR = 3
+PACKET_SIZE = 4
+# accesses replayed together, bounds the memory of a chunk to a few hundred
+# bytes per access and configuration family
+CHUNK_ACCESSES = 1024
+
+def _varint(buf: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _packet_fields(buf: bytes, pos: int, end: int) -> dict[int, int]:
+    fields = {}
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        wire_type = key & 0x7
+        if wire_type == 0:
+            fields[key >> 3], pos = _varint(buf, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _varint(buf, pos)
+            pos += length
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}.")
+    return fields
+
+def read_packet_trace(path: Path) -> dict[str, np.ndarray]:
+    """
+    Reads a gem5 packet trace (MemTraceProbe output) or its compact .npz form
+    written by `save_trace()`. Returns the ticks, addresses and sizes of the
+    requests.
+    """
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as trace:
+            return {key: trace[key] for key in ["ticks", "addrs", "sizes"]}
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        buf = f.read()
+    if struct.unpack_from("<I", buf, 0)[0] != PROTO_MAGIC:
+        raise ValueError(f"'{path.as_posix()}' is not a gem5 protobuf trace.")
+    pos = 4
+    # the first message is the PacketHeader
+    length, pos = _varint(buf, pos)
+    pos += length
+    ticks, addrs, sizes = [], [], []
+    while pos < len(buf):
+        length, pos = _varint(buf, pos)
+        fields = _packet_fields(buf, pos, pos + length)
+        pos += length
+        ticks.append(fields.get(PACKET_TICK, 0))
+        addrs.append(fields.get(PACKET_ADDR, 0))
+        sizes.append(fields.get(PACKET_SIZE, 0))
+    return {
+        "ticks": np.array(ticks, dtype=np.uint64),
+        "addrs": np.array(addrs, dtype=np.uint64),
+        "sizes": np.array(sizes, dtype=np.uint32),
+    }
+
+def save_trace(trace: dict[str, np.ndarray], path: Path) -> None:
+    np.savez_compressed(path, **trace)
+
+def _log2(value: int, what: str) -> int:
+    if value <= 0 or value & (value - 1):
+        raise ValueError(f"{what} must be a power of two, got {value}.")
+    return value.bit_length() - 1
+
+@dataclass(frozen=True)
+class ARTConfig:
+    """
+    One ART cache configuration. A sector of `blocks_per_sector` blocks
+    shares one tag, like SectorTags in gem5; a miss fetches a single block.
+    With `prefetch`, every demand access also fetches the next sequential
+    block.
+    """
+    size: int
+    assoc: int
+    block_size: int
+    blocks_per_sector: int
+    prefetch: bool
+
+    @property
+    def sector_size(self) -> int:
+        return self.block_size * self.blocks_per_sector
+
+    @property
+    def num_sets(self) -> int:
+        return self.size // (self.sector_size * self.assoc)
+
+    def validate(self) -> None:
+        _log2(self.block_size, "Block size")
+        _log2(self.blocks_per_sector, "Blocks per sector")
+        _log2(self.assoc, "Associativity")
+        if self.num_sets < 1:
+            raise ValueError(f"{self.label()} has fewer than one set.")
+        _log2(self.num_sets, "Number of sets")
+
+    def label(self) -> str:
+        return (f"size={self.size},assoc={self.assoc},"
+                f"block={self.block_size},"
+                f"blocks_per_sector={self.blocks_per_sector},"
+                f"prefetch={'on' if self.prefetch else 'off'}")
+
+class _Stacks:
+    """
+    The LRU stacks of sets of the given depths. A set keeps the tags of its
+    `depth` most recently used sectors and their last use; the stack
+    distance of a sector is the number of sectors used after it.
+    """
+    def __init__(self, depth: np.ndarray, max_blocks: int) -> None:
+        self._depth = depth
+        self._max_depth = int(depth.max())
+        positions = np.arange(self._max_depth)
+        self._tags = np.full(
+            (len(depth), self._max_depth), -1, dtype=np.int64
+        )
+        # -1 for an empty way, the largest time for the ways beyond the depth
+        # of a set, which are never used
+        self._last_use = np.where(
+            positions[None, :] < depth[:, None], -1, np.iinfo(np.int64).max
+        )
+        # per block of every way, the largest stack distance of its sector
+        # since the block's last lookup, and the largest distance of the
+        # prefetch lookups since its last demand lookup, -1 for none
+        self._blocks = np.empty(
+            (len(depth) * self._max_depth, max_blocks, 2), dtype=np.int64
+        )
+        self._blocks[:, :, 0] = self._max_depth
+        self._blocks[:, :, 1] = -1
+        self._empty = np.array([self._max_depth, -1])
+
+    def lookup(
+        self, lane: np.ndarray, tag: np.ndarray, block: np.ndarray,
+        prefetch: np.ndarray, time: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up blocks in different stacks and makes their sectors the most
+        recently used. Returns the distance of every lookup, it hits in the
+        configurations of a larger associativity, and for demand lookups the
+        largest distance its block was prefetched at since, it is a useful
+        prefetch in the configurations of at most that associativity.
+        """
+        rows = np.arange(len(lane))
+        depth = self._depth[lane]
+        tags = self._tags[lane]
+        last_use = self._last_use[lane]
+        match = tags == tag[:, None]
+        way = match.argmax(axis=1)
+        found = match[rows, way]
+        # the unused ways are newer than any sector
+        newer = (last_use > last_use[rows, way][:, None]).sum(axis=1) - (
+            self._max_depth - depth
+        )
+        distance = np.where(found, newer, depth)
+        # a sector beyond the stack replaces the least recently used one
+        way = np.where(found, way, last_use.argmin(axis=1))
+
+        index = lane * self._max_depth + way
+        blocks = np.where(
+            found[:, None, None], self._blocks[index], self._empty
+        )
+        since, prefetch_since = blocks[rows, block].T
+        hit_distance = np.maximum(since, distance)
+        blocks[:, :, 0] = np.maximum(blocks[:, :, 0], distance[:, None])
+        blocks[rows, block, 0] = 0
+        blocks[rows, block, 1] = np.where(
+            prefetch, np.maximum(prefetch_since, hit_distance), -1
+        )
+        self._blocks[index] = blocks
+        self._tags[lane, way] = tag
+        self._last_use[lane, way] = time
+        return hit_distance, np.where(prefetch, -1, prefetch_since)
+
+class ARTReplay:
+    """
+    Replays accesses through many ART cache configurations at once.
+
+    An access is looked up by its start address only; the ART ports see
+    fetches and loads that do not cross a block.
+
+    LRU has the inclusion property: a sector is in an A-way set if fewer
+    than A other sectors of its set were used since its own last use, its
+    stack distance. Configurations that differ in their associativity only
+    (the same blocks, sectors, number of sets and prefetching) therefore
+    share one LRU stack per set, as deep as their largest associativity,
+    and one replay of the stack answers all of them (Mattson et al., 1970).
+    A block is valid in an A-way cache if the stack distance of its sector
+    stayed below A at every use since the block's last lookup, so every
+    lookup yields the smallest associativity it hits in. A demand hit is on
+    a prefetched block if a prefetch lookup after the last demand lookup of
+    the block missed.
+    """
+    def __init__(self, configs: list[ARTConfig]) -> None:
+        for config in configs:
+            config.validate()
+        self.configs = configs
+        # the configurations that share an LRU stack
+        families = {}
+        for config in configs:
+            families.setdefault((
+                config.block_size, config.blocks_per_sector, config.num_sets,
+                config.prefetch
+            ), []).append(config)
+        keys = list(families)
+        self._family = np.array([
+            keys.index((c.block_size, c.blocks_per_sector, c.num_sets,
+                        c.prefetch)) for c in configs
+        ], dtype=np.int64)
+        self._assoc = np.array([c.assoc for c in configs], dtype=np.int64)
+        first = [family[0] for family in families.values()]
+        self._block_shift = np.array(
+            [_log2(c.block_size, "") for c in first], dtype=np.int64
+        )
+        self._sector_shift = np.array(
+            [_log2(c.sector_size, "") for c in first], dtype=np.int64
+        )
+        self._block_mask = np.array(
+            [c.blocks_per_sector - 1 for c in first], dtype=np.int64
+        )
+        self._set_shift = np.array(
+            [_log2(c.num_sets, "") for c in first], dtype=np.int64
+        )
+        self._set_mask = np.array(
+            [c.num_sets - 1 for c in first], dtype=np.int64
+        )
+        self._prefetch = np.array([c.prefetch for c in first])
+        num_sets = np.array([c.num_sets for c in first], dtype=np.int64)
+        depth = np.array([
+            max(c.assoc for c in family) for family in families.values()
+        ], dtype=np.int64)
+        # a distance of max_depth is a miss in every configuration
+        self._max_depth = int(depth.max())
+        # the sets of a family are numbered from its first lane
+        self._first_lane = np.concatenate([[0], np.cumsum(num_sets)[:-1]])
+        self._stacks = _Stacks(
+            np.repeat(depth, num_sets),
+            max(c.blocks_per_sector for c in configs)
+        )
+        self._time = 0
+
+    def _replay_chunk(
+        self, addrs: np.ndarray, regions: np.ndarray,
+        counts: dict[str, np.ndarray]
+    ) -> None:
+        num_families = len(self._first_lane)
+        num_accesses = len(addrs)
+        # the demand lookup of every family and, for those that prefetch,
+        # the lookup of the next block right after it
+        prefetching = np.flatnonzero(self._prefetch)
+        access = np.concatenate([
+            np.repeat(np.arange(num_accesses), num_families),
+            np.repeat(np.arange(num_accesses), len(prefetching)),
+        ])
+        family = np.concatenate([
+            np.tile(np.arange(num_families), num_accesses),
+            np.tile(prefetching, num_accesses),
+        ])
+        prefetch = np.arange(len(access)) >= num_accesses * num_families
+        addr = addrs[access]
+        block_shift = self._block_shift[family]
+        addr = np.where(
+            prefetch, ((addr >> block_shift) + 1) << block_shift, addr
+        )
+        sector = addr >> self._sector_shift[family]
+        block = (addr >> block_shift) & self._block_mask[family]
+        lane = self._first_lane[family] + (sector & self._set_mask[family])
+        tag = sector >> self._set_shift[family]
+        time = self._time + 2 * access + prefetch
+        self._time += 2 * num_accesses
+
+        # a lookup of the block and kind of the last lookup of its block,
+        # with only lookups of its sector in between, finds its sector on
+        # top and its block valid and changes nothing
+        order = np.lexsort((time, lane))
+        sorted_lane, sorted_tag = lane[order], tag[order]
+        run = np.empty(len(access), dtype=np.int64)
+        run[order] = np.cumsum(np.r_[
+            True, (sorted_lane[1:] != sorted_lane[:-1])
+            | (sorted_tag[1:] != sorted_tag[:-1])
+        ])
+        by_block = np.lexsort((time, block, run))
+        same = np.zeros(len(access), dtype=bool)
+        same[by_block[1:]] = (
+            (run[by_block[1:]] == run[by_block[:-1]])
+            & (block[by_block[1:]] == block[by_block[:-1]])
+            & (prefetch[by_block[1:]] == prefetch[by_block[:-1]])
+        )
+        order = order[~same[order]]
+
+        # the stacks are independent. Step k replays the k-th lookup of
+        # every stack, so a chunk takes as many steps as its busiest stack
+        # has lookups.
+        sorted_lane = lane[order]
+        first = np.flatnonzero(
+            np.r_[True, sorted_lane[1:] != sorted_lane[:-1]]
+        )
+        rank = np.arange(len(order)) - np.repeat(
+            first, np.diff(np.r_[first, len(order)])
+        )
+        order = order[np.argsort(rank, kind="stable")]
+        lookup = [
+            values[order] for values in [lane, tag, block, prefetch, time]
+        ]
+        results = np.empty((2, len(order)), dtype=np.int64)
+        begin = 0
+        for end in np.cumsum(np.bincount(rank)).tolist():
+            results[:, begin:end] = self._stacks.lookup(
+                *(values[begin:end] for values in lookup)
+            )
+            begin = end
+        distance = np.zeros(len(access), dtype=np.int64)
+        prefetched = np.full(len(access), -1, dtype=np.int64)
+        distance[order], prefetched[order] = results
+
+        # per region and family, how many lookups hit below every
+        # associativity. Accesses outside the measured regions only warm the
+        # caches.
+        region = regions[access]
+        measured = region >= 0
+        num_regions = len(counts["accesses"])
+        values = self._max_depth + 1
+        def below(mask: np.ndarray, value: np.ndarray) -> np.ndarray:
+            key = (region[mask] * num_families + family[mask]) * values + \
+                value[mask]
+            histogram = np.bincount(
+                key, minlength=num_regions * num_families * values
+            ).reshape(num_regions, num_families, values)
+            # [region, config] lookups of a distance below the associativity
+            return (np.cumsum(histogram, axis=2) - histogram)[
+                :, self._family, self._assoc
+            ]
+        demand = measured & ~prefetch
+        hits = below(demand, distance)
+        not_useful = below(demand, np.maximum(distance, prefetched))
+        lookups = np.bincount(
+            (region[measured] * num_families + family[measured]) * 2
+            + prefetch[measured],
+            minlength=num_regions * num_families * 2
+        ).reshape(num_regions, num_families, 2)[:, self._family]
+        prefetch_hits = below(measured & prefetch, distance)
+        counts["accesses"] += lookups[:, :, 0]
+        counts["hits"] += hits
+        counts["misses"] += lookups[:, :, 0] - hits
+        counts["prefetches"] += lookups[:, :, 1] - prefetch_hits
+        counts["useful_prefetches"] += hits - not_useful
+
+    def run(
+        self, addrs: np.ndarray, regions: np.ndarray, num_regions: int
+    ) -> dict[str, np.ndarray]:
+        """
+        Replays `addrs` in order. `regions` gives the region index of every
+        access, or -1 for accesses outside the measured regions, which only
+        warm the caches. Returns (num_regions, num_configs) count arrays.
+        """
+        shape = (num_regions, len(self.configs))
+        counts = {
+            key: np.zeros(shape, dtype=np.int64)
+            for key in ["accesses", "hits", "misses", "prefetches",
+                        "useful_prefetches"]
+        }
+        addrs = np.asarray(addrs, dtype=np.int64)
+        regions = np.asarray(regions, dtype=np.int64)
+        for begin in range(0, len(addrs), CHUNK_ACCESSES):
+            end = begin + CHUNK_ACCESSES
+            self._replay_chunk(addrs[begin:end], regions[begin:end], counts)
+        return counts
@@ -0,0 +1,152 @@
+"""
+Check that the ART I-Cache prefetcher hides flash wait states: run binaries
+with and without --no-art-prefetch and compare the cycles, I-Cache misses and
+flash traffic of their measured regions.
+
+    python3 check_art_prefetch.py --gem5 build/ARM/gem5.opt \
+        --binary ../simple-test/kernels/branch.elf --set clock=170MHz
+
+Every binary runs through se_board.py once with the prefetcher and once
+without, the runs are deterministic. A region must not take more cycles with
+the prefetcher than without, and at least one region of every binary must
+take fewer, otherwise the prefetcher is not hiding any flash stalls and the
+script exits with 1. The cycles saved are the flash stall cycles the
+prefetcher hides. Code that runs from SRAM or fits in the I-Cache after its
+first iteration saves few cycles, use binaries with long straight-line code
+in flash, and a clock with several wait states.
+
+This script runs with the host Python, not inside gem5.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from sweep import Job, binary_name, run_pool
+
+# the region record fields compared, the flash is the memory named
+# flash_memory by the MCU system
+FIELDS = ["cycles", "icache_misses", "flash_memory_bytes_read"]
+SETTINGS = {"prefetch": False, "no-prefetch": True}
+
+def region_totals(records: list[dict]) -> dict[str, float]:
+    return {
+        field: sum(record.get(field) or 0 for record in records)
+        for field in FIELDS
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check that the ART I-Cache prefetcher reduces the flash "
+            "stall cycles of measured regions."
+    )
+    parser.add_argument(
+        "--gem5", type=str, required=True, help="Path to the gem5 binary"
+    )
+    parser.add_argument(
+        "--binary", type=str, action="append", required=True,
+        help="Binary to check. Can be repeated"
+    )
+    parser.add_argument(
+        "--board", type=str, default="stm32g474",
+        help="Board spec passed to se_board.py"
+    )
+    parser.add_argument(
+        "--set", type=str, action="append", default=[], metavar="KEY=VALUE",
+        help="Board spec override passed to se_board.py. Can be repeated"
+    )
+    parser.add_argument(
+        "--outdir", type=str, default="art-prefetch-out",
+        help="Directory for the gem5 output directories of the runs"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of gem5 processes to run at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None,
+        help="Kill a gem5 process after this many seconds"
+    )
+    args = parser.parse_args()
+
+    gem5 = Path(args.gem5)
+    if not gem5.is_file():
+        raise FileNotFoundError(f"gem5 binary '{gem5.as_posix()}' does not "
+                                "exist.")
+    binaries = [Path(binary) for binary in args.binary]
+    for binary in binaries:
+        if not binary.is_file():
+            raise FileNotFoundError(f"Binary file '{binary.as_posix()}' does "
+                                    "not exist.")
+    outdir = Path(args.outdir).resolve()
+    extra_args = [arg for override in args.set for arg in ("--set", override)]
+
+    jobs = []
+    for binary in binaries:
+        for setting, no_prefetch in SETTINGS.items():
+            jobs.append(Job(
+                name=f"{binary_name(binary)}/{setting}",
+                binary=binary.resolve(),
+                # a True flag is passed as --no-art-prefetch, False omits it
+                params={"board": args.board, "no-art-prefetch": no_prefetch},
+                outdir=outdir / binary_name(binary) / setting,
+                extra_args=extra_args,
+            ))
+    jobs = run_pool(jobs, gem5, args.jobs, args.timeout, retries=0)
+
+    failed = [job for job in jobs if job.status != "ok"]
+    for job in failed:
+        print(f"{job.name} failed: {job.status}, see "
+              f"{job.outdir.as_posix()}")
+    if failed:
+        return 1
+
+    # ==== compare the regions with and without the prefetcher ====
+    failures = 0
+    print(f"{'binary':<20}{'field':<26}{'prefetch':>14}{'no-prefetch':>14}"
+          f"{'saved':>12}")
+    for binary in binaries:
+        runs = {
+            job.name.rsplit("/", 1)[1]: job for job in jobs
+            if job.binary == binary.resolve()
+        }
+        with_prefetch = runs["prefetch"].records
+        without = runs["no-prefetch"].records
+        if not with_prefetch:
+            print(f"{binary.name}: no measured regions to compare")
+            failures += 1
+            continue
+        if len(with_prefetch) != len(without):
+            print(f"{binary.name}: {len(with_prefetch)} region(s) with the "
+                  f"prefetcher but {len(without)} without")
+            failures += 1
+            continue
+        totals = {
+            setting: region_totals(runs[setting].records)
+            for setting in SETTINGS
+        }
+        for field in FIELDS:
+            saved = totals["no-prefetch"][field] - totals["prefetch"][field]
+            print(f"{binary.name:<20}{field:<26}"
+                  f"{totals['prefetch'][field]:>14.0f}"
+                  f"{totals['no-prefetch'][field]:>14.0f}{saved:>12.0f}")
+        slower = [
+            record["region"] for record, reference
+            in zip(with_prefetch, without)
+            if record["cycles"] > reference["cycles"]
+        ]
+        if slower:
+            print(f"{binary.name}: region(s) {slower} take more cycles with "
+                  "the prefetcher")
+            failures += 1
+        elif not any(
+            record["cycles"] < reference["cycles"]
+            for record, reference in zip(with_prefetch, without)
+        ):
+            print(f"{binary.name}: the prefetcher saves no cycles")
+            failures += 1
+    # ==== end of comparison ====
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
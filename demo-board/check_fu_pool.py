@@ -0,0 +1,195 @@
+"""
+Check that the grouped FU pool of the Cortex-M4 core simulates the same
+cycles as the original pool with one FU per op class, and benchmark how much
+faster it is to instantiate and to simulate.
+
+    python3 check_fu_pool.py --gem5 build/ARM/gem5.opt \
+        --binary bench_a.elf --binary bench_b.elf --repeat 3
+
+Every binary runs through se_board.py --repeat times with each --fu-pool.
+The region records of the two pools must match field by field, otherwise the
+script reports the first differing regions and exits with 1. The benchmark
+compares the mean host wall time of the gem5 processes and the config,
+instantiate and simulate times they report in summary.json. Run it with
+--jobs 1 on an otherwise idle host for meaningful timings.
+
+This script runs with the host Python, not inside gem5.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from sweep import Job, binary_name, run_pool
+
+# the --fu-pool choices of se_board.py, cores.M4_core needs gem5 to import
+FU_POOLS = ["grouped", "per-op-class"]
+REFERENCE_POOL = "per-op-class"
+
+def host_times(job: Job) -> dict[str, float]:
+    times = {"process_seconds": job.wall_time}
+    summary_file = job.outdir / "summary.json"
+    if summary_file.is_file():
+        host = json.loads(summary_file.read_text()).get("host", {})
+        times.update({
+            key: value for key, value in host.items()
+            if key.endswith("_seconds")
+        })
+    return times
+
+def compare_records(reference: list[dict], records: list[dict]) -> list[str]:
+    """Describes every region whose record differs from the reference."""
+    differences = []
+    if len(reference) != len(records):
+        differences.append(f"{len(reference)} region(s) with {REFERENCE_POOL}"
+                           f" but {len(records)}")
+    for expected, record in zip(reference, records):
+        # the host metrics differ from run to run
+        fields = sorted(
+            key for key in set(expected) | set(record)
+            if not key.startswith("host_")
+            and expected.get(key) != record.get(key)
+        )
+        if fields:
+            differences.append(
+                f"region {expected['region']}: " + ", ".join(
+                    f"{key} {expected.get(key)} != {record.get(key)}"
+                    for key in fields
+                )
+            )
+    return differences
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Verify and benchmark the grouped Cortex-M4 FU pool "
+            "against the original per-op-class pool."
+    )
+    parser.add_argument(
+        "--gem5", type=str, required=True, help="Path to the gem5 binary"
+    )
+    parser.add_argument(
+        "--binary", type=str, action="append", required=True,
+        help="Binary to check. Can be repeated"
+    )
+    parser.add_argument(
+        "--board", type=str, default="stm32g474",
+        help="Board spec passed to se_board.py"
+    )
+    parser.add_argument(
+        "--set", type=str, action="append", default=[], metavar="KEY=VALUE",
+        help="Board spec override passed to se_board.py. Can be repeated"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Runs of every binary with each FU pool for the benchmark"
+    )
+    parser.add_argument(
+        "--outdir", type=str, default="fu-pool-out",
+        help="Directory for the gem5 output directories of the runs"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of gem5 processes to run at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None,
+        help="Kill a gem5 process after this many seconds"
+    )
+    args = parser.parse_args()
+
+    gem5 = Path(args.gem5)
+    if not gem5.is_file():
+        raise FileNotFoundError(f"gem5 binary '{gem5.as_posix()}' does not "
+                                "exist.")
+    binaries = [Path(binary) for binary in args.binary]
+    for binary in binaries:
+        if not binary.is_file():
+            raise FileNotFoundError(f"Binary file '{binary.as_posix()}' does "
+                                    "not exist.")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    outdir = Path(args.outdir).resolve()
+    extra_args = [arg for override in args.set for arg in ("--set", override)]
+
+    jobs = []
+    for binary in binaries:
+        for fu_pool in FU_POOLS:
+            for run in range(args.repeat):
+                jobs.append(Job(
+                    name=f"{binary_name(binary)}/{fu_pool}/run{run}",
+                    binary=binary.resolve(),
+                    params={"board": args.board, "fu-pool": fu_pool},
+                    outdir=outdir / binary_name(binary) / fu_pool
+                    / f"run{run}",
+                    extra_args=extra_args,
+                ))
+    jobs = run_pool(jobs, gem5, args.jobs, args.timeout, retries=0)
+
+    failed = [job for job in jobs if job.status != "ok"]
+    for job in failed:
+        print(f"{job.name} failed: {job.status}, see "
+              f"{job.outdir.as_posix()}")
+    if failed:
+        return 1
+
+    # ==== verify the grouped pool ====
+    mismatches = 0
+    for binary in binaries:
+        runs = {
+            fu_pool: sorted(
+                (job for job in jobs
+                 if job.binary == binary.resolve()
+                 and job.params["fu-pool"] == fu_pool),
+                key=lambda job: job.name
+            ) for fu_pool in FU_POOLS
+        }
+        reference = runs[REFERENCE_POOL][0].records
+        differing = 0
+        for fu_pool in FU_POOLS:
+            # the repeated runs of a pool must agree with each other as well
+            for job in runs[fu_pool]:
+                if job is runs[REFERENCE_POOL][0]:
+                    continue
+                differences = compare_records(reference, job.records)
+                if differences:
+                    differing += 1
+                    print(f"{job.name} differs from {REFERENCE_POOL}:")
+                    for difference in differences[:5]:
+                        print(f"  {difference}")
+        mismatches += differing
+        if not reference:
+            print(f"{binary.name}: no measured regions to compare")
+        elif not differing:
+            print(f"{binary.name}: {len(reference)} region(s) identical with "
+                  "both FU pools")
+    # ==== end of verification ====
+
+    # ==== benchmark the host times ====
+    times = {fu_pool: {} for fu_pool in FU_POOLS}
+    for job in jobs:
+        for key, value in host_times(job).items():
+            times[job.params["fu-pool"]].setdefault(key, []).append(value)
+    print(f"{'host time':<22}" + "".join(
+        f"{fu_pool:>16}" for fu_pool in FU_POOLS
+    ) + f"{'speedup':>10}")
+    for key in times[REFERENCE_POOL]:
+        means = {
+            fu_pool: statistics.mean(times[fu_pool][key])
+            for fu_pool in FU_POOLS if times[fu_pool].get(key)
+        }
+        if len(means) != len(FU_POOLS):
+            continue
+        speedup = means[REFERENCE_POOL] / means["grouped"] \
+            if means["grouped"] else float("nan")
+        print(f"{key:<22}" + "".join(
+            f"{means[fu_pool]:>15.3f}s" for fu_pool in FU_POOLS
+        ) + f"{speedup:>9.2f}x")
+    (outdir / "benchmark.json").write_text(json.dumps(times, indent=2))
+    print(f"Host times written to {(outdir / 'benchmark.json').as_posix()}")
+    # ==== end of benchmark ====
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Compare the per-region results of two or more result sets, e.g. the sweeps
+of two gem5 revisions or two configurations within one sweep:
+
+    python3 compare_results.py old-sweep/results.csv new-sweep/results.csv
+    python3 compare_results.py "sweep-out/results.csv:clock=80MHz" \
+        "sweep-out/results.csv:clock=100MHz"
+
+The first set is the baseline, every other set is compared with it. A set
+is one of
+  - a table merged by sweep.py, or a directory holding one as results.csv.
+    A ":key=value,..." suffix keeps only the rows of those parameters. The
+    kernel of a row is its binary and parameters, without the parameters
+    any set filters on, so that the kernels of every set are named alike.
+    An unfiltered set must then have a single value of those parameters.
+  - a se_board.py outdir with its region records, or a directory of them,
+    like the outdir of regression.py. The records of every outdir belong to
+    the kernel named after its path below the set.
+
+The regions of a kernel are aligned by region index, warm-up regions left
+out, and repeated runs of a kernel are averaged. The speedup of a kernel is
+the geometric mean of the per-region runtime ratios baseline / candidate,
+its CPI delta the mean per-region difference candidate - baseline, both
+with a confidence interval over the aligned regions. A kernel with a single
+aligned region gets its interval from the repeated runs instead. A change
+is significant when the speedup interval excludes 1, and is only flagged
+if it is larger than --min-change as well. Out of many unchanged kernels,
+about 1 - --confidence of them look significant by chance, which
+--min-change keeps out of the report.
+
+This script runs with the host Python and needs NumPy, not gem5.
+"""
+
+import argparse
+import csv
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from results.records import find_records, read_records
+from results.summary import t_quantile
+
+# columns of a sweep.py table that are neither parameters nor record fields
+TABLE_COLUMNS = ["binary", "status"]
+
+def parse_set(text: str) -> tuple[Path, dict[str, str]]:
+    """A set argument as its path and its row filter."""
+    path, sep, where = text.rpartition(":")
+    if not sep or "=" not in where:
+        return Path(text), {}
+    return Path(path), dict(
+        item.split("=", 1) for item in where.split(",") if item
+    )
+
+def _number(value) -> float:
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _is_warmup(record: dict) -> bool:
+    # CSV tables hold the flag as text
+    return record.get("warmup") in (True, "True", "true", "1")
+
+def _rows(records, kernel: str) -> list[tuple[str, int, float, float]]:
+    return [
+        (kernel, int(_number(record["region"])), _number(record.get("ticks")),
+         _number(record.get("cpi")))
+        for record in records
+        if not _is_warmup(record) and record.get("region") not in (None, "")
+    ]
+
+def read_table(
+    path: Path, where: dict[str, str], omit: set[str]
+) -> list[tuple]:
+    rows = []
+    with open(path, newline="") as table:
+        reader = csv.DictReader(table)
+        # the parameter columns sit between binary and status
+        columns = reader.fieldnames or []
+        if not all(column in columns for column in TABLE_COLUMNS):
+            raise ValueError(f"'{path.as_posix()}' is not a sweep.py table.")
+        params = columns[columns.index("binary") + 1:columns.index("status")]
+        unknown = sorted(set(where) - set(params))
+        if unknown:
+            raise ValueError(f"'{path.as_posix()}' has no parameter(s) "
+                             f"{', '.join(unknown)}.")
+        omitted = {}
+        for record in reader:
+            if record["status"] != "ok" or any(
+                record[key] != value for key, value in where.items()
+            ):
+                continue
+            # the parameters the filters fix are left out of the kernel name
+            # in every set, so a filtered and an unfiltered set align
+            kernel = "/".join([record["binary"], *(
+                f"{key}={record[key]}" for key in params if key not in omit
+            )])
+            for key in omit & set(params):
+                omitted.setdefault(key, set()).add(record[key])
+            rows += _rows([record], kernel)
+    several = sorted(key for key, values in omitted.items() if len(values) > 1)
+    if several:
+        raise ValueError(f"'{path.as_posix()}' has several values of "
+                         f"{', '.join(several)}, which another set filters "
+                         "on. Filter this set as well.")
+    return rows
+
+def read_set(
+    path: Path, where: dict[str, str], omit: set[str] = frozenset()
+) -> list[tuple]:
+    """
+    The (kernel, region, ticks, cpi) rows of a result set, without the
+    parameters in `omit` in the kernel names of a table.
+    """
+    if path.is_file():
+        return read_table(path, where, set(omit) | set(where))
+    if (path / "results.csv").is_file():
+        return read_table(
+            path / "results.csv", where, set(omit) | set(where)
+        )
+    if where:
+        raise ValueError(f"'{path.as_posix()}' is not a sweep.py table, it "
+                         "cannot be filtered.")
+    rows = []
+    outdirs = sorted({
+        records.parent for name in ["regions.jsonl", "regions.csv"]
+        for records in path.rglob(name)
+    })
+    for outdir in outdirs:
+        kernel = outdir.relative_to(path).as_posix()
+        if kernel == ".":
+            kernel = outdir.resolve().name
+        rows += _rows(read_records(find_records(outdir)), kernel)
+    return rows
+
+def region_means(
+    rows: list[tuple], kernels: dict[str, int], max_region: int
+) -> dict[str, np.ndarray]:
+    """
+    Mean runtime and CPI of every (kernel, region) of a set over its
+    repeated runs, with the runs' log runtimes for kernels of one region.
+    """
+    kernel = np.array([kernels[row[0]] for row in rows], dtype=np.int64)
+    region = np.array([row[1] for row in rows], dtype=np.int64)
+    ticks = np.array([row[2] for row in rows], dtype=np.float64)
+    cpi = np.array([row[3] for row in rows], dtype=np.float64)
+    keys, inverse = np.unique(
+        kernel * (max_region + 1) + region, return_inverse=True
+    )
+    means = {"key": keys}
+    for name, values in [("ticks", ticks), ("cpi", cpi)]:
+        valid = np.isfinite(values) & (values > 0 if name == "ticks" else True)
+        count = np.bincount(inverse, weights=valid, minlength=len(keys))
+        total = np.bincount(
+            inverse, weights=np.where(valid, values, 0.0), minlength=len(keys)
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[name] = total / count
+    valid = np.isfinite(ticks) & (ticks > 0)
+    means["runs_key"] = keys[inverse][valid]
+    means["runs_log"] = np.log(ticks[valid])
+    return means
+
+def _t(confidence: float, df: np.ndarray) -> np.ndarray:
+    """t quantiles of the two-sided interval, NaN below one degree."""
+    df = np.where(np.isfinite(df) & (df >= 1), df, 0).astype(np.int64)
+    # one quantile per distinct number of degrees of freedom
+    quantiles = {
+        value: t_quantile(0.5 + confidence / 2, value)
+        for value in np.unique(df[df >= 1]).tolist()
+    }
+    return np.array([quantiles.get(value, math.nan) for value in df.tolist()])
+
+def _grouped_stats(
+    group: np.ndarray, values: np.ndarray, num_groups: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Count, mean and squared standard error of `values` by group."""
+    valid = np.isfinite(values)
+    group, values = group[valid], values[valid]
+    n = np.bincount(group, minlength=num_groups).astype(np.float64)
+    total = np.bincount(group, weights=values, minlength=num_groups)
+    squares = np.bincount(group, weights=values ** 2, minlength=num_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+        variance = np.maximum(squares - total * mean, 0.0) / (n - 1)
+        sem2 = np.where(n >= 2, variance / n, math.nan)
+    return n, mean, sem2
+
+def compare(
+    baseline: dict, candidate: dict, num_kernels: int, max_region: int,
+    confidence: float
+) -> dict[str, np.ndarray]:
+    """Per-kernel speedup and CPI delta of `candidate` over `baseline`."""
+    keys, base_index, cand_index = np.intersect1d(
+        baseline["key"], candidate["key"], return_indices=True
+    )
+    kernel = keys // (max_region + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_speedup = np.log(
+            baseline["ticks"][base_index] / candidate["ticks"][cand_index]
+        )
+    cpi_delta = candidate["cpi"][cand_index] - baseline["cpi"][base_index]
+    regions, log_mean, log_sem2 = _grouped_stats(
+        kernel, log_speedup, num_kernels
+    )
+    log_half = _t(confidence, regions - 1) * np.sqrt(log_sem2)
+    cpi_n, cpi_mean, cpi_sem2 = _grouped_stats(
+        kernel, cpi_delta, num_kernels
+    )
+    cpi_half = _t(confidence, cpi_n - 1) * np.sqrt(cpi_sem2)
+
+    # a kernel with a single aligned region compares the log runtimes of
+    # its repeated runs, Welch's t-test style
+    single = np.flatnonzero(regions == 1)
+    if len(single):
+        single_keys = keys[np.isin(kernel, single)]
+        sides = []
+        for side in [baseline, candidate]:
+            selected = np.isin(side["runs_key"], single_keys)
+            sides.append(_grouped_stats(
+                side["runs_key"][selected] // (max_region + 1),
+                side["runs_log"][selected], num_kernels
+            ))
+        (n_b, mean_b, var_b), (n_c, mean_c, var_c) = sides
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Welch-Satterthwaite degrees of freedom
+            df = np.floor((var_b + var_c) ** 2 / (
+                var_b ** 2 / (n_b - 1) + var_c ** 2 / (n_c - 1)
+            ))
+            # identical runs, as deterministic simulations give, have no
+            # spread at all
+            df[(var_b + var_c == 0) & (n_b >= 2) & (n_c >= 2)] = 1
+            welch_half = _t(confidence, df) * np.sqrt(var_b + var_c)
+        log_mean[single] = (mean_b - mean_c)[single]
+        log_half[single] = welch_half[single]
+
+    return {
+        "regions": regions,
+        "speedup": np.exp(log_mean),
+        "speedup_low": np.exp(log_mean - log_half),
+        "speedup_high": np.exp(log_mean + log_half),
+        "cpi_delta": cpi_mean,
+        "cpi_delta_half": cpi_half,
+        "significant": (log_mean - log_half > 0) | (log_mean + log_half < 0),
+    }
+
+def _format(value: float, spec: str, width: int) -> str:
+    if not math.isfinite(value):
+        return f"{'-':>{width}}"
+    return f"{value:{spec}}".rjust(width)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare per-region se_board.py results of two or more "
+            "sets and report per-kernel speedups and CPI deltas."
+    )
+    parser.add_argument(
+        "sets", type=str, nargs="+", metavar="SET",
+        help="Result set: a sweep.py table or outdir, optionally with a "
+            ":key=value,... row filter, or a se_board.py outdir or a "
+            "directory of them. The first set is the baseline"
+    )
+    parser.add_argument(
+        "--label", type=str, action="append", default=[],
+        help="Name of a set in the report, once per set in order. The set "
+            "argument by default"
+    )
+    parser.add_argument(
+        "--confidence", type=float, default=0.95,
+        help="Confidence level of the intervals and the significance test"
+    )
+    parser.add_argument(
+        "--min-change", type=float, default=0.0,
+        help="Smallest relative speedup or slowdown that is flagged, e.g. "
+            "0.01 for 1%%"
+    )
+    parser.add_argument(
+        "--show", type=str, default="changed", choices=["changed", "all"],
+        help="Print only the kernels with a flagged change, or every kernel"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None,
+        help="CSV file for the comparison of every kernel in every set"
+    )
+    args = parser.parse_args()
+
+    if len(args.sets) < 2:
+        parser.error("give a baseline and at least one set to compare")
+    if args.label and len(args.label) != len(args.sets):
+        parser.error(f"give --label once per set, {len(args.sets)} times")
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be in (0, 1)")
+    labels = args.label or args.sets
+
+    parsed = [parse_set(text) for text in args.sets]
+    omit = {key for _, where in parsed for key in where}
+    sets = []
+    for text, (path, where) in zip(args.sets, parsed):
+        if not path.exists():
+            raise FileNotFoundError(f"Result set '{path.as_posix()}' does not "
+                                    "exist.")
+        try:
+            rows = read_set(path, where, omit)
+        except ValueError as error:
+            parser.error(str(error))
+        if not rows:
+            parser.error(f"result set '{text}' has no measured regions")
+        sets.append(rows)
+    kernels = {
+        name: i for i, name in enumerate(sorted({
+            row[0] for rows in sets for row in rows
+        }))
+    }
+    names = list(kernels)
+    max_region = max(row[1] for rows in sets for row in rows)
+    means = [region_means(rows, kernels, max_region) for rows in sets]
+
+    output_rows = []
+    flagged_total = 0
+    unaligned = 0
+    for label, rows, candidate in zip(labels[1:], sets[1:], means[1:]):
+        result = compare(
+            means[0], candidate, len(kernels), max_region, args.confidence
+        )
+        speedup = result["speedup"]
+        flagged = result["significant"] & (
+            np.abs(speedup - 1) > args.min_change
+        )
+        compared = np.flatnonzero(result["regions"] > 0)
+        flagged_total += int(flagged.sum())
+        if not len(compared):
+            unaligned += 1
+            print(f"Error: no kernel of {label} aligns with {labels[0]}, "
+                  "their kernels are named differently, e.g. "
+                  f"'{sets[0][0][0]}' and '{rows[0][0]}'", file=sys.stderr)
+            continue
+        print(f"{label} against {labels[0]}: {len(compared)} kernel(s) "
+              f"compared, {int((flagged & (speedup > 1)).sum())} faster, "
+              f"{int((flagged & (speedup < 1)).sum())} slower")
+        if len(compared):
+            print(f"  geometric mean speedup "
+                  f"{math.exp(np.nanmean(np.log(speedup[compared]))):.4f}")
+        shown = compared if args.show == "all" else np.flatnonzero(flagged)
+        # the largest changes first
+        shown = shown[np.argsort(-np.abs(np.log(speedup[shown])))]
+        if len(shown):
+            print(f"  {'kernel':<40} {'regions':>7} {'speedup':>8} "
+                  f"{'interval':>19} {'CPI delta':>10} {'+-':>8}")
+        for i in shown:
+            interval = (
+                f"[{_format(result['speedup_low'][i], '.4f', 8)}, "
+                f"{_format(result['speedup_high'][i], '.4f', 8)}]"
+            )
+            mark = "  *" if flagged[i] else ""
+            print(f"  {names[i]:<40} {int(result['regions'][i]):>7} "
+                  f"{_format(speedup[i], '.4f', 8)} {interval:>19} "
+                  f"{_format(result['cpi_delta'][i], '+.4f', 10)} "
+                  f"{_format(result['cpi_delta_half'][i], '.4f', 8)}{mark}")
+        for i in compared:
+            output_rows.append({
+                "set": label,
+                "baseline": labels[0],
+                "kernel": names[i],
+                "regions": int(result["regions"][i]),
+                "speedup": speedup[i],
+                "speedup_low": result["speedup_low"][i],
+                "speedup_high": result["speedup_high"][i],
+                "cpi_delta": result["cpi_delta"][i],
+                "cpi_delta_half_width": result["cpi_delta_half"][i],
+                "significant": bool(result["significant"][i]),
+                "flagged": bool(flagged[i]),
+            })
+    if flagged_total:
+        print(f"* significant at {args.confidence * 100:g}% confidence"
+              + (f" and larger than {args.min_change * 100:g}%"
+                 if args.min_change else ""))
+
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            writer = csv.DictWriter(output, fieldnames=[
+                "set", "baseline", "kernel", "regions", "speedup",
+                "speedup_low", "speedup_high", "cpi_delta",
+                "cpi_delta_half_width", "significant", "flagged"
+            ])
+            writer.writeheader()
+            for row in output_rows:
+                writer.writerow({
+                    key: "" if isinstance(value, float)
+                    and not math.isfinite(value) else value
+                    for key, value in row.items()
+                })
+        print(f"Comparison written to {args.output}")
+    return 1 if unaligned else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,11 @@ from m5.objects import (
 )
 from m5.objects.ArmCPU import ArmMinorCPU
 from m5.objects.BaseMinorCPU import *
+try:
+    # built into gem5 from gem5-extras
+    from m5.objects import CortexMStaticBP
+except ImportError:
+    CortexMStaticBP = None
 
 from gem5.components.processors.base_cpu_core import BaseCPUCore
 from gem5.components.processors.base_cpu_processor import BaseCPUProcessor
@@ -101,184 +106,131 @@ def CortexM4IntFU() -> list[MinorFU]:
         simdMultAcc
     ]
 
-def Unsure() -> list[MinorFU]:
-    FloatAdd = FPMaker(["FloatAdd"], 1, "FloatAdd", 2, 0)
-    FloatCmp = FPMaker(["FloatCmp"], 1, "FloatCmp", 2, 0)
-    FloatCvt = FPMaker(["FloatCvt"], 1, "FloatCvt", 2, 0)
-    FloatMult = FPMaker(["FloatMult"], 1, "FloatMult", 2, 0)
-    FloatMultAcc = FPMaker(["FloatMultAcc"], 3, "FloatMultAcc", 2, 0)
-    FloatDiv = FPMaker(["FloatDiv"], 14, "FloatDiv", 2, 0)
-    FloatMisc = FPMaker(["FloatMisc"], 1, "FloatMisc", 2, 0)
-    FloatSqrt = FPMaker(["FloatSqrt"], 14, "FloatSqrt", 2, 0)
-    SimdAdd = FPMaker(["SimdAdd"], 1, "SimdAdd", 2, 0)
-    SimdAddAcc = FPMaker(["SimdAddAcc"], 1, "SimdAddAcc", 2, 0)
-    SimdCmp = FPMaker(["SimdCmp"], 1, "SimdCmp", 2, 0)
-    SimdCvt = FPMaker(["SimdCvt"], 1, "SimdCvt", 2, 0)
-    SimdMisc = FPMaker(["SimdMisc"], 1, "SimdMisc", 2, 0)
-    SimdMult = FPMaker(["SimdMult"], 1, "SimdMult", 2, 0)
-    SimdMatMultAcc = FPMaker(["SimdMatMultAcc"], 1, "SimdMatMultAcc", 2, 0)
-    SimdShift = FPMaker(["SimdShift"], 1, "SimdShift", 2, 0)            
-    SimdShiftAcc = FPMaker(["SimdShiftAcc"], 1, "SimdShiftAcc", 2, 0)
-    SimdDiv = FPMaker(["SimdDiv"], 14, "SimdDiv", 2, 0)
-    SimdSqrt = FPMaker(["SimdSqrt"], 14, "SimdSqrt", 2, 0)
-    SimdFloatAlu = FPMaker(["SimdFloatAlu"], 1, "SimdFloatAlu", 2, 0)
-    SimdFloatMatMultAcc = FPMaker(["SimdFloatMatMultAcc"], 1, "SimdFloatMatMultAcc", 2, 0)
-    SimdReduceAdd = FPMaker(["SimdReduceAdd"], 1, "SimdReduceAdd", 2, 0)
-    SimdReduceAlu = FPMaker(["SimdReduceAlu"], 1, "SimdReduceAlu", 2, 0)
-    SimdReduceCmp = FPMaker(["SimdReduceCmp"], 1, "SimdReduceCmp", 2, 0)
-    SimdFloatReduceAdd = FPMaker(["SimdFloatReduceAdd"], 1, "SimdFloatReduceAdd", 2, 0)
-    SimdFloatReduceCmp = FPMaker(["SimdFloatReduceCmp"], 1, "SimdFloatReduceCmp", 2, 0)
-    SimdAes = FPMaker(["SimdAes"], 1, "SimdAes", 2, 0)
-    SimdAesMix = FPMaker(["SimdAesMix"], 1, "SimdAesMix", 2, 0)
-    SimdSha1Hash = FPMaker(["SimdSha1Hash"], 1, "SimdSha1Hash", 2, 0)
-    SimdSha1Hash2 = FPMaker(["SimdSha1Hash2"], 1, "SimdSha1Hash2", 2, 0)
-    SimdSha256Hash = FPMaker(["SimdSha256Hash"], 1, "SimdSha256Hash", 2, 0)
-    SimdSha256Hash2 = FPMaker(["SimdSha256Hash2"], 1, "SimdSha256Hash2", 2, 0)
-    SimdShaSigma2 = FPMaker(["SimdShaSigma2"], 1, "SimdShaSigma2", 2, 0) 
-    SimdShaSigma3 = FPMaker(["SimdShaSigma3"], 1, "SimdShaSigma3", 2, 0)
-    SimdPredAlu = FPMaker(["SimdPredAlu"], 1, "SimdPredAlu", 2, 0)
-    Matrix = FPMaker(["Matrix"], 1, "Matrix", 2, 0)
-    MatrixMov = FPMaker(["MatrixMov"], 1, "MatrixMov", 2, 0)
-    MatrixOP = FPMaker(["MatrixOP"], 1, "MatrixOP", 2, 0)
-    MemRead = FPMaker(["MemRead"], 1, "MemRead", 2, 0)
-    MemWrite = FPMaker(["MemWrite"], 1, "MemWrite", 2, 0)
-    IprAccess = FPMaker(["IprAccess"], 1, "IprAccess", 2, 0)
-    InstPrefetch = FPMaker(["InstPrefetch"], 1, "InstPrefetch", 2, 0)
-    SimdUnitStrideLoad = FPMaker(
-        ["SimdUnitStrideLoad"], 1, "SimdUnitStrideLoad", 2, 0
-    )
-    SimdUnitStrideStore = FPMaker(
-        ["SimdUnitStrideStore"], 1, "SimdUnitStrideStore", 2, 0
-    )
-    SimdUnitStrideMaskLoad = FPMaker(
-        ["SimdUnitStrideMaskLoad"], 1, "SimdUnitStrideMaskLoad", 2, 0
-    )
-    SimdUnitStrideMaskStore = FPMaker(
-        ["SimdUnitStrideMaskStore"], 1, "SimdUnitStrideMaskStore", 2, 0
-    )
-    SimdStridedLoad = FPMaker(
-        ["SimdStridedLoad"], 1, "SimdStridedLoad", 2, 0
-    )
-    SimdStridedStore = FPMaker(
-        ["SimdStridedStore"], 1, "SimdStridedStore", 2, 0
-    )
-    SimdIndexedLoad = FPMaker(
-        ["SimdIndexedLoad"], 1, "SimdIndexedLoad", 2, 0
-    )
-    SimdIndexedStore = FPMaker(
-        ["SimdIndexedStore"], 1, "SimdIndexedStore", 2, 0
-    )
-    SimdWholeRegisterLoad = FPMaker(
-        ["SimdWholeRegisterLoad"], 1, "SimdWholeRegisterLoad", 2, 0
-    )
-    SimdWholeRegisterStore = FPMaker(
-        ["SimdWholeRegisterStore"], 1, "SimdWholeRegisterStore", 2, 0
-    )
-    SimdUnitStrideFaultOnlyFirstLoad = FPMaker(
-        ["SimdUnitStrideFaultOnlyFirstLoad"], 1, 
-        "SimdUnitStrideFaultOnlyFirstLoad", 2, 0
-    )
-    SimdUnitStrideSegmentedLoad = FPMaker(
-        ["SimdUnitStrideSegmentedLoad"], 1, "SimdUnitStrideSegmentedLoad", 2, 0
-    )
-    SimdUnitStrideSegmentedStore = FPMaker(
-        ["SimdUnitStrideSegmentedStore"], 1, "SimdUnitStrideSegmentedStore", 2,
-        0
-    )
-    SimdUnitStrideSegmentedFaultOnlyFirstLoad = FPMaker(
-        ["SimdUnitStrideSegmentedFaultOnlyFirstLoad"], 1,
-        "SimdUnitStrideSegmentedFaultOnlyFirstLoad", 2, 0
-    )
-    SimdStrideSegmentedLoad = FPMaker(
-        ["SimdStrideSegmentedLoad"], 1, "SimdStrideSegmentedLoad", 2, 0
-    )
-    SimdStrideSegmentedStore = FPMaker(
-        ["SimdStrideSegmentedStore"], 1, "SimdStrideSegmentedStore", 2, 0
-    )
-    SimdExt = FPMaker(["SimdExt"], 1, "SimdExt", 2, 0)
-    SimdFloatExt = FPMaker(["SimdFloatExt"], 1, "SimdFloatExt", 2, 0)
-    SimdConfig = FPMaker(["SimdConfig"], 1, "SimdConfig", 2, 0)
-    #SimdBf16Cvt = FPMaker(["SimdBf16Cvt"], 1, "SimdBf16Cvt", 2, 0) 
-    #SimdBf16DotProd = FPMaker(["SimdBf16DotProd"], 1, "SimdBf16DotProd", 2, 0)
-    #SimdBf16MatMultAcc = FPMaker(
-    #    ["SimdBf16MatMultAcc"], 1, "SimdBf16MatMultAcc", 2, 0)
-    #SimdBf16MultAcc = FPMaker(
-    #    ["SimdBf16MultAcc"], 1, "SimdBf16MultAcc", 2, 0)
-    #Bf16Cvt = FPMaker(
-    #    ["Bf16Cvt"], 1, "Bf16Cvt", 2, 0)
-    return [
-        FloatAdd,
-        FloatCmp,
-        FloatCvt,
-        FloatMult,
-        FloatMultAcc,
-        FloatDiv,
-        FloatMisc,
-        FloatSqrt,
-        SimdAdd,
-        SimdAddAcc,
-        SimdCmp,
-        SimdCvt,
-        SimdMisc,
-        SimdMult,
-        SimdMatMultAcc,
-        SimdShift,
-        SimdShiftAcc,
-        SimdDiv,
-        SimdSqrt,
-        SimdFloatAlu,
-        SimdFloatMatMultAcc,
-        SimdReduceAdd,
-        SimdReduceAlu,
-        SimdReduceCmp,
-        SimdFloatReduceAdd,
-        SimdFloatReduceCmp,
-        SimdAes,
-        SimdAesMix,
-        SimdSha1Hash,
-        SimdSha1Hash2,
-        SimdSha256Hash,
-        SimdSha256Hash2,
-        SimdShaSigma2,
-        SimdShaSigma3,
-        SimdPredAlu,
-        Matrix,
-        MatrixMov,
-        MatrixOP,
-        MemRead,
-        MemWrite,
-        IprAccess,
-        InstPrefetch,
-        SimdUnitStrideLoad,
-        SimdUnitStrideStore,
-        SimdUnitStrideMaskLoad,
-        SimdUnitStrideMaskStore,
-        SimdStridedLoad,
-        SimdStridedStore,
-        SimdIndexedLoad,
-        SimdIndexedStore,
-        SimdWholeRegisterLoad,
-        SimdWholeRegisterStore,
-        SimdUnitStrideFaultOnlyFirstLoad,
-        SimdUnitStrideSegmentedLoad,
-        SimdUnitStrideSegmentedStore,
-        SimdUnitStrideSegmentedFaultOnlyFirstLoad,
-        SimdStrideSegmentedLoad,
-        SimdStrideSegmentedStore,
-        SimdExt,
-        SimdFloatExt,
-        SimdConfig,
-       # SimdBf16Cvt,
-       # SimdBf16DotProd,
-       # SimdBf16MatMultAcc,
-       # SimdBf16MultAcc,
-       # Bf16Cvt
+# op classes without a known Cortex-M4 timing and their op latency. Most of
+# them, like the SVE, matrix, crypto and vector load/store classes, never come
+# up in Thumb-2 code, but an instruction of an op class without a FU could
+# never issue, so every one of them is covered.
+UNSURE_OP_CLASSES = {
+    "FloatAdd": 1,
+    "FloatCmp": 1,
+    "FloatCvt": 1,
+    "FloatMult": 1,
+    "FloatMultAcc": 3,
+    "FloatDiv": 14,
+    "FloatMisc": 1,
+    "FloatSqrt": 14,
+    "SimdAdd": 1,
+    "SimdAddAcc": 1,
+    "SimdCmp": 1,
+    "SimdCvt": 1,
+    "SimdMisc": 1,
+    "SimdMult": 1,
+    "SimdMatMultAcc": 1,
+    "SimdShift": 1,
+    "SimdShiftAcc": 1,
+    "SimdDiv": 14,
+    "SimdSqrt": 14,
+    "SimdFloatAlu": 1,
+    "SimdFloatMatMultAcc": 1,
+    "SimdReduceAdd": 1,
+    "SimdReduceAlu": 1,
+    "SimdReduceCmp": 1,
+    "SimdFloatReduceAdd": 1,
+    "SimdFloatReduceCmp": 1,
+    "SimdAes": 1,
+    "SimdAesMix": 1,
+    "SimdSha1Hash": 1,
+    "SimdSha1Hash2": 1,
+    "SimdSha256Hash": 1,
+    "SimdSha256Hash2": 1,
+    "SimdShaSigma2": 1,
+    "SimdShaSigma3": 1,
+    "SimdPredAlu": 1,
+    "Matrix": 1,
+    "MatrixMov": 1,
+    "MatrixOP": 1,
+    "MemRead": 1,
+    "MemWrite": 1,
+    "IprAccess": 1,
+    "InstPrefetch": 1,
+    "SimdUnitStrideLoad": 1,
+    "SimdUnitStrideStore": 1,
+    "SimdUnitStrideMaskLoad": 1,
+    "SimdUnitStrideMaskStore": 1,
+    "SimdStridedLoad": 1,
+    "SimdStridedStore": 1,
+    "SimdIndexedLoad": 1,
+    "SimdIndexedStore": 1,
+    "SimdWholeRegisterLoad": 1,
+    "SimdWholeRegisterStore": 1,
+    "SimdUnitStrideFaultOnlyFirstLoad": 1,
+    "SimdUnitStrideSegmentedLoad": 1,
+    "SimdUnitStrideSegmentedStore": 1,
+    "SimdUnitStrideSegmentedFaultOnlyFirstLoad": 1,
+    "SimdStrideSegmentedLoad": 1,
+    "SimdStrideSegmentedStore": 1,
+    "SimdExt": 1,
+    "SimdFloatExt": 1,
+    "SimdConfig": 1,
+    # not covered: SimdBf16Cvt, SimdBf16DotProd, SimdBf16MatMultAcc,
+    # SimdBf16MultAcc and Bf16Cvt
+}
+
+# memory references wait at the end of their FU until the LSQ takes them, so
+# they keep a FU of their own and do not hold up the other op classes
+SEPARATE_OP_CLASSES = ["MemRead", "MemWrite"]
+
+# "grouped" gives every op latency of the unsure op classes one FU,
+# "per-op-class" is the original pool with one FU per op class, kept to check
+# that the grouped pool simulates the same cycles
+FU_POOLS = ["grouped", "per-op-class"]
+
+# "minor" keeps the tournament predictor of the MinorCPU, "m4" predicts like
+# a Cortex-M4, which has no dynamic predictor: conditional branches are not
+# taken and every taken one pays a fixed pipeline refill
+BRANCH_MODELS = ["minor", "m4"]
+
+def Unsure(grouped: bool = True) -> list[MinorFU]:
+    if not grouped:
+        return [
+            FPMaker([op_class], op_lat, op_class, 2, 0)
+            for op_class, op_lat in UNSURE_OP_CLASSES.items()
+        ]
+    # Minor issues an instruction to the first free FU that provides its op
+    # class and searches the whole pool for it. The FUs are pipelined and at
+    # most one instruction issues per cycle, so op classes with the same
+    # timing can share a FU.
+    fus = [
+        FPMaker([op_class], UNSURE_OP_CLASSES[op_class], op_class, 2, 0)
+        for op_class in SEPARATE_OP_CLASSES
+    ]
+    by_latency = {}
+    for op_class, op_lat in UNSURE_OP_CLASSES.items():
+        if op_class not in SEPARATE_OP_CLASSES:
+            by_latency.setdefault(op_lat, []).append(op_class)
+    fus += [
+        FPMaker(op_classes, op_lat, f"UnsureLat{op_lat}", 2, 0)
+        for op_lat, op_classes in by_latency.items()
     ]
+    return fus
 
 class CortexM4Core(ArmMinorCPU):
-    def __init__(self, if_fpu: bool) -> None:
+    def __init__(
+        self, if_fpu: bool, fu_pool: str = "grouped",
+        branch_model: str = "minor", branch_refill_delay: int = 1
+    ) -> None:
         super().__init__()
+        if fu_pool not in FU_POOLS:
+            raise ValueError(f"Unknown FU pool '{fu_pool}', expected one of "
+                             f"{', '.join(FU_POOLS)}.")
+        if branch_model not in BRANCH_MODELS:
+            raise ValueError(f"Unknown branch model '{branch_model}', "
+                             f"expected one of {', '.join(BRANCH_MODELS)}.")
+        if branch_refill_delay < 1:
+            raise ValueError("The branch refill delay must be at least one "
+                             "cycle.")
         self._if_fpu = if_fpu
+        self._fu_pool = fu_pool
 
         # M4 does not support SMT
         self.threadPolicy = "SingleThreaded"
@@ -305,7 +257,18 @@ class CortexM4Core(ArmMinorCPU):
         self.executeCommitLimit = 1
         self.executeInputBufferSize = 1
 
-        # TODO: Need to loop back to branch predictor later
+        if branch_model == "m4":
+            if CortexMStaticBP is None:
+                raise RuntimeError("The m4 branch model needs gem5 built with "
+                                   "gem5-extras.")
+            self.branchPred = CortexMStaticBP()
+            # the M4 decode stage fetches the target of an unconditional
+            # branch right away, so fetch2 redirects fetch1 in the same cycle
+            self.fetch1ToFetch2BackwardDelay = 0
+            # cycles from a taken branch in execute until fetch1 fetches its
+            # target. With nothing predicted, every taken conditional branch
+            # pays this plus the refill of fetch, decode and execute.
+            self.executeBranchDelay = branch_refill_delay
 
         self.executeFuncUnits = self._create_fu_pool()
 
@@ -314,19 +277,35 @@ class CortexM4Core(ArmMinorCPU):
         if self._if_fpu:
             _all_fus += CortexM4FPUPool()
         _all_fus += CortexM4IntFU()
-        _all_fus += Unsure()
+        _all_fus += Unsure(grouped=self._fu_pool == "grouped")
         class CortexM4FUPool(MinorFUPool):
             funcUnits = _all_fus
         return CortexM4FUPool()
 
 
 class CortexM4CPU(BaseCPUCore):
-    def __init__(self, if_fpu: bool):
-        cpu = CortexM4Core(if_fpu=if_fpu)
+    def __init__(
+        self, if_fpu: bool, core_id: int = 0, fu_pool: str = "grouped",
+        branch_model: str = "minor", branch_refill_delay: int = 1
+    ):
+        cpu = CortexM4Core(
+            if_fpu=if_fpu, fu_pool=fu_pool, branch_model=branch_model,
+            branch_refill_delay=branch_refill_delay
+        )
+        cpu.cpu_id = core_id
         super().__init__(core=cpu, isa=ISA.ARM)
 
 
 class CortexM4Processor(BaseCPUProcessor):
-    def __init__(self, num_cores: int, if_fpu: bool):
-        cores = [CortexM4CPU(if_fpu=if_fpu) for _ in range(num_cores)]
+    def __init__(
+        self, num_cores: int, if_fpu: bool, fu_pool: str = "grouped",
+        branch_model: str = "minor", branch_refill_delay: int = 1
+    ):
+        cores = [
+            CortexM4CPU(
+                if_fpu=if_fpu, core_id=i, fu_pool=fu_pool,
+                branch_model=branch_model,
+                branch_refill_delay=branch_refill_delay
+            ) for i in range(num_cores)
+        ]
         super().__init__(cores=cores)
@@ -0,0 +1,57 @@
+from typing import Iterator
+
+import m5
+from m5.objects import System
+
+from gem5.components.processors.base_cpu_core import BaseCPUCore
+from gem5.components.processors.cpu_types import CPUTypes
+from gem5.components.processors.simple_core import SimpleCore
+from gem5.components.processors.switchable_processor import (
+    SwitchableProcessor
+)
+from gem5.isas import ISA
+
+class FastForwardProcessor(SwitchableProcessor):
+    """
+    Starts on atomic cores to fast-forward through the setup code and switches
+    to the given detailed cores when the region of interest is reached.
+
+    The se_board does not use a gem5 stdlib board, so the system the cores are
+    attached to has to be given with `set_system()` before switching.
+    """
+    _start_key = "atomic"
+    _detailed_key = "detailed"
+
+    def __init__(self, detailed_cores: list[BaseCPUCore]) -> None:
+        atomic_cores = [
+            SimpleCore(cpu_type=CPUTypes.ATOMIC, core_id=i, isa=ISA.ARM)
+            for i in range(len(detailed_cores))
+        ]
+        super().__init__(
+            switchable_cores={
+                self._start_key: atomic_cores,
+                self._detailed_key: detailed_cores,
+            },
+            starting_cores=self._start_key,
+        )
+
+    def get_all_cores(self) -> Iterator[BaseCPUCore]:
+        # every core, switched out or not, needs the workload set before
+        # instantiation
+        yield from self._all_cores()
+
+    def set_system(self, system: System) -> None:
+        self._board = system
+
+    def is_detailed(self) -> bool:
+        return self._current_cores is self._switchable_cores[
+            self._detailed_key
+        ]
+
+    def switch_to_detailed(self) -> None:
+        self.switch_to_processor(self._detailed_key)
+        print(f"Switched to detailed cores at tick {m5.curTick()}")
+
+    def switch_to_atomic(self) -> None:
+        self.switch_to_processor(self._start_key)
+        print(f"Switched to atomic cores at tick {m5.curTick()}")
@@ -0,0 +1,172 @@
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+from m5.objects import AddrRange
+
+PT_LOAD = 1
+SHF_ALLOC = 0x2
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+STT_FUNC = 2
+
+@dataclass
+class Segment:
+    vaddr: int
+    paddr: int
+    filesz: int
+    memsz: int
+
+@dataclass
+class Section:
+    name: str
+    addr: int
+    size: int
+    loaded: bool
+
+@dataclass
+class Symbol:
+    name: str
+    addr: int
+    size: int
+
+def _elf32(data: bytes) -> str:
+    if data[:4] != b"\x7fELF":
+        raise ValueError("not an ELF file")
+    if data[4] != 1:
+        raise ValueError("only 32-bit ELF files are supported")
+    return "<" if data[5] == 1 else ">"
+
+def read_segments(path: Path) -> list[Segment]:
+    """Loadable segments of a 32-bit ELF file."""
+    data = Path(path).read_bytes()
+    endian = _elf32(data)
+    phoff, = struct.unpack_from(endian + "I", data, 28)
+    phentsize, phnum = struct.unpack_from(endian + "HH", data, 42)
+    segments = []
+    for i in range(phnum):
+        p_type, _, vaddr, paddr, filesz, memsz = struct.unpack_from(
+            endian + "6I", data, phoff + i * phentsize
+        )
+        if p_type == PT_LOAD and memsz > 0:
+            segments.append(Segment(vaddr, paddr, filesz, memsz))
+    return segments
+
+def read_sections(path: Path) -> list[Section]:
+    """Sections of a 32-bit ELF file that occupy memory at run time."""
+    data = Path(path).read_bytes()
+    endian = _elf32(data)
+    shoff, = struct.unpack_from(endian + "I", data, 32)
+    shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 46)
+    headers = [
+        struct.unpack_from(endian + "10I", data, shoff + i * shentsize)
+        for i in range(shnum)
+    ]
+    if not headers:
+        return []
+    strtab_offset = headers[shstrndx][4]
+    sections = []
+    for name, sh_type, flags, addr, _, size, *_ in headers:
+        if not flags & SHF_ALLOC or size == 0:
+            continue
+        end = data.index(b"\0", strtab_offset + name)
+        sections.append(Section(
+            name=data[strtab_offset + name:end].decode(),
+            addr=addr,
+            size=size,
+            loaded=sh_type != SHT_NOBITS,
+        ))
+    return sections
+
+def read_symbols(path: Path) -> list[Symbol]:
+    """
+    Function symbols of a 32-bit ELF file, sorted by address. The Thumb bit
+    is cleared from the addresses.
+    """
+    data = Path(path).read_bytes()
+    endian = _elf32(data)
+    shoff, = struct.unpack_from(endian + "I", data, 32)
+    shentsize, shnum = struct.unpack_from(endian + "HH", data, 46)
+    headers = [
+        struct.unpack_from(endian + "10I", data, shoff + i * shentsize)
+        for i in range(shnum)
+    ]
+    symbols = {}
+    for _, sh_type, _, _, offset, size, link, _, _, entsize in headers:
+        if sh_type != SHT_SYMTAB or not entsize:
+            continue
+        strtab_offset = headers[link][4]
+        for entry in range(offset, offset + size, entsize):
+            name, value, sym_size, info = struct.unpack_from(
+                endian + "3IB", data, entry
+            )
+            if info & 0xF != STT_FUNC or name == 0:
+                continue
+            end = data.index(b"\0", strtab_offset + name)
+            addr = value & ~1
+            # aliases of the same function keep the first name
+            symbols.setdefault(addr, Symbol(
+                name=data[strtab_offset + name:end].decode(),
+                addr=addr,
+                size=sym_size,
+            ))
+    return sorted(symbols.values(), key=lambda symbol: symbol.addr)
+
+def region_of(addr: int, regions: dict[str, list[AddrRange]], size: int = 1):
+    """
+    Name of the region whose address ranges hold all `size` bytes from
+    `addr`, None if no single range does.
+    """
+    for name, ranges in regions.items():
+        for addr_range in ranges:
+            start = int(addr_range.start)
+            if start <= addr and addr + size <= start + addr_range.size():
+                return name
+    return None
+
+def check_placement(
+    path: Path,
+    regions: dict[str, list[AddrRange]],
+    load_regions: list[str],
+) -> dict[str, list[Section]]:
+    """
+    Matches the sections of the binary to the memory regions of the board.
+    Every loadable segment that occupies memory, including the ones that
+    are only zero-filled like .bss, should run from a region of the board
+    and must fit in it. The segments with file contents also have to be
+    loaded into one of `load_regions`. The SE loader writes the image before
+    the RAMs are mapped, so code and data that run from RAM need their load
+    address in flash and are copied by the startup code, as with the usual
+    STM32 linker scripts. Returns the sections placed in each region.
+    """
+    binary = Path(path).as_posix()
+    for segment in read_segments(path):
+        region = region_of(segment.vaddr, regions)
+        if region is None:
+            # the SE loader still places it in memory, but not in a memory
+            # with the timing of the board
+            print(f"Warning: segment at {segment.vaddr:#x} of '{binary}' is "
+                  "outside the memory map of the board")
+            continue
+        if region_of(segment.vaddr, regions, segment.memsz) is None:
+            raise ValueError(
+                f"Segment at {segment.vaddr:#x} of '{binary}' is "
+                f"{segment.memsz} bytes and runs past the end of {region}."
+            )
+        # only the contents from the file are loaded, the rest of the segment
+        # is zero-filled at its run address
+        if segment.filesz and region_of(
+            segment.paddr, regions, segment.filesz
+        ) not in load_regions:
+            raise ValueError(
+                f"Segment at {segment.vaddr:#x} of '{binary}' is loaded at "
+                f"{segment.paddr:#x}, which is not in "
+                f"{', '.join(load_regions)}. Give it a load address in flash "
+                "(AT> FLASH) and copy it in the startup code."
+            )
+    placement = {name: [] for name in regions}
+    for section in read_sections(path):
+        region = region_of(section.addr, regions)
+        if region is not None:
+            placement[region].append(section)
+    return placement
@@ -0,0 +1,47 @@
+from m5.objects import AddrRange, SimpleMemory
+from m5.util.convert import toFrequency
+
+def flash_wait_states(clock: str, limits_mhz: list[float]) -> int:
+    """
+    Fewest wait states the flash needs at `clock`, given the maximum HCLK
+    frequency in MHz for 0, 1, 2, ... wait states of the voltage range, as in
+    the "Number of wait states according to CPU clock (HCLK) frequency" table
+    of the reference manual.
+    """
+    mhz = toFrequency(clock) / 1e6
+    for wait_states, max_mhz in enumerate(limits_mhz):
+        if mhz <= max_mhz:
+            return wait_states
+    raise ValueError(f"{clock} is above the maximum HCLK frequency of "
+                     f"{limits_mhz[-1]}MHz.")
+
+class STM32Flash(SimpleMemory):
+    """
+    Embedded flash behind the flash interface, a SimpleMemory. Every request
+    is answered `wait_states` + 1 HCLK cycles after it is accepted, whatever
+    its size, it is not split into `line_bytes` line reads (64 bits on the
+    STM32G4). The bandwidth of one line per access time keeps the flash busy
+    for size / `line_bytes` access times after a request, so a wide request,
+    like a line fill of the ART D-Cache, delays the requests after it rather
+    than its own response.
+    The ART I-Cache blocks are the line buffer, check_art_prefetch.py
+    measures the stalls its prefetcher hides.
+    """
+    def __init__(
+        self,
+        addr_range: AddrRange,
+        clock: str,
+        wait_states: int,
+        line_bytes: int = 8
+    ):
+        hz = toFrequency(clock)
+        access_ps = round(1e12 / hz * (wait_states + 1))
+        super().__init__(
+            range=addr_range,
+            latency=f"{access_ps}ps",
+            bandwidth=f"{round(line_bytes * hz / (wait_states + 1))}B/s",
+        )
+        self._wait_states = wait_states
+
+    def get_wait_states(self) -> int:
+        return self._wait_states
@@ -0,0 +1,228 @@
+"""
+Run several independent MCU boards in one gem5 process, e.g.
+
+    gem5.opt multi_board.py --binary bench_a.elf --binary bench_b.elf \
+        --board stm32g474 --board stm32l476 --parallel
+
+Every --binary gets its own System, built from its board spec, under one
+Root. With --parallel every System runs on its own event queue and gem5
+simulates them on separate host threads, synchronized every --sim-quantum.
+Without it all Systems share the main event queue and are interleaved on one
+thread. Either way gem5 starts and the Python config runs once for all of
+them.
+
+The boards do not exit at workbegin and workend, which carry no hint of the
+System that ran them. Instead every System times its own work items, and the
+per-System region statistics are read after the last process exits.
+
+The region records are therefore timing-only: one record per board and work
+item ID with the number of regions and the mean, standard deviation, minimum
+and maximum of their ticks. Without an exit per region there is no point to
+read the counters at, so unlike the region records of se_board.py they have
+no cycles, instructions, cache misses or memory traffic. summary.json has
+those counters for every board over the whole run, setup code included. Run
+a binary through se_board.py for its per-region counters.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from cores.M4_core import CortexM4Processor
+from boards.mcu_system import MCUSystem
+from boards.spec import BoardSpecError, load_spec, presets
+from memory.elf import check_placement
+from results.records import RegionRecordWriter
+from results.stats import StatReader
+
+import m5
+from m5.objects import (
+    Process,
+    Root,
+    SEWorkload,
+)
+from m5.util.convert import toLatency
+from gem5.components.processors.simple_processor import SimpleProcessor
+from gem5.isas import ISA
+from gem5.components.processors.cpu_types import CPUTypes
+
+parser = argparse.ArgumentParser(
+    description="Run several STM32 MCU boards side by side in one gem5 "
+        "process in SE mode."
+)
+parser.add_argument(
+    "--binary", type=str, action="append", required=True,
+    help="Path to the binary of one board. Can be repeated, once per board"
+)
+parser.add_argument(
+    "--board", type=str, action="append", default=[],
+    help="Board spec of every board, or once per --binary: one of the presets "
+        f"in boards/presets ({', '.join(presets())}) or the path to a spec "
+        "file. stm32g474 by default"
+)
+parser.add_argument(
+    "--set", type=str, action="append", default=[], metavar="KEY=VALUE",
+    help="Override a parameter of every board spec. Can be repeated"
+)
+parser.add_argument(
+    "--processor", type=str, default="cortex-m4",
+    choices=["cortex-m4", "simple-OOO"], help="Type of processor to use"
+)
+parser.add_argument(
+    "--parallel", action="store_true",
+    help="Simulate every board on its own event queue and host thread"
+)
+parser.add_argument(
+    "--sim-quantum", type=str, default="1us",
+    help="Simulated time the event queues of --parallel run ahead of each "
+        "other before they synchronize"
+)
+parser.add_argument(
+    "--num-work-ids", type=int, default=16,
+    help="Work item IDs 0 to this value minus one are timed"
+)
+parser.add_argument(
+    "--max-ticks", type=int, default=None,
+    help="Stop after this many ticks even if some boards are still running"
+)
+parser.add_argument(
+    "--region-output", type=str, default="regions.jsonl",
+    help="File the per-board region timing records are written to, relative "
+        "to the gem5 outdir. A .csv name writes CSV, anything else JSON "
+        "lines. They have no counters, see the top of the script"
+)
+args = parser.parse_args()
+
+binary_paths = [Path(binary) for binary in args.binary]
+for binary_path in binary_paths:
+    if not binary_path.is_file():
+        raise FileNotFoundError(f"Binary file '{binary_path.as_posix()}' does "
+                                "not exist.")
+boards = args.board or ["stm32g474"]
+if len(boards) == 1:
+    boards *= len(binary_paths)
+if len(boards) != len(binary_paths):
+    parser.error(f"give --board once or {len(binary_paths)} times, once per "
+                 "--binary")
+
+# ==== setup the boards ====
+systems = []
+processes = []
+for i, (binary_path, board) in enumerate(zip(binary_paths, boards)):
+    try:
+        spec = load_spec(board, args.set)
+    except BoardSpecError as error:
+        parser.error(f"board {i}: {error}")
+    system = MCUSystem(spec)
+    system.mem_mode = "timing"
+    # the work items are timed by the system instead of exiting, the exit
+    # event would not tell which system reached it
+    system.exit_on_work_items = False
+    system.num_work_ids = args.num_work_ids
+    if args.parallel:
+        # every SimObject of the system inherits the event queue
+        system.eventq_index = i
+
+    if args.processor == "cortex-m4":
+        processor = CortexM4Processor(num_cores=1, if_fpu=True)
+    else:
+        processor = SimpleProcessor(
+            cpu_type=CPUTypes.O3, num_cores=1, isa=ISA.ARM
+        )
+    system.processor = processor
+    for core in processor.get_cores():
+        system.connect_core(core, 0)
+    system.connect_dma_interrupt(list(processor.get_cores()))
+
+    process = Process(pid=100 + i)
+    process.executable = binary_path.as_posix()
+    process.cmd = [binary_path.as_posix()]
+    system.workload = SEWorkload.init_compatible(binary_path.as_posix())
+    check_placement(
+        binary_path,
+        regions=system.get_placement_regions(),
+        load_regions=["flash"],
+    )
+    for core in processor.get_cores():
+        core.set_workload(process)
+    print(f"board{i}: {binary_path.name} on {spec['name']}")
+    systems.append(system)
+    processes.append(process)
+# ==== end of boards setup ====
+
+# ==== setup the simulation ====
+root = Root(full_system=False)
+# a list of systems is named board0, board1, ...; a single one just board
+root.board = systems
+if args.parallel:
+    m5.ticks.fixGlobalFrequency()
+    root.sim_quantum = m5.ticks.fromSeconds(toLatency(args.sim_quantum))
+m5.instantiate()
+for system, process in zip(systems, processes):
+    system.map_process(process)
+# ==== end of simulation setup ====
+
+print("Beginning simulation!")
+if args.max_ticks is None:
+    exit_event = m5.simulate()
+else:
+    exit_event = m5.simulate(args.max_ticks)
+# the last process to exit ends the simulation
+print(f"Exiting @ tick {m5.curTick()} because {exit_event.getCause()}")
+m5.stats.dump()
+
+# ==== write the region records ====
+ticks_per_second = m5.ticks.fromSeconds(1.0)
+stat_reader = StatReader(root)
+record_writer = RegionRecordWriter(
+    Path(m5.options.outdir) / args.region_output
+)
+summary = {"tick": m5.curTick(), "cause": exit_event.getCause(), "boards": []}
+for i, (system, binary_path, board) in enumerate(
+    zip(systems, binary_paths, boards)
+):
+    core = list(system.processor.get_cores())[0].get_simobject()
+    # whole-run counters of the board, setup code included
+    fields = {
+        "cycles": f"{core.path()}.numCycles",
+        "icache_misses": f"{system.get_icache(0).path()}.overallMisses::total",
+        "dcache_misses": f"{system.get_dcache(0).path()}.overallMisses::total",
+    }
+    values = stat_reader.read(list(fields.values()))
+    board_summary = {
+        "board": system.path(),
+        "binary": binary_path.as_posix(),
+        "spec": system.get_spec()["name"],
+        "insts": core.totalInsts(),
+    }
+    board_summary.update({key: values[name] for key, name in fields.items()})
+    summary["boards"].append(board_summary)
+    # one record per work item ID the binary used, summarizing the ticks of
+    # its regions, the work item statistics hold no counters
+    for work_id in range(args.num_work_ids):
+        regions = stat_reader.read_distribution(
+            f"{system.path()}.work_item_type{work_id}"
+        )
+        if regions is None or regions["samples"] == 0:
+            continue
+        record = {
+            "board": system.path(),
+            "binary": binary_path.as_posix(),
+            "spec": system.get_spec()["name"],
+            "work_id": work_id,
+            "regions": regions["samples"],
+            "ticks": regions["mean"],
+            "seconds": regions["mean"] / ticks_per_second,
+            "ticks_stdev": regions["stdev"],
+            "ticks_min": regions["min"],
+            "ticks_max": regions["max"],
+        }
+        record_writer.write(record)
+        print(f"{system.path()} work item {work_id}: {regions['samples']} "
+              f"region(s), mean {regions['mean']:.1f} ticks")
+record_writer.close()
+print(f"Region records written to {record_writer.path.as_posix()}")
+summary_file = Path(m5.options.outdir) / "summary.json"
+summary_file.write_text(json.dumps(summary, indent=2))
+print(f"Summary written to {summary_file.as_posix()}")
+# ==== end of region records ====
@@ -0,0 +1,220 @@
+"""
+Calibratable energy model of an MCU: the static power of every voltage range
+and the energy of the events a region record counts, as a JSON file.
+
+Presets live next to this module in presets/, a model file anywhere else can
+be given by path, and every parameter can be overridden with a
+"key.path=value" string as in the board specs, e.g. "cycle_pj=175".
+
+The power that does not depend on what the code does is `static_mw` of the
+voltage range plus `cycle_pj` per clock cycle, so it grows with the clock
+frequency. On top of it, every committed instruction costs the energy of its
+class, every ART cache access, every byte read from or written to a memory
+and every byte the DMA controller moves costs its energy. The cycle and
+event energies are given at `reference_voltage` and scale with (core voltage
+/ reference voltage) ** `voltage_exponent`: 1 for a core behind a linear
+regulator, which draws its current from the supply at the supply voltage, 2
+for one behind a switching regulator. All energies are drawn from the supply.
+
+To calibrate a model, run kernels that stress one event each through
+se_board.py, measure their supply current on the board and fit the energies
+to the counts in the region records.
+"""
+
+import copy
+import json
+from pathlib import Path
+from typing import Optional
+
+from boards.spec import apply_override
+
+PRESET_DIR = Path(__file__).resolve().parent / "presets"
+
+# energies in pJ, powers in mW, voltages in V
+_NUMBERS = [
+    "reference_voltage", "voltage_exponent", "cycle_pj",
+    "icache_hit_pj", "icache_miss_pj", "dcache_hit_pj", "dcache_miss_pj",
+    "dma_byte_pj",
+]
+_TABLES = ["static_mw", "instruction_pj", "memory_byte_pj"]
+
+class PowerModelError(ValueError):
+    pass
+
+def presets() -> list[str]:
+    return sorted(path.stem for path in PRESET_DIR.glob("*.json"))
+
+def _number(value, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or \
+            value < 0:
+        raise PowerModelError(f"Bad value {value!r} for {where}: not a "
+                              "non-negative number.")
+    return float(value)
+
+def validate(params: dict) -> None:
+    """Raises a PowerModelError for the first problem found in `params`."""
+    expected = {"name", "description", "instruction_classes", *_NUMBERS,
+                *_TABLES}
+    unknown = sorted(set(params) - expected)
+    if unknown:
+        raise PowerModelError(f"Unknown key(s) {', '.join(unknown)} in the "
+                              "power model.")
+    missing = sorted(expected - set(params))
+    if missing:
+        raise PowerModelError(f"Missing key(s) {', '.join(missing)} in the "
+                              "power model.")
+    for key in _NUMBERS:
+        _number(params[key], key)
+    if params["reference_voltage"] == 0:
+        raise PowerModelError("reference_voltage must not be zero.")
+    for key in _TABLES:
+        if not isinstance(params[key], dict):
+            raise PowerModelError(f"{key} must be a mapping.")
+        for name, value in params[key].items():
+            _number(value, f"{key}.{name}")
+    for key in ["instruction_pj", "memory_byte_pj"]:
+        if "default" not in params[key]:
+            raise PowerModelError(f"{key} needs a default entry.")
+    classes = params["instruction_classes"]
+    seen = {}
+    for name, op_classes in classes.items():
+        if name == "default" or name not in params["instruction_pj"]:
+            raise PowerModelError(f"Instruction class {name!r} needs an "
+                                  "energy in instruction_pj and must not be "
+                                  "called default.")
+        for op_class in op_classes:
+            if op_class in seen:
+                raise PowerModelError(f"Op class {op_class} is in both "
+                                      f"{seen[op_class]} and {name}.")
+            seen[op_class] = name
+
+def load_model(model: str, overrides: list[str] = ()) -> "PowerModel":
+    """
+    Loads the preset called `model`, or the model file at that path, applies
+    the overrides in order and validates the result.
+    """
+    path = Path(model)
+    if not path.is_file():
+        path = PRESET_DIR / f"{model}.json"
+        if not path.is_file():
+            raise PowerModelError(f"'{model}' is neither a power model file "
+                                  "nor one of the presets "
+                                  f"{', '.join(presets())}.")
+    with open(path) as f:
+        params = copy.deepcopy(json.load(f))
+    for override in overrides:
+        try:
+            apply_override(params, override)
+        except ValueError as error:
+            raise PowerModelError(str(error))
+    validate(params)
+    return PowerModel(params)
+
+class PowerModel:
+    """
+    Energy of the regions of a run from the event counts of their records,
+    see the top of this module.
+    """
+    def __init__(self, params: dict) -> None:
+        self._params = params
+
+    def get_params(self) -> dict:
+        return self._params
+
+    def instruction_classes(self) -> dict[str, list[str]]:
+        """The op classes of every instruction class but the default one."""
+        return self._params["instruction_classes"]
+
+    def voltage_scale(self, voltage: float) -> float:
+        """Factor of the cycle and event energies at core `voltage`."""
+        params = self._params
+        return (voltage / params["reference_voltage"]) ** \
+            params["voltage_exponent"]
+
+    def static_power(
+        self, voltage_range: str, voltage: float, clock_hz: float
+    ) -> float:
+        """
+        Activity-independent power in W at `clock_hz` and core `voltage`,
+        with the clock cycles scaled like in region_energy().
+        """
+        static_mw = self._params["static_mw"]
+        if voltage_range not in static_mw:
+            raise PowerModelError(f"The power model has no static power for "
+                                  f"voltage range {voltage_range!r}.")
+        return static_mw[voltage_range] * 1e-3 + self._params["cycle_pj"] \
+            * self.voltage_scale(voltage) * 1e-12 * clock_hz
+
+    def region_energy(
+        self, record: dict, voltage_range: str, voltage: float,
+        memories: list[str]
+    ) -> dict[str, Optional[float]]:
+        """
+        Energy in J of a region record, split into its static, core, cache
+        and memory parts, and the average power in W. A part whose counts
+        the record lacks is None, and so is the total.
+        """
+        params = self._params
+        scale = self.voltage_scale(voltage)
+        seconds = record.get("seconds")
+        cycles = record.get("cycles")
+        energy = {
+            "energy_static_j": None,
+            "energy_core_j": None,
+            "energy_cache_j": None,
+            "energy_memory_j": None,
+        }
+        if seconds is not None:
+            energy["energy_static_j"] = \
+                params["static_mw"][voltage_range] * 1e-3 * seconds
+
+        # the clock and every committed instruction, by class. Instructions
+        # outside the listed classes cost the default energy.
+        insts = record.get("insts")
+        counts = {
+            name: record.get(f"insts_{name}")
+            for name in self.instruction_classes()
+        }
+        if cycles is not None and insts is not None:
+            pj = params["cycle_pj"] * cycles
+            instruction_pj = params["instruction_pj"]
+            if None in counts.values():
+                # no breakdown, every instruction at the default energy
+                pj += instruction_pj["default"] * insts
+            else:
+                pj += sum(
+                    instruction_pj[name] * count
+                    for name, count in counts.items()
+                )
+                pj += instruction_pj["default"] * \
+                    max(insts - sum(counts.values()), 0)
+            energy["energy_core_j"] = pj * scale * 1e-12
+
+        cache_counts = [
+            (record.get(f"{kind}_{counter}"), params[f"{kind}_{event}_pj"])
+            for kind in ["icache", "dcache"]
+            for counter, event in [("hits", "hit"), ("misses", "miss")]
+        ]
+        if None not in (count for count, _ in cache_counts):
+            energy["energy_cache_j"] = sum(
+                count * pj for count, pj in cache_counts
+            ) * scale * 1e-12
+
+        byte_pj = params["memory_byte_pj"]
+        pj = 0.0
+        for memory in memories:
+            read = record.get(f"{memory}_bytes_read")
+            written = record.get(f"{memory}_bytes_written")
+            if read is None or written is None:
+                pj = None
+                break
+            pj += (read + written) * byte_pj.get(memory, byte_pj["default"])
+        if pj is not None:
+            pj += (record.get("dma_bytes") or 0) * params["dma_byte_pj"]
+            energy["energy_memory_j"] = pj * scale * 1e-12
+
+        parts = list(energy.values())
+        energy["energy_j"] = sum(parts) if None not in parts else None
+        energy["power_w"] = energy["energy_j"] / seconds \
+            if energy["energy_j"] is not None and seconds else None
+        return energy
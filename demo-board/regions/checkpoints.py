@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import m5
+
+# prefix of the exit causes of the tick events that take the periodic
+# checkpoints
+CHECKPOINT_CAUSE = "periodic checkpoint"
+# written into a checkpoint directory once the checkpoint is complete
+STATE_FILE = "run_state.json"
+
+class PeriodicCheckpointer:
+    """
+    Takes a checkpoint into `directory` every `every_ticks` simulated ticks
+    and after every `every_regions` completed regions, keeping the latest
+    `keep` of them.
+
+    Every checkpoint is a directory cpt.<tick> with the gem5 checkpoint and
+    the state of the run script next to it. The state file is written last,
+    through a rename, so a run killed while checkpointing leaves no
+    checkpoint that looks complete, and `latest()` skips it.
+    """
+    def __init__(
+        self,
+        directory: Path,
+        every_ticks: Optional[int] = None,
+        every_regions: Optional[int] = None,
+        keep: int = 2,
+    ) -> None:
+        if keep < 1:
+            raise ValueError(f"At least one checkpoint must be kept, got "
+                             f"{keep}.")
+        self._directory = Path(directory)
+        self._every_ticks = every_ticks
+        self._every_regions = every_regions
+        self._keep = keep
+        # only the latest scheduled event is acted on, stale ones from
+        # before a checkpoint are ignored
+        self._expected_cause = None
+        self._num_events = 0
+        self._last_regions = None
+
+    def schedule(self) -> None:
+        """Schedules the next tick checkpoint, if taken by ticks."""
+        if self._every_ticks is None:
+            return
+        tick = (m5.curTick() // self._every_ticks + 1) * self._every_ticks
+        self._num_events += 1
+        self._expected_cause = f"{CHECKPOINT_CAUSE} {self._num_events}"
+        m5.scheduleTickExitAbs(tick, self._expected_cause)
+
+    def handles(self, cause: str) -> bool:
+        return cause.startswith(CHECKPOINT_CAUSE)
+
+    def is_due(self, cause: str) -> bool:
+        """Whether the exit `cause` is the scheduled tick checkpoint."""
+        return cause == self._expected_cause
+
+    def region_due(self, num_regions: int) -> bool:
+        """Whether a checkpoint is due after `num_regions` regions."""
+        if self._every_regions is None or num_regions == self._last_regions \
+                or num_regions % self._every_regions:
+            return False
+        self._last_regions = num_regions
+        return True
+
+    def take(self, state: dict) -> Path:
+        """
+        Checkpoints the simulation with the run `state` and removes the
+        checkpoints beyond the latest `keep`.
+        """
+        path = self._directory / f"cpt.{m5.curTick()}"
+        print(f"Taking checkpoint at tick {m5.curTick()}")
+        m5.checkpoint(path.as_posix())
+        temp = path / f"{STATE_FILE}.tmp"
+        with open(temp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        temp.replace(path / STATE_FILE)
+        print(f"Checkpoint written to {path.as_posix()}")
+        for old in self._complete()[:-self._keep]:
+            shutil.rmtree(old)
+        return path
+
+    def _complete(self) -> list[Path]:
+        # the complete checkpoints, oldest first
+        if not self._directory.is_dir():
+            return []
+        paths = [
+            path for path in self._directory.glob("cpt.*")
+            if (path / STATE_FILE).is_file()
+            and path.name.split(".", 1)[1].isdigit()
+        ]
+        return sorted(paths, key=lambda path: int(path.name.split(".")[1]))
+
+    def latest(self) -> Optional[tuple[Path, dict]]:
+        """The latest complete checkpoint and its run state, if any."""
+        complete = self._complete()
+        if not complete:
+            return None
+        path = complete[-1]
+        return path, json.loads((path / STATE_FILE).read_text())
@@ -0,0 +1,92 @@
+from typing import Optional
+
+from results.summary import summarize
+
+class RegionConvergence:
+    """
+    Tracks the per-region runtimes of a run and decides when enough regions
+    have been simulated.
+
+    The first `warmup` regions are left out of the statistics. The run is
+    done once the confidence interval of the mean runtime is within
+    `rel_error` of the mean (after at least `min_regions` measured regions),
+    once `max_regions` regions completed, or once `max_ticks` ticks passed
+    since the first workbegin.
+    """
+    def __init__(
+        self,
+        warmup: int = 0,
+        confidence: float = 0.95,
+        rel_error: Optional[float] = None,
+        min_regions: int = 2,
+        max_regions: Optional[int] = None,
+        max_ticks: Optional[int] = None,
+    ) -> None:
+        if not 0 < confidence < 1:
+            raise ValueError(f"Confidence must be in (0, 1), got "
+                             f"{confidence}.")
+        self._warmup = warmup
+        self._confidence = confidence
+        self._rel_error = rel_error
+        # a confidence interval needs two samples
+        self._min_regions = max(min_regions, 2)
+        self._max_regions = max_regions
+        self._max_ticks = max_ticks
+        self._first_tick = None
+        self._num_regions = 0
+        self._measured = []
+        self.stop_reason = None
+
+    def is_warmup(self, region: int) -> bool:
+        return region < self._warmup
+
+    def region_begin(self, tick: int) -> None:
+        if self._first_tick is None:
+            self._first_tick = tick
+
+    def remaining_ticks(self, tick: int) -> Optional[int]:
+        """Ticks left in the budget, None if unlimited."""
+        if self._max_ticks is None or self._first_tick is None:
+            return None
+        return max(self._first_tick + self._max_ticks - tick, 0)
+
+    def tick_budget_reached(self) -> None:
+        self.stop_reason = f"tick budget of {self._max_ticks} reached"
+
+    def region_end(self, runtime: int) -> bool:
+        """Record a region. Returns True if the simulation can stop."""
+        if not self.is_warmup(self._num_regions):
+            self._measured.append(runtime)
+        self._num_regions += 1
+        if self._max_regions is not None and \
+                self._num_regions >= self._max_regions:
+            self.stop_reason = f"{self._max_regions} regions reached"
+        elif self._rel_error is not None and \
+                len(self._measured) >= self._min_regions:
+            relative_error = self.summary()["relative_error"]
+            if relative_error is not None and \
+                    relative_error <= self._rel_error:
+                self.stop_reason = (
+                    f"relative error {relative_error:.4f} within "
+                    f"{self._rel_error}"
+                )
+        return self.stop_reason is not None
+
+    def state(self) -> dict:
+        """The regions recorded so far, for resuming from a checkpoint."""
+        return {
+            "first_tick": self._first_tick,
+            "num_regions": self._num_regions,
+            "measured": list(self._measured),
+        }
+
+    def restore(self, state: dict) -> None:
+        self._first_tick = state["first_tick"]
+        self._num_regions = state["num_regions"]
+        self._measured = list(state["measured"])
+
+    def summary(self) -> dict:
+        summary = summarize(self._measured, self._confidence)
+        summary["warmup"] = min(self._warmup, self._num_regions)
+        summary["stop_reason"] = self.stop_reason
+        return summary
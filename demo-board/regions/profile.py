@@ -0,0 +1,188 @@
+import bisect
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from memory.elf import Symbol
+
+# Thumb-2 instructions are 2 or 4 bytes, PCs further apart than this are not
+# in one straight-line run
+MAX_INST_BYTES = 4
+
+@dataclass
+class PCCount:
+    pc: int
+    commits: int
+    cycles: int
+    stall_cycles: int
+    icache_misses: int
+
+@dataclass
+class Hotspot:
+    """Counts summed over a function or a basic block."""
+    function: str
+    start: int
+    end: int
+    commits: int = 0
+    cycles: int = 0
+    stall_cycles: int = 0
+    icache_misses: int = 0
+    # number of times a basic block ran, unused for functions
+    executions: int = 0
+
+    def add(self, count: PCCount) -> None:
+        self.commits += count.commits
+        self.cycles += count.cycles
+        self.stall_cycles += count.stall_cycles
+        self.icache_misses += count.icache_misses
+
+class SymbolIndex:
+    """
+    Interval index over the function symbols of a binary: the sorted start
+    addresses are bisected to find the function an address belongs to.
+    """
+    def __init__(self, symbols: list[Symbol]) -> None:
+        self._symbols = sorted(symbols, key=lambda symbol: symbol.addr)
+        self._starts = [symbol.addr for symbol in self._symbols]
+
+    def lookup(self, addr: int) -> Optional[Symbol]:
+        i = bisect.bisect_right(self._starts, addr) - 1
+        if i < 0:
+            return None
+        symbol = self._symbols[i]
+        # symbols without a size, e.g. from assembly, reach up to the next one
+        if symbol.size and addr >= symbol.addr + symbol.size:
+            return None
+        return symbol
+
+def read_pc_profile(path: Path) -> list[PCCount]:
+    """Reads the CSV written by CommittedPCProfiler.dumpProfile()."""
+    with open(path, newline="") as f:
+        return [
+            PCCount(
+                pc=int(row["pc"], 16),
+                commits=int(row["commits"]),
+                cycles=int(row["cycles"]),
+                stall_cycles=int(row["stall_cycles"]),
+                icache_misses=int(row["icache_misses"]),
+            ) for row in csv.DictReader(f)
+        ]
+
+def hotspots(
+    counts: list[PCCount], index: SymbolIndex
+) -> tuple[list[Hotspot], list[Hotspot]]:
+    """
+    Sums the per-PC counts by function and by basic block, hottest first.
+
+    Without a disassembly the basic blocks are recovered from the counts:
+    neighbouring PCs of one function that committed equally often are taken
+    to be one straight-line block. Instruction cache misses are charged to
+    the fetch address, which may not be an instruction PC, and count towards
+    the block it falls into.
+    """
+    functions = {}
+    for count in counts:
+        symbol = index.lookup(count.pc)
+        name = symbol.name if symbol is not None else "<unknown>"
+        if name not in functions:
+            start = symbol.addr if symbol is not None else 0
+            end = symbol.addr + symbol.size if symbol is not None else 0
+            functions[name] = Hotspot(function=name, start=start, end=end)
+        functions[name].add(count)
+
+    blocks = []
+    committed = sorted(
+        (count for count in counts if count.commits),
+        key=lambda count: count.pc
+    )
+    for count in committed:
+        symbol = index.lookup(count.pc)
+        name = symbol.name if symbol is not None else "<unknown>"
+        block = blocks[-1] if blocks else None
+        if block is None or block.function != name or \
+                count.pc > block.end or \
+                count.commits != block.executions:
+            block = Hotspot(
+                function=name, start=count.pc, end=count.pc,
+                executions=count.commits
+            )
+            blocks.append(block)
+        block.end = count.pc + MAX_INST_BYTES
+        block.commits += count.commits
+        block.cycles += count.cycles
+        block.stall_cycles += count.stall_cycles
+    starts = [block.start for block in blocks]
+    for count in counts:
+        if not count.icache_misses:
+            continue
+        i = bisect.bisect_right(starts, count.pc) - 1
+        if i >= 0 and count.pc < blocks[i].end:
+            blocks[i].icache_misses += count.icache_misses
+
+    def by_cycles(hotspot: Hotspot):
+        return (-hotspot.cycles, -hotspot.icache_misses, hotspot.start)
+    return (
+        sorted(functions.values(), key=by_cycles),
+        sorted(blocks, key=by_cycles),
+    )
+
+def write_hotspots(path: Path, hotspots: list[Hotspot], blocks: bool) -> None:
+    total_cycles = sum(hotspot.cycles for hotspot in hotspots) or 1
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "function", "start", "end", *(["executions"] if blocks else []),
+            "commits", "cycles", "cycle_share", "stall_cycles",
+            "icache_misses"
+        ])
+        for hotspot in hotspots:
+            writer.writerow([
+                hotspot.function, f"{hotspot.start:#x}", f"{hotspot.end:#x}",
+                *([hotspot.executions] if blocks else []),
+                hotspot.commits, hotspot.cycles,
+                f"{hotspot.cycles / total_cycles:.4f}",
+                hotspot.stall_cycles, hotspot.icache_misses,
+            ])
+
+class RegionProfiler:
+    """
+    Profiles every measured region with the CommittedPCProfiler of the core
+    that runs it and writes the function and basic block hotspots of the
+    region to `outdir`/region<N>_functions.csv and region<N>_blocks.csv,
+    next to the raw per-PC counts in region<N>_pcs.csv.
+
+    `profilers` and `indexes` hold the profiler and the symbol index of the
+    binary of every core.
+    """
+    def __init__(
+        self, profilers: list, indexes: list[SymbolIndex], outdir: Path,
+        top: int = 5
+    ) -> None:
+        self._profilers = profilers
+        self._indexes = indexes
+        self._outdir = Path(outdir)
+        self._top = top
+
+    def begin(self, core_index: int) -> None:
+        self._profilers[core_index].resetProfile()
+
+    def end(self, region: int, core_index: int) -> list[Hotspot]:
+        """Writes the report of `region`, returns its hottest functions."""
+        self._outdir.mkdir(parents=True, exist_ok=True)
+        raw = self._outdir / f"region{region}_pcs.csv"
+        self._profilers[core_index].dumpProfile(raw.as_posix())
+        functions, blocks = hotspots(
+            read_pc_profile(raw), self._indexes[core_index]
+        )
+        write_hotspots(
+            self._outdir / f"region{region}_functions.csv", functions, False
+        )
+        write_hotspots(
+            self._outdir / f"region{region}_blocks.csv", blocks, True
+        )
+        for hotspot in functions[:self._top]:
+            print(f"  {hotspot.function}: {hotspot.cycles} cycles, "
+                  f"{hotspot.stall_cycles} stall cycles, "
+                  f"{hotspot.icache_misses} I-Cache misses")
+        return functions[:self._top]
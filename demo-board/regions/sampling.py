@@ -0,0 +1,116 @@
+from typing import Optional
+
+import m5
+
+from cores.switchable import FastForwardProcessor
+from results.summary import summarize
+
+# prefix of the exit causes of the instruction-count events that end the
+# phases of a sampling period
+SAMPLING_CAUSE = "sampling phase"
+
+class RegionSampler:
+    """
+    SMARTS-style sampled simulation of a measured region.
+
+    Every `interval` committed instructions are split into three phases:
+    `warmup` instructions on the detailed cores to fill the pipeline,
+    `window` measured instructions on the detailed cores, and the rest on the
+    atomic cores, which keeps the ART caches warm through functional
+    simulation. The region runtime is extrapolated from the mean CPI of the
+    measured windows and the instructions committed in the whole region, and
+    reported with the confidence interval of that mean.
+    """
+    def __init__(
+        self,
+        processor: FastForwardProcessor,
+        clock_period: int,
+        interval: int,
+        warmup: int,
+        window: int,
+        confidence: float = 0.95,
+    ) -> None:
+        if not 0 < warmup + window < interval:
+            raise ValueError("Sampling needs 0 < warmup + window < interval, "
+                             f"got warmup={warmup}, window={window} and "
+                             f"interval={interval}.")
+        self._processor = processor
+        self._clock_period = clock_period
+        self._interval = interval
+        self._warmup = warmup
+        self._window = window
+        self._confidence = confidence
+        self._phase = None
+        self._window_tick = 0
+        self._window_insts = 0
+        self._cpis = []
+        # only the latest scheduled event is acted on, stale ones left on
+        # switched-out cores or from an earlier region are ignored
+        self._expected_cause = None
+        self._num_events = 0
+
+    def _core(self):
+        return list(self._processor.get_cores())[0].get_simobject()
+
+    def _schedule(self, phase: str, insts: int) -> None:
+        self._phase = phase
+        self._num_events += 1
+        self._expected_cause = f"{SAMPLING_CAUSE} {self._num_events}"
+        self._core().scheduleInstStop(0, insts, self._expected_cause)
+
+    def begin(self) -> None:
+        # the region starts on the detailed cores
+        self._cpis = []
+        self._schedule("warmup", self._warmup)
+
+    def handles(self, cause: str) -> bool:
+        return cause.startswith(SAMPLING_CAUSE)
+
+    def handle_exit(self, cause: str) -> None:
+        if cause != self._expected_cause:
+            return
+        if self._phase == "warmup":
+            self._window_tick = m5.curTick()
+            self._window_insts = self._core().totalInsts()
+            self._schedule("window", self._window)
+        elif self._phase == "window":
+            cycles = (m5.curTick() - self._window_tick) / self._clock_period
+            insts = self._core().totalInsts() - self._window_insts
+            if insts > 0:
+                self._cpis.append(cycles / insts)
+            self._processor.switch_to_atomic()
+            self._schedule(
+                "functional", self._interval - self._warmup - self._window
+            )
+        else:
+            self._processor.switch_to_detailed()
+            self._schedule("warmup", self._warmup)
+
+    def end(self, insts: int) -> Optional[dict]:
+        """
+        Extrapolates the region from the windows measured in it. Returns
+        None if the region was too short to measure a single window; its
+        simulated ticks are then exact, since it never left the detailed
+        cores.
+        """
+        self._phase = None
+        self._expected_cause = None
+        if not self._cpis:
+            return None
+        summary = summarize(self._cpis, self._confidence)
+        cycles = summary["mean"] * insts
+        estimate = {
+            "windows": summary["n"],
+            "cpi": summary["mean"],
+            "cycles": cycles,
+            "ticks": round(cycles * self._clock_period),
+            "relative_error": summary["relative_error"],
+        }
+        if summary["ci_low"] is not None:
+            estimate["ticks_low"] = round(
+                summary["ci_low"] * insts * self._clock_period
+            )
+            estimate["ticks_high"] = round(
+                summary["ci_high"] * insts * self._clock_period
+            )
+        return estimate
@@ -0,0 +1,95 @@
+import m5
+from m5.objects import BaseCPU
+
+TRACE_MODES = ["off", "sampled", "text", "binary"]
+
+# prefix of the exit causes of the instruction-count events that open and
+# close sampled trace windows
+SAMPLE_CAUSE = "trace sample"
+
+class RegionTracer:
+    """
+    Turns instruction tracing on and off around the measured regions.
+
+    off:     no tracing, the regions run at full simulator speed.
+    sampled: text trace of the first `window` instructions of every `period`
+             committed instructions.
+    text:    text trace of every committed instruction (ExecAll).
+    binary:  protobuf trace of every committed instruction, written through
+             gem5's gzip-compressed, buffered proto output stream. The
+             detailed cores need the tracer from `make_binary_tracer()`.
+    """
+    def __init__(self, mode: str, period: int = 0, window: int = 0) -> None:
+        if mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace mode '{mode}', expected one of "
+                             f"{TRACE_MODES}.")
+        if mode == "sampled" and not 0 < window < period:
+            raise ValueError("Sampled tracing needs 0 < window < period, got "
+                             f"window={window} and period={period}.")
+        self._mode = mode
+        self._period = period
+        self._window = window
+        self._core = None
+        self._tracing = False
+        # only the latest scheduled event is acted on, stale ones left over
+        # from an earlier region are ignored
+        self._expected_cause = None
+        self._num_events = 0
+
+    def _flag(self) -> str:
+        # ExecEnable alone gates the protobuf tracer without printing the
+        # text trace
+        return "ExecEnable" if self._mode == "binary" else "ExecAll"
+
+    def _enable(self) -> None:
+        m5.debug.flags[self._flag()].enable()
+        self._tracing = True
+
+    def _disable(self) -> None:
+        if self._tracing:
+            m5.debug.flags[self._flag()].disable()
+            self._tracing = False
+
+    def _schedule(self, insts: int) -> None:
+        self._num_events += 1
+        self._expected_cause = f"{SAMPLE_CAUSE} {self._num_events}"
+        self._core.scheduleInstStop(0, insts, self._expected_cause)
+
+    def begin(self, core: BaseCPU) -> None:
+        if self._mode == "off":
+            return
+        print(f"Start {self._mode} trace")
+        self._core = core
+        self._enable()
+        if self._mode == "sampled":
+            self._schedule(self._window)
+
+    def end(self) -> None:
+        if self._mode == "off":
+            return
+        print(f"Stop {self._mode} trace")
+        self._disable()
+        self._core = None
+        self._expected_cause = None
+
+    def handles(self, cause: str) -> bool:
+        return cause.startswith(SAMPLE_CAUSE)
+
+    def handle_exit(self, cause: str) -> None:
+        if cause != self._expected_cause:
+            return
+        if self._tracing:
+            self._disable()
+            self._schedule(self._period - self._window)
+        else:
+            self._enable()
+            self._schedule(self._window)
+
+def make_binary_tracer(file_name: str):
+    try:
+        from m5.objects import InstPBTrace
+    except ImportError:
+        raise RuntimeError("--trace binary needs a gem5 build with protobuf "
+                           "support (InstPBTrace).")
+    # a .gz file name makes the proto output stream compress the trace
+    return InstPBTrace(file_name=file_name)
@@ -0,0 +1,280 @@
+"""
+Accuracy and speed regression check of the board model: runs the kernels of
+one or more reference manifests through se_board.py and compares the cycles
+of their measured regions with the reference cycle counts, e.g.
+
+    python3 regression.py --gem5 build/ARM/gem5.opt \
+        --baseline regression-out/results.json
+
+A manifest is a JSON file like simple-test/kernels/reference.json:
+
+    {
+        "board": "stm32g474",
+        "tolerance": 0.1,
+        "kernels": [
+            {"name": "int_alu", "binary": "int_alu.elf",
+             "reference_cycles": 2304, "source": "trm-estimate"}
+        ]
+    }
+
+Binaries are relative to the manifest. A kernel may override "board" and
+"tolerance", the allowed relative cycle error. "source" says where the
+reference comes from, e.g. "hardware" for DWT CYCCNT counts of a real board.
+A source ending in "estimate", like the "trm-estimate" cycles derived from
+the Technical Reference Manual, is not a measurement: the report marks those
+references with a ~ and counts the kernels checked against estimates
+separately.
+
+With --branch-model given more than once, every kernel runs with each of
+the branch models and the mean absolute error of every model is reported,
+e.g. the M4 static prediction against the default MinorCPU predictor.
+
+Every kernel outside its tolerance fails the check. With --baseline, the
+results.json of an earlier run, a kernel whose simulated instructions per
+host second dropped by more than --speed-tolerance fails as well, and every
+change in simulated cycles is listed. Run it with --jobs 1 on an otherwise
+idle host when the speed matters.
+
+This script runs with the host Python, not inside gem5.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+from typing import Optional
+
+from sweep import Job, run_pool
+
+DEFAULT_MANIFEST = (
+    Path(__file__).resolve().parent.parent / "simple-test" / "kernels"
+    / "reference.json"
+)
+
+def is_estimate(source: str) -> bool:
+    return source.endswith("estimate")
+
+def load_kernels(manifest_path: Path) -> list[dict]:
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    kernels = []
+    for kernel in manifest["kernels"]:
+        kernels.append({
+            "name": kernel["name"],
+            "binary": (manifest_path.parent / kernel["binary"]).resolve(),
+            "board": kernel.get("board", manifest.get("board", "stm32g474")),
+            "reference_cycles": kernel["reference_cycles"],
+            "source": kernel.get("source", "unknown"),
+            "tolerance": kernel.get(
+                "tolerance", manifest.get("tolerance", 0.1)
+            ),
+        })
+    return kernels
+
+def kernel_result(
+    kernel: dict, branch_model: Optional[str], job: Job
+) -> dict:
+    result = {
+        "name": kernel["name"],
+        "branch_model": branch_model,
+        "board": kernel["board"],
+        "source": kernel["source"],
+        "estimated_reference": is_estimate(kernel["source"]),
+        "reference_cycles": kernel["reference_cycles"],
+        "tolerance": kernel["tolerance"],
+        "status": job.status,
+        "process_seconds": job.wall_time,
+        "cycles": None,
+        "error": None,
+        "kips": None,
+        "passed": False,
+    }
+    regions = [
+        record for record in job.records if not record.get("warmup")
+    ]
+    if job.status != "ok" or not regions:
+        return result
+    cycles = [record.get("cycles") for record in regions]
+    if None in cycles:
+        return result
+    # a kernel may split its work over several regions
+    result["cycles"] = sum(int(value) for value in cycles)
+    result["error"] = (
+        (result["cycles"] - kernel["reference_cycles"])
+        / kernel["reference_cycles"]
+    )
+    result["passed"] = abs(result["error"]) <= kernel["tolerance"]
+    insts = sum(int(record["insts"]) for record in regions)
+    host_seconds = sum(
+        float(record.get("host_seconds") or 0) for record in regions
+    )
+    if host_seconds > 0:
+        result["kips"] = insts / host_seconds / 1000
+    return result
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the cycle accuracy and the simulation speed of the "
+            "board model on kernels with reference cycle counts."
+    )
+    parser.add_argument(
+        "--gem5", type=str, required=True, help="Path to the gem5 binary"
+    )
+    parser.add_argument(
+        "--manifest", type=str, action="append", default=[],
+        help="Reference manifest of kernels. Can be repeated, "
+            "simple-test/kernels/reference.json by default"
+    )
+    parser.add_argument(
+        "--set", type=str, action="append", default=[], metavar="KEY=VALUE",
+        help="Board spec override passed to se_board.py. Can be repeated"
+    )
+    parser.add_argument(
+        "--branch-model", type=str, action="append", default=[],
+        choices=["minor", "m4"],
+        help="Branch model passed to se_board.py. Can be repeated to compare "
+            "the models, se_board.py's default otherwise"
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=None,
+        help="results.json of an earlier run to compare the cycles and the "
+            "simulation speed with"
+    )
+    parser.add_argument(
+        "--speed-tolerance", type=float, default=0.2,
+        help="Fraction by which the KIPS of a kernel may drop below the "
+            "baseline"
+    )
+    parser.add_argument(
+        "--outdir", type=str, default="regression-out",
+        help="Directory for the gem5 output directories of the kernels and "
+            "results.json"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of gem5 processes to run at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None,
+        help="Kill a gem5 process after this many seconds"
+    )
+    args = parser.parse_args()
+
+    gem5 = Path(args.gem5)
+    if not gem5.is_file():
+        raise FileNotFoundError(f"gem5 binary '{gem5.as_posix()}' does not "
+                                "exist.")
+    kernels = []
+    for manifest in args.manifest or [DEFAULT_MANIFEST]:
+        kernels += load_kernels(Path(manifest))
+    for kernel in kernels:
+        if not kernel["binary"].is_file():
+            raise FileNotFoundError(f"Binary file "
+                                    f"'{kernel['binary'].as_posix()}' of "
+                                    f"kernel {kernel['name']} does not exist. "
+                                    "Build the kernels first.")
+    names = [kernel["name"] for kernel in kernels]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        parser.error(f"kernel name(s) {', '.join(duplicates)} appear more "
+                     "than once")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = {
+                (result["name"], result.get("branch_model")): result
+                for result in json.load(baseline_file)
+            }
+    outdir = Path(args.outdir).resolve()
+    extra_args = [arg for override in args.set for arg in ("--set", override)]
+
+    branch_models = args.branch_model or [None]
+    jobs = {}
+    for kernel in kernels:
+        for branch_model in branch_models:
+            params = {"board": kernel["board"]}
+            name = kernel["name"]
+            if branch_model is not None:
+                params["branch-model"] = branch_model
+            if len(branch_models) > 1:
+                name = f"{name}-{branch_model}"
+            jobs[kernel["name"], branch_model] = Job(
+                name=name,
+                binary=kernel["binary"],
+                params=params,
+                outdir=outdir / name,
+                extra_args=extra_args,
+            )
+    run_pool(list(jobs.values()), gem5, args.jobs, args.timeout, retries=0)
+
+    # ==== compare with the references ====
+    results = []
+    failures = 0
+    print(f"{'kernel':<22} {'reference':>10} {'simulated':>10} {'error':>8} "
+          f"{'KIPS':>9} {'baseline':>9}  source")
+    kernels_by_name = {kernel["name"]: kernel for kernel in kernels}
+    for (name, branch_model), job in jobs.items():
+        kernel = kernels_by_name[name]
+        result = kernel_result(kernel, branch_model, job)
+        results.append(result)
+        notes = []
+        if result["cycles"] is None:
+            notes.append(f"no cycles ({result['status']})")
+        elif not result["passed"]:
+            notes.append(f"outside +-{kernel['tolerance'] * 100:g}%")
+        previous = baseline.get((kernel["name"], branch_model))
+        previous_kips = previous.get("kips") if previous else None
+        if previous and previous.get("cycles") is not None and \
+                result["cycles"] is not None and \
+                previous["cycles"] != result["cycles"]:
+            notes.append(f"cycles changed from {previous['cycles']}")
+        if previous_kips and result["kips"] is not None and \
+                result["kips"] < previous_kips * (1 - args.speed_tolerance):
+            result["passed"] = False
+            notes.append("slower than the baseline")
+        failures += not result["passed"]
+        error = f"{result['error'] * 100:+7.2f}%" \
+            if result["error"] is not None else f"{'-':>8}"
+        kips = f"{result['kips']:9.1f}" if result["kips"] is not None \
+            else f"{'-':>9}"
+        baseline_kips = f"{previous_kips:9.1f}" if previous_kips \
+            else f"{'-':>9}"
+        cycles = result["cycles"] if result["cycles"] is not None else "-"
+        reference = ("~" if result["estimated_reference"] else "") \
+            + str(kernel["reference_cycles"])
+        print(f"{job.name:<22} {reference:>10} "
+              f"{cycles:>10} {error} {kips} {baseline_kips}  "
+              f"{kernel['source']}"
+              + (f"  {'; '.join(notes)}" if notes else ""))
+    if len(branch_models) > 1:
+        for branch_model in branch_models:
+            errors = [
+                abs(result["error"]) for result in results
+                if result["branch_model"] == branch_model
+                and result["error"] is not None
+            ]
+            if errors:
+                print(f"branch model {branch_model}: mean absolute error "
+                      f"{statistics.mean(errors) * 100:.2f}%, maximum "
+                      f"{max(errors) * 100:.2f}% over {len(errors)} "
+                      "kernel(s)")
+    # ==== end of comparison ====
+
+    outdir.mkdir(parents=True, exist_ok=True)
+    results_file = outdir / "results.json"
+    results_file.write_text(json.dumps(results, indent=2))
+    print(f"{len(results) - failures}/{len(results)} kernel(s) passed, "
+          f"results written to {results_file.as_posix()}")
+    estimated = [
+        result for result in results if result["estimated_reference"]
+    ]
+    if estimated:
+        print(f"{len(estimated)} kernel run(s) checked against estimated "
+              "reference cycles (~) rather than measurements, "
+              f"{sum(result['passed'] for result in estimated)} of them "
+              "passed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
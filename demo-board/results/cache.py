@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _scrub(value, replacements: dict[str, str]):
+    # the same binary at another path must map to the same key
+    if isinstance(value, dict):
+        return {key: _scrub(item, replacements) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_scrub(item, replacements) for item in value]
+    if isinstance(value, str):
+        return replacements.get(value, value)
+    return value
+
+def result_key(
+    binaries: list[Path], config: dict, build_identity: dict,
+    run_options: dict
+) -> str:
+    """
+    Hash of everything that decides the result of a run: the ELF contents
+    of the binary of every core, the full parameter set of the instantiated
+    SimObject tree, the gem5 build and the se_board options that are not
+    part of the SimObject tree.
+    """
+    digests = [file_digest(binary) for binary in binaries]
+    # every path of a binary, as given and resolved, stands for its contents
+    replacements = {}
+    for binary, digest in zip(binaries, digests):
+        for path in [binary, binary.resolve()]:
+            replacements[path.as_posix()] = f"<binary {digest}>"
+    config = _scrub(config, replacements)
+    blob = json.dumps(
+        {
+            "elf": digests,
+            "config": config,
+            "build": build_identity,
+            "options": run_options,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class ResultCache:
+    """
+    Directory of finished se_board results, one JSON file per key. Entries
+    are evicted least recently used first once the directory grows past
+    `max_bytes`.
+    """
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+
+    def _entry(self, key: str) -> Path:
+        return self._directory / f"{key}.json"
+
+    def lookup(self, key: str) -> Optional[dict]:
+        entry = self._entry(key)
+        try:
+            with open(entry) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # the modification time is the LRU timestamp
+        os.utime(entry)
+        return result
+
+    def store(self, key: str, result: dict) -> None:
+        # write to a temporary file first so that concurrent runs never see a
+        # partial entry
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, self._entry(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in self._directory.glob("*.json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # removed by a concurrent run
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,70 @@
+import resource
+import time
+from typing import Optional
+
+def peak_rss_mib() -> float:
+    """Peak resident set size of the gem5 process so far."""
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _rate(count: Optional[int], seconds: float) -> Optional[float]:
+    if count is None or seconds <= 0:
+        return None
+    return count / seconds
+
+class HostMeter:
+    """
+    Host-side cost of a run: the wall time of its phases, marked one after
+    the other with `mark()`, and the wall time, simulation rates and peak
+    memory of every region.
+
+    gem5 does not count the events it services, so the rate of simulated
+    core cycles stands in for the event rate. A Minor core schedules one
+    pipeline event per active cycle, the caches and the bus add a few per
+    memory access.
+    """
+    def __init__(self) -> None:
+        self._start = time.monotonic()
+        self._last_mark = self._start
+        self._phases = {}
+
+    def mark(self, phase: str) -> float:
+        """Ends `phase` now, it started at the previous mark."""
+        now = time.monotonic()
+        self._phases[phase] = now - self._last_mark
+        self._last_mark = now
+        return self._phases[phase]
+
+    def region_begin(self) -> float:
+        return time.monotonic()
+
+    def region_metrics(
+        self, begin: float, insts: Optional[int], cycles: Optional[int]
+    ) -> dict:
+        """Host metrics of a region that began at `begin`."""
+        seconds = time.monotonic() - begin
+        ips = _rate(insts, seconds)
+        return {
+            "host_seconds": seconds,
+            "host_kips": ips / 1000 if ips is not None else None,
+            "host_cycles_per_second": _rate(cycles, seconds),
+            "host_peak_rss_mib": peak_rss_mib(),
+        }
+
+    def summary(self, insts: Optional[int], cycles: Optional[int]) -> dict:
+        """Phase times and whole-run rates, for summary.json."""
+        wall = time.monotonic() - self._start
+        summary = {
+            f"{phase}_seconds": seconds
+            for phase, seconds in self._phases.items()
+        }
+        simulate = self._phases.get("simulate", wall)
+        ips = _rate(insts, simulate)
+        summary.update({
+            "wall_seconds": wall,
+            "insts": insts,
+            "kips": ips / 1000 if ips is not None else None,
+            "cycles_per_second": _rate(cycles, simulate),
+            "peak_rss_mib": peak_rss_mib(),
+        })
+        return summary
@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+
+def _flatten(record: dict) -> dict:
+    # the CSV format has one column per captured statistic
+    flat = {key: value for key, value in record.items() if key != "stats"}
+    for name, value in record.get("stats", {}).items():
+        flat[f"stat:{name}"] = value
+    return flat
+
+class RegionRecordWriter:
+    """
+    Streams one record per measured region to a JSON-lines or, if the file
+    name ends in ".csv", a CSV file. Every record is synced to disk as soon
+    as it is written.
+    """
+    def __init__(self, path: Path) -> None:
+        self._path = Path(path)
+        self._csv = self._path.suffix == ".csv"
+        self._file = open(self._path, "w", newline="")
+        self._csv_writer = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def write(self, record: dict) -> None:
+        if self._csv:
+            flat = _flatten(record)
+            if self._csv_writer is None:
+                self._csv_writer = csv.DictWriter(
+                    self._file, fieldnames=list(flat.keys()),
+                    extrasaction="ignore"
+                )
+                self._csv_writer.writeheader()
+            self._csv_writer.writerow(flat)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        # a record is on disk once written, even if the host goes down
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+def read_records(path: Path) -> Iterator[dict]:
+    path = Path(path)
+    with open(path, newline="") as f:
+        if path.suffix == ".csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def find_records(outdir: Path) -> Optional[Path]:
+    """Region records in a se_board output directory, if any."""
+    for name in ["regions.jsonl", "regions.csv"]:
+        if (Path(outdir) / name).is_file():
+            return Path(outdir) / name
+    return None
@@ -0,0 +1,118 @@
+from fnmatch import fnmatchcase
+from typing import Optional
+
+import math
+
+import _m5.stats
+from m5.objects import Root
+
+class StatReader:
+    """
+    Reads selected statistics straight from the gem5 stats tree instead of
+    parsing stats.txt.
+
+    Names follow stats.txt, e.g. "system.icache.overallHits::total". Vector
+    statistics are also reachable by their bare name, which gives the total.
+    The tree is walked once, on the first read, and only the selected
+    statistics are prepared and read afterwards.
+    """
+    def __init__(self, root: Root) -> None:
+        self._root = root
+        self._index = None
+
+    def _add(self, name: str, group, info, sub: Optional[int]) -> None:
+        self._index[name] = (group, info, sub)
+
+    def _walk(self, prefix: str, group) -> None:
+        for info in group.getStats():
+            name = f"{prefix}.{info.name}" if prefix else info.name
+            if isinstance(info, _m5.stats.ScalarInfo):
+                self._add(name, group, info, None)
+            elif isinstance(info, _m5.stats.DistInfo):
+                # distributions and histograms are only read whole, with
+                # read_distribution()
+                self._add(name, group, info, None)
+            elif isinstance(info, _m5.stats.VectorInfo):
+                self._add(name, group, info, None)
+                self._add(f"{name}::total", group, info, None)
+                subnames = list(info.subnames)
+                for i in range(info.size):
+                    sub = subnames[i] if i < len(subnames) and subnames[i] \
+                        else str(i)
+                    self._add(f"{name}::{sub}", group, info, i)
+        for child_name, child in group.getStatGroups().items():
+            self._walk(f"{prefix}.{child_name}" if prefix else child_name,
+                       child)
+
+    def _ensure_index(self) -> None:
+        if self._index is None:
+            self._index = {}
+            self._walk("", self._root)
+
+    def names(self, patterns: list[str]) -> list[str]:
+        """Expand shell-style patterns to the matching statistic names."""
+        self._ensure_index()
+        names = []
+        for pattern in patterns:
+            if pattern in self._index:
+                names.append(pattern)
+                continue
+            matches = sorted(
+                name for name in self._index if fnmatchcase(name, pattern)
+            )
+            if not matches:
+                print(f"Warning: no statistic matches '{pattern}'")
+            names += matches
+        return list(dict.fromkeys(names))
+
+    def read(self, names: list[str]) -> dict[str, Optional[float]]:
+        self._ensure_index()
+        selected = [self._index.get(name) for name in names]
+        groups = {id(s[0]): s[0] for s in selected if s is not None}
+        for group in groups.values():
+            group.preDumpStats()
+        values = {}
+        for name, entry in zip(names, selected):
+            if entry is None:
+                values[name] = None
+                continue
+            _, info, sub = entry
+            if isinstance(info, _m5.stats.DistInfo):
+                values[name] = None
+                continue
+            info.prepare()
+            value = info.value
+            if isinstance(info, _m5.stats.VectorInfo):
+                value = sum(value) if sub is None else value[sub]
+            values[name] = value
+        return values
+
+    def read_distribution(self, name: str) -> Optional[dict]:
+        """
+        Sample count, mean, standard deviation, minimum and maximum of a
+        distribution or histogram statistic, None if there is no such
+        statistic.
+        """
+        self._ensure_index()
+        entry = self._index.get(name)
+        if entry is None or not isinstance(entry[1], _m5.stats.DistInfo):
+            return None
+        group, info, _ = entry
+        group.preDumpStats()
+        info.prepare()
+        samples = sum(info.values) + info.underflow + info.overflow
+        if samples == 0:
+            return {"samples": 0, "mean": None, "stdev": None, "min": None,
+                    "max": None}
+        mean = info.sum / samples
+        stdev = None
+        if samples > 1:
+            variance = (info.squares - info.sum * mean) / (samples - 1)
+            stdev = math.sqrt(max(variance, 0.0))
+        return {
+            "samples": samples,
+            "mean": mean,
+            "stdev": stdev,
+            "min": info.min_val,
+            "max": info.max_val,
+        }
@@ -1,227 +1,1113 @@
 import argparse
+import json
+from itertools import islice
 from pathlib import Path
 
-from cores.M4_core import CortexM4Processor
-from cache.ART import ARTICache, ARTDCache
+from cores.M4_core import (
+    BRANCH_MODELS,
+    FU_POOLS,
+    CortexM4CPU,
+    CortexM4Processor,
+)
+from cores.switchable import FastForwardProcessor
+from boards.mcu_system import MCUSystem
+from boards.spec import BoardSpecError, load_spec, presets
+from memory.elf import check_placement, read_symbols
+from power.model import PowerModelError, load_model
+from regions.checkpoints import PeriodicCheckpointer
+from regions.convergence import RegionConvergence
+from regions.profile import RegionProfiler, SymbolIndex
+from regions.sampling import RegionSampler
+from regions.trace import TRACE_MODES, RegionTracer, make_binary_tracer
+from results.cache import ResultCache, result_key
+from results.host import HostMeter
+from results.records import RegionRecordWriter, read_records
+from results.stats import StatReader
+from results.summary import summarize
 
 import m5
 from m5.objects import (
-    AddrRange,
-    BadAddr,
-    CfiMemory,
     Process,
     # RedirectPath,
     Root,
     SEWorkload,
-    SimpleMemory,
-    SrcClockDomain,
-    System,
-    SystemXBar,
-    VoltageDomain,
-    NoncoherentXBar
 )
+from m5.util.convert import toFrequency, toMemorySize, toVoltage
+try:
+    # built into gem5 from gem5-extras
+    from m5.objects import CommittedPCProfiler
+except ImportError:
+    CommittedPCProfiler = None
+from gem5.components.processors.simple_core import SimpleCore
 from gem5.components.processors.simple_processor import SimpleProcessor
 from gem5.isas import ISA
 from gem5.components.processors.cpu_types import CPUTypes
 
+# the configuration phase runs from here to m5.instantiate()
+host_meter = HostMeter()
+
 parser = argparse.ArgumentParser(
-    description="Run a gem5 simulation with the demo stm32g4 MCU board in SE"
-        " mode."
+    description="Run a gem5 simulation with an STM32 MCU board in SE mode."
 )
 parser.add_argument(
-    "--binary", type=str, required=True, help="Path to the binary to run"
+    "--binary", type=str, action="append", required=True,
+    help="Path to the binary to run. Give it once to run the same binary on "
+        "every core, or once per core"
 )
 parser.add_argument(
     "--processor", type=str, default="cortex-m4",
     choices=["cortex-m4", "simple-OOO"], help="Type of processor to use"
 )
+parser.add_argument(
+    "--fu-pool", type=str, default="grouped", choices=FU_POOLS,
+    help="Functional units of the cortex-m4 processor. 'grouped' shares one "
+        "FU between the op classes of equal latency without a known "
+        "Cortex-M4 timing, 'per-op-class' gives each of them its own FU as "
+        "the original pool did. Both should simulate the same cycles, see "
+        "check_fu_pool.py"
+)
+parser.add_argument(
+    "--branch-model", type=str, default="minor", choices=BRANCH_MODELS,
+    help="Branch prediction of the cortex-m4 processor. 'minor' is the "
+        "MinorCPU tournament predictor, 'm4' the static not-taken prediction "
+        "of a real Cortex-M4 (needs gem5-extras)"
+)
+parser.add_argument(
+    "--branch-refill-delay", type=int, default=1,
+    help="With --branch-model m4, cycles from a taken branch in execute "
+        "until its target is fetched"
+)
+parser.add_argument(
+    "--num-cores", type=int, default=1,
+    help="Number of cores. Every core runs its binary as its own process with "
+        "its own ART caches, the memories and the bus are shared"
+)
+parser.add_argument(
+    "--work-ids-per-core", type=int, default=1000,
+    help="With several cores, core i marks its regions with the work item IDs "
+        "from i times this value on, so that overlapping regions of different "
+        "cores are told apart"
+)
+parser.add_argument(
+    "--fast-forward", action="store_true",
+    help="Run on an atomic CPU until the first workbegin, then switch to the "
+        "detailed processor"
+)
+parser.add_argument(
+    "--take-checkpoint", type=str, default=None,
+    help="Run on an atomic CPU until the first workbegin, take a checkpoint "
+        "into this directory and exit"
+)
+parser.add_argument(
+    "--restore-checkpoint", type=str, default=None,
+    help="Restore from a checkpoint taken with --take-checkpoint and run the "
+        "measured regions. --binary must be the binary it was taken with"
+)
+parser.add_argument(
+    "--checkpoint-every-ticks", type=int, default=None,
+    help="Take a checkpoint into --checkpoint-dir every this many simulated "
+        "ticks, for --resume"
+)
+parser.add_argument(
+    "--checkpoint-every-regions", type=int, default=None,
+    help="Take a checkpoint into --checkpoint-dir after every this many "
+        "completed regions, for --resume"
+)
+parser.add_argument(
+    "--checkpoint-dir", type=str, default=None,
+    help="Directory of the periodic checkpoints, 'checkpoints' in the gem5 "
+        "outdir by default"
+)
+parser.add_argument(
+    "--keep-checkpoints", type=int, default=2,
+    help="Number of the latest periodic checkpoints to keep"
+)
+parser.add_argument(
+    "--resume", action="store_true",
+    help="Continue from the latest periodic checkpoint in --checkpoint-dir, "
+        "with the regions completed before it, or start from the beginning "
+        "if there is none. Run with the options and the gem5 outdir of the "
+        "interrupted run"
+)
+parser.add_argument(
+    "--board", type=str, default="stm32g474",
+    help="Board spec: one of the presets in boards/presets "
+        f"({', '.join(presets())}) or the path to a JSON or YAML spec file"
+)
+parser.add_argument(
+    "--set", type=str, action="append", default=[], metavar="KEY=VALUE",
+    help="Override a parameter of the board spec, e.g. "
+        "memories.sram1.latency=5ns or icache.prefetch=false. Can be repeated"
+)
+parser.add_argument(
+    "--power-set", type=str, action="append", default=[], metavar="KEY=VALUE",
+    help="Override a parameter of the board's power model (power_model in "
+        "the board spec), e.g. cycle_pj=175. Can be repeated"
+)
+parser.add_argument(
+    "--dump-board", action="store_true",
+    help="Print the board spec with all overrides applied and exit"
+)
+# shortcuts for the --set overrides that sweeps use the most
+parser.add_argument(
+    "--clock", type=str, default=None,
+    help="Core and bus clock frequency (clock)"
+)
+parser.add_argument(
+    "--icache-size", type=str, default=None,
+    help="Size of the ART I-Cache (icache.size)"
+)
+parser.add_argument(
+    "--icache-assoc", type=int, default=None,
+    help="Associativity of the ART I-Cache (icache.assoc)"
+)
+parser.add_argument(
+    "--dcache-size", type=str, default=None,
+    help="Size of the ART D-Cache (dcache.size)"
+)
+parser.add_argument(
+    "--dcache-assoc", type=int, default=None,
+    help="Associativity of the ART D-Cache (dcache.assoc)"
+)
+parser.add_argument(
+    "--voltage-range", type=str, default=None,
+    help="Dynamic voltage scaling range of the board spec, sets the core "
+        "voltage and the flash wait states needed at the clock "
+        "(voltage_range)"
+)
+parser.add_argument(
+    "--flash-wait-states", type=int, default=None,
+    help="Flash wait states. Derived from the clock and the voltage range by "
+        "default (flash.wait_states)"
+)
+parser.add_argument(
+    "--flash-latency", type=str, default=None,
+    help="Override the access latency of the flash memory that follows from "
+        "the wait states (flash.latency)"
+)
+parser.add_argument(
+    "--ccm-latency", type=str, default=None,
+    help="Access latency of the CCM SRAM (memories.ccm_sram.latency)"
+)
+parser.add_argument(
+    "--ccm-bandwidth", type=str, default=None,
+    help="Bandwidth of the CCM SRAM (memories.ccm_sram.bandwidth)"
+)
+parser.add_argument(
+    "--no-art-prefetch", action="store_true",
+    help="Disable the ART I-Cache prefetcher (icache.prefetch=false)"
+)
+parser.add_argument(
+    "--sram-latency", type=str, default=None,
+    help="Access latency of every memory whose name starts with 'sram' "
+        "(memories.sram*.latency)"
+)
+parser.add_argument(
+    "--result-cache", type=str, default=None,
+    help="Directory of cached results. A run whose binary, board parameters "
+        "and gem5 build are already in it returns the stored results without "
+        "simulating. Not used with --take-checkpoint, --profile, --trace or "
+        "--art-trace"
+)
+parser.add_argument(
+    "--result-cache-size", type=str, default="1GiB",
+    help="Maximum size of the result cache directory"
+)
+parser.add_argument(
+    "--trace", type=str, default="off", choices=TRACE_MODES,
+    help="Instruction trace of the measured regions. 'text' is the full "
+        "ExecAll trace (use gem5's --debug-file to redirect it), 'sampled' "
+        "traces a window of every --trace-period instructions and 'binary' "
+        "writes a compressed protobuf trace to --trace-file"
+)
+parser.add_argument(
+    "--trace-period", type=int, default=100000,
+    help="Instructions between the starts of two sampled trace windows"
+)
+parser.add_argument(
+    "--trace-window", type=int, default=1000,
+    help="Instructions traced in every sampled trace window"
+)
+parser.add_argument(
+    "--trace-file", type=str, default="trace.pb.gz",
+    help="Output file of the binary trace, relative to the gem5 outdir"
+)
+parser.add_argument(
+    "--region-output", type=str, default="regions.jsonl",
+    help="File the per-region records are streamed to, relative to the gem5 "
+        "outdir. A .csv name writes CSV, anything else JSON lines"
+)
+parser.add_argument(
+    "--stat", type=str, action="append", default=[],
+    help="Statistic to capture in every region record, named as in "
+        "stats.txt. Shell-style wildcards are allowed. Can be repeated"
+)
+parser.add_argument(
+    "--stats-allowlist", type=str, default=None,
+    help="File with one --stat pattern per line"
+)
+parser.add_argument(
+    "--dump-stats", action="store_true",
+    help="Also dump the full stats tree to stats.txt at every workend"
+)
+parser.add_argument(
+    "--warmup-regions", type=int, default=0,
+    help="Number of leading regions left out of the runtime statistics"
+)
+parser.add_argument(
+    "--confidence", type=float, default=0.95,
+    help="Confidence level of the reported runtime confidence interval"
+)
+parser.add_argument(
+    "--target-rel-error", type=float, default=None,
+    help="Stop once the confidence interval half-width of the mean region "
+        "runtime is within this fraction of the mean"
+)
+parser.add_argument(
+    "--min-regions", type=int, default=2,
+    help="Measured regions needed before --target-rel-error can stop the run"
+)
+parser.add_argument(
+    "--max-regions", type=int, default=None,
+    help="Stop after this many regions, warm-up regions included"
+)
+parser.add_argument(
+    "--max-ticks", type=int, default=None,
+    help="Stop once this many ticks passed since the first workbegin"
+)
+parser.add_argument(
+    "--sampling", action="store_true",
+    help="Simulate the measured regions in SMARTS-style samples: short "
+        "detailed windows between functional fast-forwarding that keeps the "
+        "ART caches warm. Implies --fast-forward"
+)
+parser.add_argument(
+    "--sampling-interval", type=int, default=1000000,
+    help="Committed instructions per sampling period"
+)
+parser.add_argument(
+    "--sampling-warmup", type=int, default=2000,
+    help="Detailed instructions before every measured window"
+)
+parser.add_argument(
+    "--sampling-window", type=int, default=1000,
+    help="Measured detailed instructions per sampling period"
+)
+parser.add_argument(
+    "--art-trace", action="store_true",
+    help="Record the requests at the CPU-side ports of the ART I-Cache and "
+        "D-Cache into art_icache.trc.gz and art_dcache.trc.gz for "
+        "art_replay.py"
+)
+parser.add_argument(
+    "--profile", action="store_true",
+    help="Count the commits, cycles, stall cycles and ART I-Cache misses of "
+        "every PC in the measured regions and write per-region function and "
+        "basic block hotspots to --profile-dir. Needs gem5-extras"
+)
+parser.add_argument(
+    "--profile-sample-period", type=int, default=1,
+    help="Profile every this many commits instead of every commit"
+)
+parser.add_argument(
+    "--profile-dir", type=str, default="profile",
+    help="Directory of the profile reports, relative to the gem5 outdir"
+)
 args = parser.parse_args()
 
-binary_path = Path(args.binary)
-if not binary_path.is_file():
-    raise FileNotFoundError(f"Binary file '{binary_path.as_posix()}' does not "
-                            "exist.")
+if args.take_checkpoint and args.restore_checkpoint:
+    parser.error("--take-checkpoint and --restore-checkpoint are exclusive")
+if args.restore_checkpoint and args.fast_forward:
+    parser.error("a restored checkpoint already starts at the first workbegin,"
+                 " --fast-forward is not needed")
+if args.sampling and (args.take_checkpoint or args.restore_checkpoint):
+    parser.error("--sampling switches between atomic and detailed cores, "
+                 "which does not match the processor of a checkpoint")
+if args.num_cores < 1:
+    parser.error("--num-cores must be at least 1")
+if len(args.binary) not in (1, args.num_cores):
+    parser.error(f"give --binary once or {args.num_cores} times, once per "
+                 "core")
+if args.profile and (args.sampling or args.take_checkpoint):
+    parser.error("--profile needs the detailed cores for the whole region, "
+                 "which --sampling and --take-checkpoint do not run")
+if args.num_cores > 1 and (args.sampling or args.trace != "off"):
+    parser.error("--sampling and --trace follow a single core, they cannot be "
+                 "used with --num-cores")
+if args.branch_refill_delay < 1:
+    parser.error("--branch-refill-delay must be at least 1")
+periodic_checkpoints = args.checkpoint_every_ticks is not None or \
+    args.checkpoint_every_regions is not None
+for option in ["checkpoint_every_ticks", "checkpoint_every_regions"]:
+    if getattr(args, option) is not None and getattr(args, option) < 1:
+        parser.error(f"--{option.replace('_', '-')} must be at least 1")
+if (periodic_checkpoints or args.resume) and (
+    args.fast_forward or args.sampling or args.take_checkpoint
+    or args.profile or args.trace != "off"
+):
+    # a checkpoint restores onto the processor it was taken with and keeps
+    # none of the state of the profiler and the tracer
+    parser.error("periodic checkpoints and --resume cannot be combined with "
+                 "--fast-forward, --sampling, --take-checkpoint, --profile or "
+                 "--trace. Use --restore-checkpoint to skip the setup code")
+if args.resume and args.region_output.endswith(".csv"):
+    parser.error("--resume reloads the completed regions, which needs JSON "
+                 "lines --region-output")
+# sampling switches between the atomic and the detailed cores
+switchable = args.fast_forward or args.sampling
+
+binary_paths = [Path(binary) for binary in args.binary]
+for binary_path in binary_paths:
+    if not binary_path.is_file():
+        raise FileNotFoundError(f"Binary file '{binary_path.as_posix()}' does "
+                                "not exist.")
+if len(binary_paths) == 1:
+    binary_paths *= args.num_cores
+binary_path = binary_paths[0]
+if args.restore_checkpoint and not Path(args.restore_checkpoint).is_dir():
+    raise FileNotFoundError(f"Checkpoint directory "
+                            f"'{args.restore_checkpoint}' does not exist.")
+
+# ==== setup the board spec ====
+overrides = []
+for option, key in [
+    ("clock", "clock"),
+    ("icache_size", "icache.size"),
+    ("icache_assoc", "icache.assoc"),
+    ("dcache_size", "dcache.size"),
+    ("dcache_assoc", "dcache.assoc"),
+    ("voltage_range", "voltage_range"),
+    ("flash_wait_states", "flash.wait_states"),
+    ("flash_latency", "flash.latency"),
+    ("ccm_latency", "memories.ccm_sram.latency"),
+    ("ccm_bandwidth", "memories.ccm_sram.bandwidth"),
+]:
+    if getattr(args, option) is not None:
+        overrides.append(f"{key}={getattr(args, option)}")
+if args.no_art_prefetch:
+    overrides.append("icache.prefetch=false")
+try:
+    if args.sram_latency is not None:
+        # the names of the memories are only known from the spec
+        overrides += [
+            f"memories.{name}.latency={args.sram_latency}"
+            for name in load_spec(args.board)["memories"]
+            if name.startswith("sram")
+        ]
+    # --set comes last so it wins over the shortcuts
+    spec = load_spec(args.board, overrides + args.set)
+except BoardSpecError as error:
+    parser.error(str(error))
+if args.dump_board:
+    print(json.dumps(spec, indent=4))
+    raise SystemExit(0)
+# the spec the run used, for reproducing it
+(Path(m5.options.outdir) / "board.json").write_text(json.dumps(spec, indent=4))
+# ==== end of board spec setup ====
+
+# ==== setup the power model ====
+power_model = None
+if spec["power_model"] is not None:
+    core_voltage = toVoltage(
+        spec["voltage_ranges"][spec["voltage_range"]]["voltage"]
+    )
+    try:
+        power_model = load_model(spec["power_model"], args.power_set)
+        static_power = power_model.static_power(
+            spec["voltage_range"], core_voltage, toFrequency(spec["clock"])
+        )
+    except PowerModelError as error:
+        parser.error(str(error))
+    print(f"Power model {power_model.get_params()['name']}: "
+          f"{static_power * 1e3:.2f} mW without activity at {spec['clock']}")
+    # the model the run used, for reproducing its energies
+    (Path(m5.options.outdir) / "power.json").write_text(
+        json.dumps(power_model.get_params(), indent=4)
+    )
+elif args.power_set:
+    parser.error(f"board {spec['name']} has no power model for --power-set")
+# ==== end of power model setup ====
 
-system = System()
+system = MCUSystem(spec, num_cores=args.num_cores, art_trace=args.art_trace)
+print(f"Board {spec['name']}: flash runs with {system.get_wait_states()} wait "
+      f"state(s) at {spec['clock']}")
 
-system.clk_domain = SrcClockDomain()
-system.clk_domain.clock = "100MHz"
-system.clk_domain.voltage_domain = VoltageDomain()
-system.mem_mode = "timing"
+# the atomic cores used for fast-forwarding need atomic memory accesses,
+# switching to the detailed cores changes it back to timing
+if switchable or args.take_checkpoint:
+    system.mem_mode = "atomic"
+else:
+    system.mem_mode = "timing"
 # simulation exits when "work_begin" or "work_end" m5ops are executed
 system.exit_on_work_items = True
-# set cache line size to 32 bytes as in STM32G4
-system.cache_line_size = 32
 
 # ==== setup the CPU ====
-# single core Cortex-M4 with FPU
-if args.processor == "cortex-m4":
-    processor = CortexM4Processor(num_cores=1, if_fpu=True)
+# Cortex-M4 cores with FPU
+num_cores = args.num_cores
+if args.take_checkpoint:
+    # the setup code only needs to be functionally correct, and a plain
+    # processor keeps the core at the same path in the checkpoint as the
+    # processor it is restored with, whichever type that is
+    processor = SimpleProcessor(
+        cpu_type=CPUTypes.ATOMIC, num_cores=num_cores, isa=ISA.ARM
+    )
+    all_cores = list(processor.get_cores())
+    detailed_cores = []
+elif switchable:
+    if args.processor == "cortex-m4":
+        detailed_cores = [
+            CortexM4CPU(
+                if_fpu=True, core_id=i, fu_pool=args.fu_pool,
+                branch_model=args.branch_model,
+                branch_refill_delay=args.branch_refill_delay
+            ) for i in range(num_cores)
+        ]
+    else:
+        detailed_cores = [
+            SimpleCore(cpu_type=CPUTypes.O3, core_id=i, isa=ISA.ARM)
+            for i in range(num_cores)
+        ]
+    processor = FastForwardProcessor(detailed_cores=detailed_cores)
+    processor.set_system(system)
+    all_cores = list(processor.get_all_cores())
+elif args.processor == "cortex-m4":
+    processor = CortexM4Processor(
+        num_cores=num_cores, if_fpu=True, fu_pool=args.fu_pool,
+        branch_model=args.branch_model,
+        branch_refill_delay=args.branch_refill_delay
+    )
+    all_cores = list(processor.get_cores())
+    detailed_cores = all_cores
 else:
-    processor = SimpleProcessor(cpu_type=CPUTypes.O3, num_cores=1, isa=ISA.ARM)
+    processor = SimpleProcessor(
+        cpu_type=CPUTypes.O3, num_cores=num_cores, isa=ISA.ARM
+    )
+    all_cores = list(processor.get_cores())
+    detailed_cores = all_cores
 system.processor = processor
-# ==== end of CPU setup ====
+# all_cores lists the cores of every switchable processor one after the
+# other, so core i of each of them is at the positions i modulo num_cores
+core_groups = [all_cores[i::num_cores] for i in range(num_cores)]
 
-# ==== setup memory ranges ====
-# flash memory 512 KBytes
-flash_memory = AddrRange(start=0x08000000, size="512KiB")
-# sram 1 has 80 KBytes
-sram1 = AddrRange(start=0x20000000, size="80KiB")
-# sram 2 has 16 KBytes
-sram2 = AddrRange(start=0x20014000, size="16KiB")
-# m5op region 1 MiBytes
-m5op_region = AddrRange(start=0x20020000, size="1MiB")
-# record memory ranges in system
-system.mem_ranges = [flash_memory, sram1, sram2]
-# ==== end of memory ranges setup ====
-
-# ==== setup the memory bus ====
-# create a memory bus for the system
-system.membus = NoncoherentXBar(
-    # copy from SystemXBar
-    # 128-bit crossbar by default
-    width = 16,
-
-    # A handful pipeline stages for each portion of the latency
-    # contributions.
-    frontend_latency = 0,
-    forward_latency = 0,
-    response_latency = 0
-)
-# bad address responder so when the CPU accesses an unmapped address, the
-# simulation will panic
-system.membus.badaddr_responder = BadAddr()
-system.membus.default = system.membus.badaddr_responder.pio
-# the max. routing table size needs to be set to a higher value for HBM2 stack
-# system.membus.max_routing_table_size = 2048
-
-# create Flash memory and connect it to the membus
-system.flash_memory = SimpleMemory()
-system.flash_memory.range = flash_memory
-system.flash_memory.port = system.membus.mem_side_ports
-system.flash_memory.latency = "40ns"
-system.flash_memory.bandwidth = "190MiB/s"
-
-# create SRAM 1 memory and connect it to the membus
-system.sram1 = SimpleMemory()
-system.sram1.range = sram1
-system.sram1.port = system.membus.mem_side_ports
-system.sram1.latency = "10ns"
-system.sram1.bandwidth = "400MiB/s"
-
-# create SRAM 2 memory and connect it to the membus
-system.sram2 = SimpleMemory()
-system.sram2.range = sram2
-system.sram2.port = system.membus.mem_side_ports
-system.sram2.latency = "10ns"
-system.sram2.bandwidth = "400MiB/s"
-
-# ART I-Cache+prefetcher and D-Cache
-system.icache = ARTICache(flash_addr_range=flash_memory)
-system.dcache = ARTDCache(flash_addr_range=flash_memory)
-
-# this part bypasses the cache hierarchy and connects the cores directly to the
-# membus
-for core in system.processor.get_cores():
-    core.connect_icache(system.icache.cpu_side)
-    core.connect_dcache(system.dcache.cpu_side)
-
-    system.icache.mem_side = system.membus.cpu_side_ports
-    system.dcache.mem_side = system.membus.cpu_side_ports
-    # because Cortex M-class does not have an MMU, the walker ports are not
-    # used. However, we still need to connect them to something, so we connect
-    # them to the membus due to the tightly coupled nature of the MinorCPU with
-    # the MMU
-    core.connect_walker_ports(
-        system.membus.cpu_side_ports, system.membus.cpu_side_ports
-    )
-    core.connect_interrupt()
+# only the cores that run the measured regions are traced
+tracer = RegionTracer(
+    mode=args.trace, period=args.trace_period, window=args.trace_window
+)
+if args.trace == "binary":
+    for core in detailed_cores:
+        core.get_simobject().tracer = make_binary_tracer(args.trace_file)
+# ==== end of CPU setup ====
 
-# set the system port for functional access from the simulator
-system.system_port = system.membus.cpu_side_ports
+pc_profilers = []
+if args.profile:
+    if CommittedPCProfiler is None:
+        raise RuntimeError("--profile needs gem5 built with gem5-extras "
+                           "(CommittedPCProfiler).")
+    for i, core in enumerate(detailed_cores):
+        cpu = core.get_simobject()
+        cpu.pc_profiler = CommittedPCProfiler(
+            manager=cpu,
+            icache=system.get_icache(i),
+            sample_period=args.profile_sample_period,
+        )
+        pc_profilers.append(cpu.pc_profiler)
 
-# ==== end of memory bus setup ====
+# only the running cores are connected, switched-out cores take over the ports
+# of the cores they replace
+for i, core in enumerate(processor.get_cores()):
+    system.connect_core(core, i)
+# DMA completion interrupts go to core 0, whichever of its group is running
+system.connect_dma_interrupt(core_groups[0])
 
 # ==== setup the process ====
-# create the process
-process = Process()
-process.executable = binary_path.as_posix()
-process.cmd = [binary_path.as_posix()]
+# create one process per core, the cores share the physical memories
+processes = []
+for i, path in enumerate(binary_paths):
+    process = Process(pid=100 + i)
+    process.executable = path.as_posix()
+    process.cmd = [path.as_posix()]
+    processes.append(process)
 
 system.workload = SEWorkload.init_compatible(binary_path.as_posix())
 
-system.m5ops_base = m5op_region.start
+# check that every segment fits the memory map and report where the sections
+# of the binaries run from
+ram_sections = []
+for i, path in enumerate(binary_paths):
+    placement = check_placement(
+        path,
+        regions=system.get_placement_regions(),
+        load_regions=["flash"],
+    )
+    for region, sections in placement.items():
+        if sections and (i == 0 or path != binary_paths[i - 1]):
+            print(f"{region}: " + ", ".join(
+                f"{section.name} ({section.size} B)" for section in sections
+            ))
+        if region != "flash":
+            ram_sections += [(i, section) for section in sections]
+# the cores see the same SRAM, data that two cores place at the same address
+# is shared between them
+for i, section in ram_sections:
+    for j, other in ram_sections:
+        if i < j and section.addr < other.addr + other.size and \
+                other.addr < section.addr + section.size:
+            print(f"Warning: {section.name} of core {i} and {other.name} of "
+                  f"core {j} overlap in memory")
 
-# set the process for the core
-for core in system.processor.get_cores():
-    core.set_workload(process)
+# set the process for the cores, core i of every switchable processor runs the
+# same process
+for i, cores in enumerate(core_groups):
+    for core in cores:
+        core.set_workload(processes[i])
 
 # ==== end of process setup ====
 
 # ==== setup the simulation ====
+checkpointer = None
+resumed = None
+if periodic_checkpoints or args.resume:
+    checkpointer = PeriodicCheckpointer(
+        Path(args.checkpoint_dir or Path(m5.options.outdir) / "checkpoints"),
+        every_ticks=args.checkpoint_every_ticks,
+        every_regions=args.checkpoint_every_regions,
+        keep=args.keep_checkpoints,
+    )
+    if args.resume:
+        # the path of the latest checkpoint and the run state saved with it
+        resumed = checkpointer.latest()
+        if resumed is None:
+            print("No checkpoint to resume from, starting from the beginning")
+restore_path = args.restore_checkpoint
+if resumed is not None:
+    restore_path = resumed[0].as_posix()
 # create the root of the system
 root = Root(full_system=False, system=system)
-# instantiate the system
-m5.instantiate()
+# instantiate the system, restoring the memory and the process state from the
+# checkpoint if one is given
+host_meter.mark("config")
+m5.instantiate(restore_path)
+host_meter.mark("instantiate")
 # ==== end of simulation setup ====
 
-process.map(sram1.start, sram1.start, sram1.size())
-process.map(sram2.start, sram2.start, sram2.size())
-process.map(m5op_region.start, m5op_region.start , m5op_region.size())
+# the page table is part of the checkpoint, so the mappings are only needed
+# for a fresh start
+if not restore_path:
+    for process in processes:
+        system.map_process(process)
 
 print(f"Currently at {Path().absolute()}")
 
+stat_patterns = list(args.stat)
+if args.stats_allowlist:
+    with open(args.stats_allowlist) as allowlist:
+        stat_patterns += [
+            line.strip() for line in allowlist
+            if line.strip() and not line.startswith("#")
+        ]
+
+# ==== look up the result cache ====
+result_cache = None
+cached_result = None
+# a checkpointing run produces no results to cache, and the profile reports
+# and traces are not part of the cached results. A cache hit would skip the
+# simulation that writes them.
+if args.result_cache and not args.take_checkpoint and not args.profile \
+        and args.trace == "off" and not args.art_trace:
+    result_cache = ResultCache(
+        Path(args.result_cache), toMemorySize(args.result_cache_size)
+    )
+    # the key is taken from the instantiated SimObject tree so that every
+    # core, FU pool, cache and memory parameter is part of it
+    cache_key = result_key(
+        binaries=binary_paths,
+        config=root.get_config_as_dict(),
+        build_identity={
+            "version": m5.core.gem5Version,
+            "compile_date": m5.core.compileDate,
+        },
+        run_options={
+            "restore_checkpoint": args.restore_checkpoint is not None,
+            # the captured statistics are part of the stored region records
+            "stats": stat_patterns,
+            # and the convergence options decide how many regions there are
+            "warmup_regions": args.warmup_regions,
+            "target_rel_error": args.target_rel_error,
+            "min_regions": args.min_regions,
+            "max_regions": args.max_regions,
+            "max_ticks": args.max_ticks,
+            # sampled runs report extrapolated regions
+            "sampling": [
+                args.sampling_interval, args.sampling_warmup,
+                args.sampling_window
+            ] if args.sampling else None,
+            # how the regions of the cores are told apart
+            "work_ids_per_core": args.work_ids_per_core,
+            # the region energies are part of the stored region records
+            "power_model": power_model.get_params() if power_model else None,
+        },
+    )
+    # a resumed run already wrote some of its regions
+    if resumed is None:
+        cached_result = result_cache.lookup(cache_key)
+# ==== end of result cache lookup ====
+
 runtimes = []
-begin_tick = 0
+records = []
+# the regions in flight, by work item ID. With several cores the regions of
+# different cores overlap.
+open_regions = {}
 event_track = 0
 
+# ==== setup the region records ====
+ticks_per_second = m5.ticks.fromSeconds(1.0)
+stat_reader = StatReader(root)
+# resolved at the first region, when the stats tree is complete
+stat_names = None
+record_writer = None
+if not args.take_checkpoint:
+    region_output = Path(m5.options.outdir) / args.region_output
+    kept_records = []
+    if resumed is not None and region_output.is_file():
+        # the regions completed after the checkpoint are simulated again
+        kept_records = list(islice(
+            read_records(region_output), resumed[1]["num_records"]
+        ))
+    record_writer = RegionRecordWriter(region_output)
+    for record in kept_records:
+        record_writer.write(record)
+        records.append(record)
+memories = system.get_memory_names()
+convergence = RegionConvergence(
+    warmup=args.warmup_regions,
+    confidence=args.confidence,
+    rel_error=args.target_rel_error,
+    min_regions=args.min_regions,
+    max_regions=args.max_regions,
+    max_ticks=args.max_ticks,
+)
+clock_period = round(ticks_per_second / toFrequency(spec["clock"]))
+profiler = None
+if args.profile:
+    # the symbol tables are indexed once, not at every region
+    profiler = RegionProfiler(
+        profilers=pc_profilers,
+        indexes=[SymbolIndex(read_symbols(path)) for path in binary_paths],
+        outdir=Path(m5.options.outdir) / args.profile_dir,
+    )
+sampler = None
+if args.sampling:
+    sampler = RegionSampler(
+        processor=processor,
+        clock_period=clock_period,
+        interval=args.sampling_interval,
+        warmup=args.sampling_warmup,
+        window=args.sampling_window,
+        confidence=args.confidence,
+    )
+# ==== end of region records setup ====
+
 # ==== define workbegin and workend reaction ====
-def workbegin_handler():
-    global begin_tick, event_track
+def print_runtime(runtime):
+    print(f"Runtime for this region: {runtime} ticks, "
+                                    f"{runtime / ticks_per_second:.6f} s")
+
+def current_core(core_index):
+    return list(processor.get_cores())[core_index].get_simobject()
+
+def core_of(workbegin_id):
+    if num_cores == 1 or workbegin_id is None:
+        return 0
+    core_index = workbegin_id // args.work_ids_per_core
+    if not 0 <= core_index < num_cores:
+        raise ValueError(f"Work item ID {workbegin_id} belongs to core "
+                         f"{core_index}, but there are {num_cores} cores. "
+                         "See --work-ids-per-core.")
+    return core_index
+
+def committed_insts(core_index):
+    # switched-out cores keep their count, so the sum over the cores of a
+    # group is the number of instructions committed by whichever of them was
+    # running
+    return sum(
+        core.get_simobject().totalInsts() for core in core_groups[core_index]
+    )
+
+def counter_fields(core_index):
+    """Counters a region record reports as their change over the region."""
+    fields = {
+        "cycles": f"{current_core(core_index).path()}.numCycles",
+    }
+    for kind, cache in [
+        ("icache", system.get_icache(core_index)),
+        ("dcache", system.get_dcache(core_index)),
+    ]:
+        fields[f"{kind}_hits"] = f"{cache.path()}.overallHits::total"
+        fields[f"{kind}_misses"] = f"{cache.path()}.overallMisses::total"
+    # the memories are shared, with several cores their traffic and the time
+    # their bus layer was busy include the regions of the other cores
+    for memory in memories:
+        fields[f"{memory}_bytes_read"] = f"system.{memory}.bytesRead::total"
+        fields[f"{memory}_bytes_written"] = (
+            f"system.{memory}.bytesWritten::total"
+        )
+        fields[f"{memory}_bus_occupancy"] = (
+            f"{system.get_bus_layer(memory)}.occupancy"
+        )
+    # the time the core's own buses were busy, summed over their layers
+    for bus, layers in system.get_core_bus_layers(core_index).items():
+        fields[f"{bus}_bus_occupancy"] = [
+            f"{layer}.occupancy" for layer in layers
+        ]
+    # the DMA controller is shared as well, its bus occupancy is the time
+    # its bursts held the matrix
+    if system.has_dma():
+        fields["dma_bytes"] = "system.dma.bytesTransferred"
+        fields["dma_bus_occupancy"] = [
+            f"{layer}.occupancy" for layer in system.get_dma_bus_layers()
+        ]
+    # the committed instructions of every instruction class of the power
+    # model, counted like committed_insts() over the cores of the group
+    if power_model is not None:
+        for name, op_classes in power_model.instruction_classes().items():
+            fields[f"insts_{name}"] = [
+                f"{core.get_simobject().path()}.commitStats0."
+                f"committedInstType::{op_class}"
+                for core in core_groups[core_index] for op_class in op_classes
+            ]
+    return fields
+
+def read_counters(core_index):
+    # a counter is one statistic or the sum of a list of them
+    fields = counter_fields(core_index)
+    names = [
+        name for stat in fields.values()
+        for name in (stat if isinstance(stat, list) else [stat])
+    ]
+    values = stat_reader.read(names)
+    counters = {}
+    for key, stat in fields.items():
+        stats = [values[name] for name in (
+            stat if isinstance(stat, list) else [stat]
+        )]
+        counters[key] = sum(stats) if None not in stats else None
+    return counters
+
+def region_record(region, runtime, insts, estimate):
+    global stat_names
+    if stat_names is None:
+        stat_names = stat_reader.names(stat_patterns)
+    values = stat_reader.read(stat_names)
+    record = {
+        "region": event_track,
+        "work_id": region["work_id"],
+        "core": region["core"],
+        "warmup": convergence.is_warmup(event_track),
+        "begin_tick": region["begin_tick"],
+        "end_tick": region["begin_tick"] + runtime,
+        "ticks": runtime,
+        "seconds": runtime / ticks_per_second,
+        "insts": insts,
+    }
+    for key, value in read_counters(region["core"]).items():
+        begin = region["counters"][key]
+        record[key] = value - begin if None not in (value, begin) else None
+    cycles = record["cycles"]
+    record["cpi"] = cycles / insts if cycles is not None and insts else None
+    # the rates are of what was simulated, before any extrapolation
+    record.update(host_meter.region_metrics(
+        region["host_begin"], insts, cycles
+    ))
+    if estimate is not None:
+        # the extrapolated runtime replaces the mix of atomic and detailed
+        # ticks that were actually simulated
+        record["simulated_ticks"] = runtime
+        record.update({
+            "ticks": estimate["ticks"],
+            "seconds": estimate["ticks"] / ticks_per_second,
+            "cycles": estimate["cycles"],
+            "cpi": estimate["cpi"],
+            "sampling": estimate,
+        })
+    if power_model is not None:
+        record.update(power_model.region_energy(
+            record, spec["voltage_range"], core_voltage, memories
+        ))
+    record["stats"] = {name: values[name] for name in stat_names}
+    return record
+
+def workbegin_handler(workbegin_id):
     print(f"workbegin {event_track} called")
-    # reset stats at workbegin
-    m5.stats.reset()
-    print("Reset stats")
-    begin_tick = m5.curTick()
-    print("Start Debug Flags")
+    if num_cores == 1:
+        # a single core has one region at a time, a workbegin without a
+        # workend restarts it
+        open_regions.clear()
+    if not open_regions:
+        # reset stats at workbegin, unless a region of another core is still
+        # running
+        m5.stats.reset()
+        print("Reset stats")
+    core_index = core_of(workbegin_id)
+    if workbegin_id in open_regions:
+        print(f"Warning: workbegin {workbegin_id} again before its workend, "
+              "restarting the region")
+    tick = m5.curTick()
+    convergence.region_begin(tick)
+    open_regions[workbegin_id] = {
+        "work_id": workbegin_id,
+        "core": core_index,
+        "begin_tick": tick,
+        "begin_insts": committed_insts(core_index),
+        "counters": read_counters(core_index),
+        "host_begin": host_meter.region_begin(),
+    }
     # m5.debug.flags["Fetch"].enable()
     # m5.debug.flags["CachePort"].enable()
     # m5.debug.flags["ARTCache"].enable()
-    m5.debug.flags["ExecAll"].enable()
+    tracer.begin(current_core(core_index))
+    if profiler is not None:
+        profiler.begin(core_index)
+    if sampler is not None:
+        sampler.begin()
 
-def workend_handler():
-    global begin_tick, runtimes, event_track
+def workend_handler(workend_id) -> bool:
+    """Returns True once no more regions need to be simulated."""
+    global event_track
     print(f"workend {event_track} called")
-    # dump stats at workend
-    m5.stats.dump()
-    print("Dumped stats")
+    if num_cores == 1:
+        # the IDs of a single core's workbegin and workend need not match
+        workend_id = next(iter(open_regions), workend_id)
+    region = open_regions.pop(workend_id, None)
+    if region is None:
+        print(f"Warning: workend {workend_id} without a workbegin, ignored")
+        return False
+    if args.dump_stats:
+        m5.stats.dump()
+        print("Dumped stats")
     end_tick = m5.curTick()
-    runtime = end_tick - begin_tick
+    runtime = end_tick - region["begin_tick"]
+    insts = committed_insts(region["core"]) - region["begin_insts"]
+    estimate = sampler.end(insts) if sampler is not None else None
+    record = region_record(region, runtime, insts, estimate)
+    if profiler is not None:
+        print(f"Hottest functions of region {event_track}:")
+        record["hotspots"] = [
+            hotspot.function
+            for hotspot in profiler.end(event_track, region["core"])
+        ]
+    runtime = record["ticks"]
     runtimes.append(runtime)
-    print(f"Runtime for this region: {runtime} ticks, "
-                                            f"{runtime / 1000000000000:.6f} s")
+    print_runtime(runtime)
+    print(f"Host time for this region: {record['host_seconds']:.2f} s, "
+          f"{record['host_kips'] or 0:.1f} KIPS, peak RSS "
+          f"{record['host_peak_rss_mib']:.1f} MiB")
+    if record.get("energy_j") is not None:
+        print(f"Energy for this region: {record['energy_j'] * 1e6:.3f} uJ, "
+              f"average power {record['power_w'] * 1e3:.2f} mW")
+    if estimate is not None and estimate["relative_error"] is not None:
+        print(f"Extrapolated from {estimate['windows']} window(s), "
+              f"relative error {estimate['relative_error']:.4f}")
+    records.append(record)
+    record_writer.write(record)
+    done = convergence.region_end(runtime)
     event_track += 1
-    print("Stop Debug Flags")
     # m5.debug.flags["Fetch"].disable()
     # m5.debug.flags["CachePort"].disable()
     # m5.debug.flags["ARTCache"].disable()
-    m5.debug.flags["ExecAll"].disable()
+    tracer.end()
+    return done
+
+def run_state():
+    """What the simulation loop needs to continue from a checkpoint."""
+    regions = []
+    for region in open_regions.values():
+        # the statistics and instruction counts restart from zero in the
+        # restored run, so an open region keeps what it counted so far as
+        # the negative of its begin values
+        counters = read_counters(region["core"])
+        regions.append({
+            "work_id": region["work_id"],
+            "core": region["core"],
+            "begin_tick": region["begin_tick"],
+            "begin_insts": (
+                region["begin_insts"] - committed_insts(region["core"])
+            ),
+            "counters": {
+                key: begin - counters[key]
+                if None not in (begin, counters.get(key)) else None
+                for key, begin in region["counters"].items()
+            },
+        })
+    return {
+        "event_track": event_track,
+        "runtimes": runtimes,
+        "num_records": len(records),
+        "convergence": convergence.state(),
+        "open_regions": regions,
+    }
+
+def resume(state):
+    global event_track
+    event_track = state["event_track"]
+    runtimes.extend(state["runtimes"])
+    convergence.restore(state["convergence"])
+    for region in state["open_regions"]:
+        counters = read_counters(region["core"])
+        open_regions[region["work_id"]] = {
+            **region,
+            "begin_insts": (
+                region["begin_insts"] + committed_insts(region["core"])
+            ),
+            "counters": {
+                key: begin + counters[key]
+                if None not in (begin, counters.get(key)) else None
+                for key, begin in region["counters"].items()
+            },
+            # the host metrics of the region only cover this run
+            "host_begin": host_meter.region_begin(),
+        }
+    print(f"Resumed at region {event_track} with {len(open_regions)} "
+          "region(s) in flight")
+
+def simulate():
+    # only the time after the first workbegin counts against --max-ticks
+    remaining = convergence.remaining_ticks(m5.curTick())
+    if remaining is None:
+        return m5.simulate()
+    return m5.simulate(remaining)
 # ==== end of workbegin and workend reaction ====
 
 # ==== start the simulation ====
-print("Beginning simulation!")
-exit_event = m5.simulate()
-cause = exit_event.getCause()
-while cause in ["workbegin", "workend"]:
-    if cause == "workbegin":
-        workbegin_handler()
-    elif cause == "workend":
-        workend_handler()
-    exit_event = m5.simulate()
+stats_file = Path(m5.options.outdir) / "stats.txt"
+if cached_result is not None:
+    print(f"Result cache hit {cache_key}, skipping simulation")
+    stats_file.write_text(cached_result["stats"])
+    for record in cached_result["regions"]:
+        runtimes.append(record["ticks"])
+        records.append(record)
+        record_writer.write(record)
+        convergence.region_end(record["ticks"])
+        print_runtime(record["ticks"])
+else:
+    if resumed is not None:
+        print(f"Resuming from checkpoint {resumed[0].as_posix()}")
+        resume(resumed[1])
+    elif args.restore_checkpoint:
+        # the checkpoint was taken at the first workbegin, so the first region
+        # starts right away
+        print(f"Restored from checkpoint {args.restore_checkpoint}")
+        workbegin_file = Path(args.restore_checkpoint) / "workbegin.json"
+        restored_work_id = None
+        if workbegin_file.is_file():
+            restored_work_id = json.loads(
+                workbegin_file.read_text()
+            )["work_id"]
+        workbegin_handler(restored_work_id)
+
+    if checkpointer is not None:
+        checkpointer.schedule()
+    print("Beginning simulation!")
+    exit_event = simulate()
     cause = exit_event.getCause()
+    while cause in ["workbegin", "workend"] or tracer.handles(cause) or (
+        sampler is not None and sampler.handles(cause)
+    ) or (checkpointer is not None and checkpointer.handles(cause)):
+        if cause == "workbegin" and args.take_checkpoint:
+            print(f"Taking checkpoint at tick {m5.curTick()}")
+            m5.checkpoint(args.take_checkpoint)
+            # the work item ID is not part of the checkpoint
+            (Path(args.take_checkpoint) / "workbegin.json").write_text(
+                json.dumps({"work_id": exit_event.getCode()})
+            )
+            print(f"Checkpoint written to {args.take_checkpoint}")
+            break
+        if cause == "workbegin":
+            if switchable and not processor.is_detailed():
+                processor.switch_to_detailed()
+            # the exit code of a work item exit is its work item ID
+            workbegin_handler(exit_event.getCode())
+        elif cause == "workend":
+            if workend_handler(exit_event.getCode()):
+                print(f"Stopping early: {convergence.stop_reason}")
+                break
+            if checkpointer is not None and \
+                    checkpointer.region_due(event_track):
+                checkpointer.take(run_state())
+        elif tracer.handles(cause):
+            tracer.handle_exit(cause)
+        elif checkpointer is not None and checkpointer.handles(cause):
+            # stale events from before a checkpoint are ignored
+            if checkpointer.is_due(cause):
+                checkpointer.take(run_state())
+                checkpointer.schedule()
+        else:
+            sampler.handle_exit(cause)
+        exit_event = simulate()
+        cause = exit_event.getCause()
+    if cause == "simulate() limit reached":
+        # the region in flight is dropped
+        convergence.tick_budget_reached()
+        print(f"Stopping early: {convergence.stop_reason}")
+
+    if result_cache is not None:
+        result_cache.store(cache_key, {
+            "regions": records,
+            "stats": stats_file.read_text() if stats_file.is_file() else "",
+        })
+        print(f"Stored results in the result cache as {cache_key}")
 # ==== end of simulation ====
+host_meter.mark("simulate")
 
-avg_tick = sum(runtimes) / len(runtimes) if len(runtimes) > 0 else 0
-print(f"Average runtime over {len(runtimes)} region(s): {avg_tick} ticks, "
-      f"{avg_tick / 1000000000000:.6f} s")
+if record_writer is not None:
+    record_writer.close()
+    print(f"Region records written to {record_writer.path.as_posix()}")
 
+if not args.take_checkpoint:
+    summary = convergence.summary()
+    if num_cores > 1:
+        # the measured regions of every core on their own
+        summary["cores"] = {
+            str(i): summarize(
+                [
+                    record["ticks"] for record in records
+                    if record.get("core", 0) == i and not record["warmup"]
+                ],
+                args.confidence,
+            ) for i in range(num_cores)
+        }
+    if power_model is not None:
+        # the energy of the measured regions
+        summary["energy_j"] = summarize(
+            [
+                record["energy_j"] for record in records
+                if not record["warmup"] and record.get("energy_j") is not None
+            ],
+            args.confidence,
+        )
+    # the host cost of the whole run, setup code included
+    summary["host"] = host_meter.summary(
+        insts=sum(core.get_simobject().totalInsts() for core in all_cores),
+        cycles=m5.curTick() // clock_period,
+    )
+    summary_file = Path(m5.options.outdir) / "summary.json"
+    summary_file.write_text(json.dumps(summary, indent=2))
+    avg_tick = summary["mean"] or 0
+    print(f"Average runtime over {summary['n']} region(s) "
+          f"({summary['warmup']} warm-up region(s) skipped): "
+          f"{avg_tick} ticks, {avg_tick / ticks_per_second:.6f} s")
+    if summary["stdev"] is not None:
+        print(f"Median {summary['median']} ticks, standard deviation "
+              f"{summary['stdev']:.1f} ticks, "
+              f"{summary['confidence'] * 100:g}% confidence interval "
+              f"[{summary['ci_low']:.1f}, {summary['ci_high']:.1f}] ticks, "
+              f"relative error {summary['relative_error']:.4f}")
+    energy = summary.get("energy_j")
+    if energy is not None and energy["mean"] is not None:
+        print(f"Average energy over {energy['n']} region(s): "
+              f"{energy['mean'] * 1e6:.3f} uJ")
+    host = summary["host"]
+    print(f"Host: config {host['config_seconds']:.2f} s, instantiate "
+          f"{host['instantiate_seconds']:.2f} s, simulate "
+          f"{host['simulate_seconds']:.2f} s, {host['kips'] or 0:.1f} KIPS, "
+          f"peak RSS {host['peak_rss_mib']:.1f} MiB")
+    print(f"Summary written to {summary_file.as_posix()}")
@@ -0,0 +1,283 @@
+"""
+Run a matrix of ento-bench binaries x board configurations through se_board.py
+on a bounded pool of isolated gem5 processes and merge the per-region results
+into one table.
+
+The sweep is described by a JSON file:
+
+    {
+        "binaries": ["path/to/bench_a.elf", "path/to/bench_b.elf"],
+        "parameters": {
+            "processor": ["cortex-m4", "simple-OOO"],
+            "board": ["stm32g474", "stm32l476"],
+            "clock": ["80MHz", "100MHz"],
+            "icache-size": ["512B", "1KiB"],
+            "set": ["icache.prefetch=true", "icache.prefetch=false"]
+        },
+        "checkpoint": true
+    }
+
+Every key in "parameters" is a se_board.py option without the leading "--".
+A flag without a value, like "profile", is swept with true and false: true
+passes the flag, false leaves it out.
+With "checkpoint" set, the setup code of each binary is run once per board to
+take a checkpoint at its first workbegin and every configuration of that
+board is restored from it.
+
+This script runs with the host Python, not inside gem5.
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from results.records import find_records, read_records
+
+SE_BOARD = Path(__file__).resolve().parent / "se_board.py"
+
+
+@dataclass
+class Job:
+    name: str
+    binary: Path
+    params: dict[str, str]
+    outdir: Path
+    extra_args: list[str] = field(default_factory=list)
+    status: str = "pending"
+    attempts: int = 0
+    wall_time: float = 0.0
+    records: list[dict] = field(default_factory=list)
+
+    def command(self, gem5: Path) -> list[str]:
+        cmd = [
+            gem5.as_posix(), "-re", "--outdir", self.outdir.as_posix(),
+            SE_BOARD.as_posix(), "--binary", self.binary.as_posix()
+        ]
+        for key, value in self.params.items():
+            if value is True:
+                cmd.append(f"--{key}")
+            elif value is not False:
+                cmd += [f"--{key}", str(value)]
+        return cmd + self.extra_args
+
+def expand_configs(parameters: dict[str, list]) -> list[dict[str, str]]:
+    keys = sorted(parameters)
+    values = [
+        parameters[key] if isinstance(parameters[key], list)
+        else [parameters[key]] for key in keys
+    ]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+def param_text(value) -> str:
+    # flags are written as in the sweep JSON file
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+def config_name(params: dict[str, str]) -> str:
+    if not params:
+        return "default"
+    return "_".join(
+        f"{key}-{param_text(value)}" for key, value in params.items()
+    ).replace("/", "-")
+
+def binary_name(binary: Path) -> str:
+    # binaries of the same name in different directories must not share their
+    # output directories
+    digest = hashlib.sha256(binary.resolve().as_posix().encode()).hexdigest()
+    return f"{binary.stem}-{digest[:8]}"
+
+def read_job_records(outdir: Path) -> list[dict]:
+    records = find_records(outdir)
+    if records is None:
+        return []
+    return list(read_records(records))
+
+def run_job(job: Job, gem5: Path, timeout: float, retries: int) -> Job:
+    job.outdir.mkdir(parents=True, exist_ok=True)
+    while job.attempts <= retries:
+        job.attempts += 1
+        start = time.monotonic()
+        try:
+            completed = subprocess.run(
+                job.command(gem5),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+            job.status = "ok" if completed.returncode == 0 else (
+                f"exit {completed.returncode}"
+            )
+        except subprocess.TimeoutExpired:
+            # subprocess.run kills the hung gem5 process before raising
+            job.status = "timeout"
+        job.wall_time = time.monotonic() - start
+        if job.status == "ok":
+            job.records = read_job_records(job.outdir)
+            break
+    return job
+
+def run_pool(
+    jobs: list[Job], gem5: Path, workers: int, timeout: float, retries: int
+) -> list[Job]:
+    finished = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_job, job, gem5, timeout, retries) for job in jobs
+        ]
+        for future in as_completed(futures):
+            job = future.result()
+            finished.append(job)
+            print(f"[{len(finished)}/{len(jobs)}] {job.name}: {job.status} "
+                  f"({job.attempts} attempt(s), {job.wall_time:.1f} s)")
+    return finished
+
+def write_table(jobs: list[Job], param_keys: list[str], path: Path) -> None:
+    # one column per scalar field of the region records, the captured
+    # statistics are flattened into "stat:<name>" columns
+    record_keys = []
+    for job in jobs:
+        for record in job.records:
+            for key, value in record.items():
+                if key == "stats":
+                    keys = [f"stat:{name}" for name in value]
+                else:
+                    keys = [key]
+                record_keys += [
+                    name for name in keys if name not in record_keys
+                ]
+    with open(path, "w", newline="") as table:
+        writer = csv.writer(table)
+        writer.writerow(["binary", *param_keys, "status", *record_keys])
+        for job in sorted(jobs, key=lambda job: job.name):
+            row = [
+                job.binary.as_posix(),
+                *(param_text(job.params[key]) for key in param_keys)
+            ]
+            if not job.records:
+                writer.writerow([*row, job.status])
+            for record in job.records:
+                values = dict(record)
+                for name, value in values.pop("stats", {}).items():
+                    values[f"stat:{name}"] = value
+                writer.writerow([
+                    *row, job.status,
+                    *(values.get(key, "") for key in record_keys)
+                ])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run a sweep of binaries and board configurations through "
+            "se_board.py on a pool of gem5 processes."
+    )
+    parser.add_argument(
+        "--spec", type=str, required=True, help="Path to the sweep JSON file"
+    )
+    parser.add_argument(
+        "--gem5", type=str, required=True, help="Path to the gem5 binary"
+    )
+    parser.add_argument(
+        "--outdir", type=str, default="sweep-out",
+        help="Directory for the per-job gem5 output directories and the "
+            "merged results"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of gem5 processes to run at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None,
+        help="Kill a gem5 process after this many seconds"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=0,
+        help="Number of times to re-run a failed or timed-out job"
+    )
+    args = parser.parse_args()
+
+    gem5 = Path(args.gem5)
+    if not gem5.is_file():
+        raise FileNotFoundError(f"gem5 binary '{gem5.as_posix()}' does not "
+                                "exist.")
+    with open(args.spec) as spec_file:
+        spec = json.load(spec_file)
+    binaries = [Path(binary) for binary in spec["binaries"]]
+    for binary in binaries:
+        if not binary.is_file():
+            raise FileNotFoundError(f"Binary file '{binary.as_posix()}' does "
+                                    "not exist.")
+    configs = expand_configs(spec.get("parameters", {}))
+    param_keys = sorted(spec.get("parameters", {}))
+    # gem5 resolves the checkpoint directory against its own working
+    # directory, so keep every path absolute
+    outdir = Path(args.outdir).resolve()
+
+    checkpoints = {}
+    failed = []
+    if spec.get("checkpoint", False):
+        # pay for the setup code once per binary and board, the memory map of
+        # a checkpoint only fits the board it was taken on
+        boards = sorted({params.get("board") for params in configs}, key=str)
+        checkpoint_jobs = []
+        for binary in binaries:
+            for board in boards:
+                params = {} if board is None else {"board": board}
+                job_dir = outdir / binary_name(binary) / "checkpoint" / (
+                    config_name(params)
+                )
+                checkpoints[binary, board] = job_dir / "cpt"
+                checkpoint_jobs.append(Job(
+                    name=f"{binary_name(binary)}/checkpoint/"
+                        f"{config_name(params)}",
+                    binary=binary,
+                    params=params,
+                    outdir=job_dir,
+                    extra_args=[
+                        "--take-checkpoint",
+                        checkpoints[binary, board].as_posix()
+                    ],
+                ))
+        # a binary is dropped if any of its checkpoints failed
+        failed = list(dict.fromkeys(
+            job.binary for job in run_pool(
+                checkpoint_jobs, gem5, args.jobs, args.timeout, args.retries
+            ) if job.status != "ok"
+        ))
+        if failed:
+            print("Could not take checkpoints for: "
+                  f"{', '.join(binary.as_posix() for binary in failed)}")
+            binaries = [binary for binary in binaries if binary not in failed]
+
+    jobs = []
+    for binary in binaries:
+        for params in configs:
+            name = f"{binary_name(binary)}/{config_name(params)}"
+            extra_args = []
+            checkpoint = checkpoints.get((binary, params.get("board")))
+            if checkpoint is not None:
+                extra_args = ["--restore-checkpoint", checkpoint.as_posix()]
+            jobs.append(Job(
+                name=name,
+                binary=binary,
+                params=params,
+                outdir=outdir / name,
+                extra_args=extra_args,
+            ))
+    print(f"Running {len(jobs)} job(s) on {args.jobs} worker(s)")
+    finished = run_pool(jobs, gem5, args.jobs, args.timeout, args.retries)
+
+    table = outdir / "results.csv"
+    write_table(finished, param_keys, table)
+    print(f"Merged results written to {table.as_posix()}")
+    if failed or any(job.status != "ok" for job in finished):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Check a sampled se_board run against a full detailed run of the same binary
+and board configuration, region by region.
+
+    python3 validate_sampling.py --sampled m5out-sampled --detailed m5out-full
+
+Reports the error of every extrapolated region runtime against the detailed
+runtime and whether the detailed runtime lies inside the reported confidence
+interval. This script runs with the host Python, not inside gem5.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from results.records import find_records, read_records
+
+def load(outdir: str) -> dict[int, dict]:
+    records = find_records(Path(outdir))
+    if records is None:
+        raise FileNotFoundError(f"No region records in '{outdir}'.")
+    return {int(record["region"]): record for record in read_records(records)}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate a sampled se_board run against a full detailed "
+            "run."
+    )
+    parser.add_argument(
+        "--sampled", type=str, required=True,
+        help="gem5 outdir of the run with --sampling"
+    )
+    parser.add_argument(
+        "--detailed", type=str, required=True,
+        help="gem5 outdir of the full detailed run"
+    )
+    args = parser.parse_args()
+
+    sampled = load(args.sampled)
+    detailed = load(args.detailed)
+    regions = sorted(set(sampled) & set(detailed))
+    if not regions:
+        print("The runs have no regions in common.")
+        return 1
+
+    outside = 0
+    errors = []
+    print(f"{'region':>6} {'detailed':>14} {'sampled':>14} {'error':>8} "
+          f"{'in CI':>6}")
+    for region in regions:
+        reference = float(detailed[region]["ticks"])
+        estimate = float(sampled[region]["ticks"])
+        error = (estimate - reference) / reference
+        errors.append(abs(error))
+        sampling = sampled[region].get("sampling") or {}
+        in_ci = "-"
+        if "ticks_low" in sampling:
+            inside = \
+                sampling["ticks_low"] <= reference <= sampling["ticks_high"]
+            outside += not inside
+            in_ci = "yes" if inside else "no"
+        print(f"{region:>6} {reference:>14.0f} {estimate:>14.0f} "
+              f"{error * 100:>7.2f}% {in_ci:>6}")
+    print(f"Mean absolute error {sum(errors) / len(errors) * 100:.2f}%, "
+          f"maximum {max(errors) * 100:.2f}%, {outside} region(s) outside "
+          "their confidence interval")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
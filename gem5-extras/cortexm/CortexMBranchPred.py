@@ -0,0 +1,18 @@
+from m5.params import *
+from m5.objects.BranchPredictor import BranchPredictor
+
+class CortexMStaticBP(BranchPredictor):
+    """
+    Branch prediction of a Cortex-M4: none. Conditional branches are always
+    predicted not taken, so every taken one is redirected by execute and
+    pays the full pipeline refill. Only direct unconditional branches, whose
+    target the M4 computes in decode and fetches straight away, are
+    redirected early, from the BTB once they have been seen. Returns and
+    other indirect branches are not predicted.
+    """
+    type = "CortexMStaticBP"
+    cxx_header = "cortexm/static_bp.hh"
+    cxx_class = "gem5::branch_prediction::CortexMStaticBP"
+
+    ras = NULL
+    indirectBranchPred = NULL
@@ -0,0 +1,49 @@
+from m5.objects.Device import BasicPioDevice, DmaDevice
+from m5.params import *
+
+class CortexMPrivatePeripherals(BasicPioDevice):
+    """
+    The parts of the Cortex-M4 private peripheral bus (0xE0000000 to
+    0xE00FFFFF) that firmware uses for timing: the DWT control and cycle
+    count registers, DEMCR and the SysTick timer. Both counters run on the
+    clock domain of the device, which should be the core clock. All other
+    PPB registers read as zero and ignore writes.
+    """
+    type = "CortexMPrivatePeripherals"
+    cxx_header = "cortexm/private_peripherals.hh"
+    cxx_class = "gem5::CortexMPrivatePeripherals"
+
+    pio_addr = 0xE0000000
+    pio_latency = "0ns"
+
+    systick_ref_divider = Param.Unsigned(
+        8, "Core clock cycles per SysTick reference clock tick, used when "
+        "SYST_CSR.CLKSOURCE is 0 (HCLK/8 on STM32)"
+    )
+    systick_calib = Param.UInt32(0, "Read-only value of SYST_CALIB")
+
+class CortexMDMA(DmaDevice):
+    """
+    Memory-to-memory DMA controller. Every channel has five word registers,
+    0x20 apart per channel: CTRL (bit 0 EN, bit 1 IE, bit 2 SRC_FIXED,
+    bit 3 DST_FIXED, bits 7:4 log2 of the burst in bytes, 0 for
+    burst_size), SRC, DST, COUNT (bytes left) and STATUS (bit 0 DONE, write
+    one to clear). Enabled channels are served round-robin one burst at a
+    time. A channel with IE set posts an IRQ to the running core in `cpus`
+    when it is done, which in SE mode only wakes the core from WFI.
+    """
+    type = "CortexMDMA"
+    cxx_header = "cortexm/dma.hh"
+    cxx_class = "gem5::CortexMDMA"
+
+    pio_addr = Param.Addr("Address of the channel registers")
+    pio_latency = Param.Latency("0ns", "Latency of a register access")
+    channels = Param.Unsigned(8, "Number of channels")
+    burst_size = Param.Unsigned(
+        16, "Bytes read and written per burst, unless CTRL selects another "
+        "burst size"
+    )
+    cpus = VectorParam.BaseCPU(
+        [], "Cores the completion IRQ goes to, whichever of them is not "
+        "switched out"
+    )
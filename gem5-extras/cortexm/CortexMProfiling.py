@@ -0,0 +1,30 @@
+from m5.params import *
+from m5.objects.Probe import ProbeListenerObject
+from m5.util.pybind import PyBindMethod
+
+class CommittedPCProfiler(ProbeListenerObject):
+    """
+    Counts the instructions the CPU given as `manager` commits per PC, the
+    core cycles between consecutive commits charged to the committing PC, and
+    the misses of the CPU's instruction cache charged to the missing fetch
+    address.
+
+    The counts are kept in a hash map on the host and only written out when
+    `dumpProfile()` is called from Python, so a profiled region costs a map
+    update per commit instead of a line of trace.
+    """
+    type = "CommittedPCProfiler"
+    cxx_header = "cortexm/pc_profiler.hh"
+    cxx_class = "gem5::CommittedPCProfiler"
+
+    cxx_exports = [
+        PyBindMethod("resetProfile"),
+        PyBindMethod("dumpProfile"),
+    ]
+
+    icache = Param.BaseCache(NULL, "Instruction cache whose misses are "
+                             "profiled")
+    sample_period = Param.Unsigned(
+        1, "Record every this many commits, each standing for this many "
+        "commits. 1 counts every commit"
+    )
@@ -0,0 +1,317 @@
+#include "cortexm/dma.hh"
+
+#include <algorithm>
+#include <cstring>
+
+#include "arch/arm/interrupts.hh"
+#include "base/logging.hh"
+#include "base/trace.hh"
+#include "cpu/base.hh"
+#include "debug/CortexMDMA.hh"
+#include "mem/packet_access.hh"
+#include "sim/full_system.hh"
+#include "sim/serialize.hh"
+
+namespace gem5
+{
+
+CortexMDMA::CortexMDMA(const Params &p)
+    : DmaDevice(p),
+      pioDelay(p.pio_latency),
+      pioAddr(p.pio_addr),
+      pioSize(p.channels * CHANNEL_STRIDE),
+      defaultBurst(p.burst_size),
+      cpus(p.cpus),
+      channels(p.channels),
+      buffer(MAX_BURST),
+      readDoneEvent([this]{ readDone(); }, name() + ".readDone"),
+      writeDoneEvent([this]{ writeDone(); }, name() + ".writeDone"),
+      stats(this)
+{
+    fatal_if(channels.empty(), "%s: channels must not be zero", name());
+    fatal_if(defaultBurst < FIXED_BEAT || defaultBurst > MAX_BURST ||
+             (defaultBurst & (defaultBurst - 1)),
+             "%s: burst_size must be a power of two from %d to %d bytes",
+             name(), FIXED_BEAT, MAX_BURST);
+}
+
+CortexMDMA::DMAStats::DMAStats(statistics::Group *parent)
+    : statistics::Group(parent),
+      ADD_STAT(bytesTransferred, statistics::units::Byte::get(),
+               "Bytes moved by all channels"),
+      ADD_STAT(bursts, statistics::units::Count::get(),
+               "Bursts read and written"),
+      ADD_STAT(transfers, statistics::units::Count::get(),
+               "Transfers completed"),
+      ADD_STAT(interrupts, statistics::units::Count::get(),
+               "Completion interrupts posted")
+{
+}
+
+AddrRangeList
+CortexMDMA::getAddrRanges() const
+{
+    return AddrRangeList{RangeSize(pioAddr, pioSize)};
+}
+
+unsigned
+CortexMDMA::burstSize(const Channel &channel) const
+{
+    // a fixed address is a peripheral data register, read or written one
+    // word at a time
+    if (channel.ctrl & (CTRL_SRC_FIXED | CTRL_DST_FIXED))
+        return FIXED_BEAT;
+    unsigned shift = (channel.ctrl & CTRL_BURST_MASK) >> CTRL_BURST_SHIFT;
+    if (shift == 0)
+        return defaultBurst;
+    return std::min(1u << shift, MAX_BURST);
+}
+
+void
+CortexMDMA::startBurst()
+{
+    if (busy || drainState() == DrainState::Draining)
+        return;
+    // round-robin from the channel after the last one served
+    for (unsigned i = 1; i <= channels.size(); ++i) {
+        unsigned index = (current + i) % channels.size();
+        Channel &channel = channels[index];
+        if (!(channel.ctrl & CTRL_EN) || channel.count == 0)
+            continue;
+        current = index;
+        busy = true;
+        burstBytes = std::min(burstSize(channel), channel.count);
+        ++stats.bursts;
+        DPRINTF(CortexMDMA, "channel %d: burst of %d bytes %#x -> %#x\n",
+                index, burstBytes, channel.src, channel.dst);
+        dmaRead(channel.src, burstBytes, &readDoneEvent, buffer.data());
+        return;
+    }
+}
+
+void
+CortexMDMA::readDone()
+{
+    const Channel &channel = channels[current];
+    dmaWrite(channel.dst, burstBytes, &writeDoneEvent, buffer.data());
+}
+
+void
+CortexMDMA::writeDone()
+{
+    Channel &channel = channels[current];
+    if (!(channel.ctrl & CTRL_SRC_FIXED))
+        channel.src += burstBytes;
+    if (!(channel.ctrl & CTRL_DST_FIXED))
+        channel.dst += burstBytes;
+    channel.count -= burstBytes;
+    stats.bytesTransferred += burstBytes;
+    busy = false;
+
+    // a channel disabled during its last burst does not complete
+    if (channel.count == 0 && (channel.ctrl & CTRL_EN)) {
+        DPRINTF(CortexMDMA, "channel %d: done\n", current);
+        channel.ctrl &= ~CTRL_EN;
+        channel.status |= STATUS_DONE;
+        ++stats.transfers;
+        updateInterrupt();
+    }
+
+    if (drainState() == DrainState::Draining) {
+        signalDrainDone();
+        return;
+    }
+    startBurst();
+}
+
+BaseCPU *
+CortexMDMA::runningCPU() const
+{
+    for (BaseCPU *cpu : cpus) {
+        if (!cpu->switchedOut())
+            return cpu;
+    }
+    return nullptr;
+}
+
+void
+CortexMDMA::updateInterrupt()
+{
+    bool pending = std::any_of(channels.begin(), channels.end(),
+        [](const Channel &channel) {
+            return (channel.status & STATUS_DONE) &&
+                   (channel.ctrl & CTRL_IE);
+        });
+    if (pending == irqPosted)
+        return;
+    BaseCPU *cpu = runningCPU();
+    if (!cpu)
+        return;
+    irqPosted = pending;
+    if (pending) {
+        // SE mode does not take interrupts, the IRQ only wakes a core
+        // waiting in WFI
+        warn_if_once(!FullSystem,
+                     "%s: DMA interrupts only wake the core from WFI in SE "
+                     "mode, no handler runs", name());
+        ++stats.interrupts;
+        cpu->postInterrupt(0, ArmISA::INT_IRQ, 0);
+    } else {
+        cpu->clearInterrupt(0, ArmISA::INT_IRQ, 0);
+    }
+}
+
+uint32_t
+CortexMDMA::readRegister(Addr offset)
+{
+    const Channel &channel = channels[offset / CHANNEL_STRIDE];
+    switch (offset % CHANNEL_STRIDE) {
+      case CH_CTRL:
+        return channel.ctrl;
+      case CH_SRC:
+        return channel.src;
+      case CH_DST:
+        return channel.dst;
+      case CH_COUNT:
+        return channel.count;
+      case CH_STATUS:
+        return channel.status;
+      default:
+        return 0;
+    }
+}
+
+void
+CortexMDMA::writeRegister(Addr offset, uint32_t value)
+{
+    unsigned index = offset / CHANNEL_STRIDE;
+    Channel &channel = channels[index];
+    Addr reg = offset % CHANNEL_STRIDE;
+    // as on the STM32, the addresses and the count of an enabled channel
+    // are read-only
+    if ((channel.ctrl & CTRL_EN) &&
+        (reg == CH_SRC || reg == CH_DST || reg == CH_COUNT)) {
+        warn_once("%s: write to an enabled channel's registers ignored",
+                  name());
+        return;
+    }
+    switch (reg) {
+      case CH_CTRL: {
+        bool enable = (value & CTRL_EN) && !(channel.ctrl & CTRL_EN);
+        channel.ctrl = value & CTRL_MASK;
+        if (enable) {
+            warn_if_once((channel.ctrl &
+                          (CTRL_SRC_FIXED | CTRL_DST_FIXED)) &&
+                         channel.count % FIXED_BEAT,
+                         "%s: fixed address transfers move whole words",
+                         name());
+            channel.status &= ~STATUS_DONE;
+            if (channel.count == 0) {
+                // nothing to move, done straight away
+                channel.ctrl &= ~CTRL_EN;
+                channel.status |= STATUS_DONE;
+                ++stats.transfers;
+            }
+        }
+        updateInterrupt();
+        startBurst();
+        break;
+      }
+      case CH_SRC:
+        channel.src = value;
+        break;
+      case CH_DST:
+        channel.dst = value;
+        break;
+      case CH_COUNT:
+        channel.count = value;
+        break;
+      case CH_STATUS:
+        // write one to clear
+        channel.status &= ~value;
+        updateInterrupt();
+        break;
+      default:
+        break;
+    }
+}
+
+Tick
+CortexMDMA::read(PacketPtr pkt)
+{
+    Addr offset = pkt->getAddr() - pioAddr;
+    if (pkt->getSize() == 4) {
+        uint32_t value = readRegister(offset);
+        DPRINTF(CortexMDMA, "read  %#x = %#x\n", offset, value);
+        pkt->setLE<uint32_t>(value);
+    } else {
+        warn_once("%s: only word accesses are supported, reading zero",
+                  name());
+        std::memset(pkt->getPtr<uint8_t>(), 0, pkt->getSize());
+    }
+    pkt->makeAtomicResponse();
+    return pioDelay;
+}
+
+Tick
+CortexMDMA::write(PacketPtr pkt)
+{
+    Addr offset = pkt->getAddr() - pioAddr;
+    if (pkt->getSize() == 4) {
+        uint32_t value = pkt->getLE<uint32_t>();
+        DPRINTF(CortexMDMA, "write %#x = %#x\n", offset, value);
+        writeRegister(offset, value);
+    } else {
+        warn_once("%s: only word accesses are supported, ignoring write",
+                  name());
+    }
+    pkt->makeAtomicResponse();
+    return pioDelay;
+}
+
+DrainState
+CortexMDMA::drain()
+{
+    // the burst in flight finishes, the next one waits for drainResume()
+    return busy ? DrainState::Draining : DrainState::Drained;
+}
+
+void
+CortexMDMA::drainResume()
+{
+    DmaDevice::drainResume();
+    startBurst();
+}
+
+void
+CortexMDMA::serialize(CheckpointOut &cp) const
+{
+    // drained, so no burst is in flight
+    SERIALIZE_SCALAR(current);
+    SERIALIZE_SCALAR(irqPosted);
+    for (unsigned i = 0; i < channels.size(); ++i) {
+        ScopedCheckpointSection sec(cp, csprintf("channel%d", i));
+        paramOut(cp, "ctrl", channels[i].ctrl);
+        paramOut(cp, "src", channels[i].src);
+        paramOut(cp, "dst", channels[i].dst);
+        paramOut(cp, "count", channels[i].count);
+        paramOut(cp, "status", channels[i].status);
+    }
+}
+
+void
+CortexMDMA::unserialize(CheckpointIn &cp)
+{
+    UNSERIALIZE_SCALAR(current);
+    UNSERIALIZE_SCALAR(irqPosted);
+    for (unsigned i = 0; i < channels.size(); ++i) {
+        ScopedCheckpointSection sec(cp, csprintf("channel%d", i));
+        paramIn(cp, "ctrl", channels[i].ctrl);
+        paramIn(cp, "src", channels[i].src);
+        paramIn(cp, "dst", channels[i].dst);
+        paramIn(cp, "count", channels[i].count);
+        paramIn(cp, "status", channels[i].status);
+    }
+}
+
+} // namespace gem5
@@ -0,0 +1,117 @@
+#ifndef __CORTEXM_DMA_HH__
+#define __CORTEXM_DMA_HH__
+
+#include <cstdint>
+#include <vector>
+
+#include "base/statistics.hh"
+#include "dev/dma_device.hh"
+#include "params/CortexMDMA.hh"
+#include "sim/eventq.hh"
+
+namespace gem5
+{
+
+class BaseCPU;
+
+/**
+ * Memory-to-memory DMA controller with memory-mapped channel registers.
+ * Enabled channels are served round-robin one burst at a time: a burst is
+ * read into a buffer through the DMA port and then written out, so a
+ * transfer competes with the cores for the bus matrix burst by burst.
+ * A channel that finishes sets its DONE flag and, with its interrupt
+ * enabled, posts an IRQ to the interrupt controller of its core.
+ */
+class CortexMDMA : public DmaDevice
+{
+  private:
+    // register offsets within a channel, channels are CHANNEL_STRIDE apart
+    static constexpr Addr CHANNEL_STRIDE = 0x20;
+    static constexpr Addr CH_CTRL = 0x00;
+    static constexpr Addr CH_SRC = 0x04;
+    static constexpr Addr CH_DST = 0x08;
+    static constexpr Addr CH_COUNT = 0x0C;
+    static constexpr Addr CH_STATUS = 0x10;
+
+    static constexpr uint32_t CTRL_EN = 1 << 0;
+    static constexpr uint32_t CTRL_IE = 1 << 1;
+    static constexpr uint32_t CTRL_SRC_FIXED = 1 << 2;
+    static constexpr uint32_t CTRL_DST_FIXED = 1 << 3;
+    static constexpr unsigned CTRL_BURST_SHIFT = 4;
+    static constexpr uint32_t CTRL_BURST_MASK = 0xF << CTRL_BURST_SHIFT;
+    static constexpr uint32_t CTRL_MASK = CTRL_EN | CTRL_IE |
+        CTRL_SRC_FIXED | CTRL_DST_FIXED | CTRL_BURST_MASK;
+    static constexpr uint32_t STATUS_DONE = 1 << 0;
+
+    /** Bytes moved per request to or from a fixed address */
+    static constexpr unsigned FIXED_BEAT = 4;
+    /** Largest burst CTRL.BURST can select, 2^8 bytes */
+    static constexpr unsigned MAX_BURST = 256;
+
+    struct Channel
+    {
+        uint32_t ctrl = 0;
+        uint32_t src = 0;
+        uint32_t dst = 0;
+        /** Bytes left to move */
+        uint32_t count = 0;
+        uint32_t status = 0;
+    };
+
+    const Tick pioDelay;
+    const Addr pioAddr;
+    const Addr pioSize;
+    const unsigned defaultBurst;
+    std::vector<BaseCPU *> cpus;
+
+    std::vector<Channel> channels;
+    /** Channel of the burst in flight, or the last one served */
+    unsigned current = 0;
+    bool busy = false;
+    unsigned burstBytes = 0;
+    bool irqPosted = false;
+    std::vector<uint8_t> buffer;
+
+    EventFunctionWrapper readDoneEvent;
+    EventFunctionWrapper writeDoneEvent;
+
+    struct DMAStats : public statistics::Group
+    {
+        DMAStats(statistics::Group *parent);
+
+        statistics::Scalar bytesTransferred;
+        statistics::Scalar bursts;
+        statistics::Scalar transfers;
+        statistics::Scalar interrupts;
+    } stats;
+
+    unsigned burstSize(const Channel &channel) const;
+    /** Start a burst of the next enabled channel if none is in flight */
+    void startBurst();
+    void readDone();
+    void writeDone();
+    /** Post or clear the IRQ to match the DONE and IE flags */
+    void updateInterrupt();
+    BaseCPU *runningCPU() const;
+
+    uint32_t readRegister(Addr offset);
+    void writeRegister(Addr offset, uint32_t value);
+
+  public:
+    PARAMS(CortexMDMA);
+    CortexMDMA(const Params &p);
+
+    AddrRangeList getAddrRanges() const override;
+    Tick read(PacketPtr pkt) override;
+    Tick write(PacketPtr pkt) override;
+
+    DrainState drain() override;
+    void drainResume() override;
+
+    void serialize(CheckpointOut &cp) const override;
+    void unserialize(CheckpointIn &cp) override;
+};
+
+} // namespace gem5
+
+#endif // __CORTEXM_DMA_HH__
@@ -0,0 +1,80 @@
+#include "cortexm/pc_profiler.hh"
+
+#include <fstream>
+
+#include "base/logging.hh"
+#include "cpu/base.hh"
+
+namespace gem5
+{
+
+CommittedPCProfiler::CommittedPCProfiler(const Params &p)
+    : ProbeListenerObject(p),
+      cpu(dynamic_cast<BaseCPU *>(p.manager)),
+      icache(p.icache),
+      samplePeriod(p.sample_period),
+      untilSample(p.sample_period)
+{
+    fatal_if(!cpu, "%s: the manager must be a CPU", name());
+    fatal_if(samplePeriod == 0, "%s: sample_period must not be zero",
+             name());
+}
+
+void
+CommittedPCProfiler::regProbeListeners()
+{
+    listeners.push_back(new ProbeListenerArgFunc<uint64_t>(
+        cpu->getProbeManager(), "RetiredInstsPC",
+        [this](const uint64_t &pc) { commit(pc); }));
+    if (icache) {
+        listeners.push_back(new ProbeListenerArgFunc<CacheAccessProbeArg>(
+            icache->getProbeManager(), "Miss",
+            [this](const CacheAccessProbeArg &arg) { icacheMiss(arg); }));
+    }
+}
+
+void
+CommittedPCProfiler::commit(const uint64_t &pc)
+{
+    Cycles now = cpu->curCycle();
+    uint64_t cycles = now - lastCommit;
+    lastCommit = now;
+    if (--untilSample > 0)
+        return;
+    untilSample = samplePeriod;
+    // a sampled commit stands for the samplePeriod commits around it
+    PCCounts &entry = counts[pc];
+    entry.commits += samplePeriod;
+    entry.cycles += cycles * samplePeriod;
+    if (cycles > 1)
+        entry.stallCycles += (cycles - 1) * samplePeriod;
+}
+
+void
+CommittedPCProfiler::icacheMiss(const CacheAccessProbeArg &arg)
+{
+    counts[arg.pkt->getAddr()].icacheMisses++;
+}
+
+void
+CommittedPCProfiler::resetProfile()
+{
+    counts.clear();
+    lastCommit = cpu->curCycle();
+    untilSample = samplePeriod;
+}
+
+void
+CommittedPCProfiler::dumpProfile(const std::string &file_name) const
+{
+    std::ofstream out(file_name);
+    fatal_if(!out, "%s: cannot write %s", name(), file_name);
+    out << "pc,commits,cycles,stall_cycles,icache_misses\n";
+    for (const auto &[pc, entry] : counts) {
+        out << std::hex << "0x" << pc << std::dec << ","
+            << entry.commits << "," << entry.cycles << ","
+            << entry.stallCycles << "," << entry.icacheMisses << "\n";
+    }
+}
+
+} // namespace gem5
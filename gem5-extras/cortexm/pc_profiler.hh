@@ -0,0 +1,62 @@
+#ifndef __CORTEXM_PC_PROFILER_HH__
+#define __CORTEXM_PC_PROFILER_HH__
+
+#include <cstdint>
+#include <string>
+#include <unordered_map>
+
+#include "base/types.hh"
+#include "mem/cache/base.hh"
+#include "params/CommittedPCProfiler.hh"
+#include "sim/probe/probe.hh"
+
+namespace gem5
+{
+
+class BaseCPU;
+
+/**
+ * Per-PC commit, cycle and instruction cache miss counts of a CPU, taken
+ * from its RetiredInstsPC probe point and the Miss probe point of its
+ * instruction cache. The cycles between two commits are charged to the
+ * second one, so a PC's stall cycles are the cycles its commits waited
+ * beyond one per instruction.
+ */
+class CommittedPCProfiler : public ProbeListenerObject
+{
+  private:
+    struct PCCounts
+    {
+        uint64_t commits = 0;
+        uint64_t cycles = 0;
+        uint64_t stallCycles = 0;
+        uint64_t icacheMisses = 0;
+    };
+
+    BaseCPU *cpu;
+    BaseCache *icache;
+    const unsigned samplePeriod;
+
+    std::unordered_map<Addr, PCCounts> counts;
+    /** Cycle of the last commit, or of the last reset */
+    Cycles lastCommit = Cycles(0);
+    unsigned untilSample;
+
+    void commit(const uint64_t &pc);
+    void icacheMiss(const CacheAccessProbeArg &arg);
+
+  public:
+    PARAMS(CommittedPCProfiler);
+    CommittedPCProfiler(const Params &p);
+
+    void regProbeListeners() override;
+
+    /** Forget the counts, e.g. at the start of a region */
+    void resetProfile();
+    /** Write the counts as CSV, one line per PC */
+    void dumpProfile(const std::string &file_name) const;
+};
+
+} // namespace gem5
+
+#endif // __CORTEXM_PC_PROFILER_HH__
@@ -0,0 +1,233 @@
+#include "cortexm/private_peripherals.hh"
+
+#include <cstring>
+
+#include "base/logging.hh"
+#include "base/trace.hh"
+#include "debug/CortexMPPB.hh"
+#include "mem/packet_access.hh"
+#include "sim/serialize.hh"
+
+namespace gem5
+{
+
+CortexMPrivatePeripherals::CortexMPrivatePeripherals(const Params &p)
+    : BasicPioDevice(p, 0x100000),
+      systickRefDivider(p.systick_ref_divider),
+      systickCalib(p.systick_calib)
+{
+    fatal_if(systickRefDivider == 0,
+             "%s: systick_ref_divider must not be zero", name());
+}
+
+bool
+CortexMPrivatePeripherals::cycleCounting() const
+{
+    return (demcr & DEMCR_TRCENA) && (dwtCtrl & DWT_CTRL_CYCCNTENA);
+}
+
+uint32_t
+CortexMPrivatePeripherals::cycleCount() const
+{
+    if (!cycleCounting())
+        return cyccntBase;
+    // CYCCNT wraps at 32 bits
+    return cyccntBase + static_cast<uint32_t>(curCycle() - cyccntStart);
+}
+
+void
+CortexMPrivatePeripherals::rebaseCycleCount()
+{
+    cyccntBase = cycleCount();
+    cyccntStart = curCycle();
+}
+
+uint64_t
+CortexMPrivatePeripherals::systickElapsed() const
+{
+    if (!(systCsr & SYST_CSR_ENABLE))
+        return 0;
+    uint64_t cycles = curCycle() - systStart;
+    return (systCsr & SYST_CSR_CLKSOURCE) ? cycles
+                                          : cycles / systickRefDivider;
+}
+
+uint32_t
+CortexMPrivatePeripherals::systickValue() const
+{
+    // the counter goes systBase, ..., 1, 0, RVR, ..., 1, 0, RVR, ...
+    uint64_t elapsed = systickElapsed();
+    if (elapsed <= systBase)
+        return systBase - elapsed;
+    // a reload value of zero stops the counter at zero
+    if (systRvr == 0)
+        return 0;
+    uint64_t period = uint64_t(systRvr) + 1;
+    return systRvr - (elapsed - systBase - 1) % period;
+}
+
+uint64_t
+CortexMPrivatePeripherals::systickZeros() const
+{
+    // number of times the counter went from one to zero since systStart
+    uint64_t elapsed = systickElapsed();
+    uint64_t period = uint64_t(systRvr) + 1;
+    if (systBase > 0) {
+        if (elapsed < systBase)
+            return 0;
+        return systRvr == 0 ? 1 : 1 + (elapsed - systBase) / period;
+    }
+    return systRvr == 0 ? 0 : elapsed / period;
+}
+
+void
+CortexMPrivatePeripherals::rebaseSystick()
+{
+    // keep a pending COUNTFLAG across the restart
+    if (systickZeros() > systZerosSeen)
+        systCsr |= SYST_CSR_COUNTFLAG;
+    systBase = systickValue();
+    systZerosSeen = 0;
+    systStart = curCycle();
+}
+
+uint32_t
+CortexMPrivatePeripherals::readRegister(Addr offset)
+{
+    switch (offset) {
+      case DWT_CTRL:
+        return dwtCtrl;
+      case DWT_CYCCNT:
+        return cycleCount();
+      case DEMCR:
+        return demcr;
+      case SYST_CSR: {
+        uint32_t value = systCsr;
+        uint64_t zeros = systickZeros();
+        if (zeros > systZerosSeen)
+            value |= SYST_CSR_COUNTFLAG;
+        // reading CSR clears COUNTFLAG
+        systZerosSeen = zeros;
+        systCsr &= ~SYST_CSR_COUNTFLAG;
+        return value;
+      }
+      case SYST_RVR:
+        return systRvr;
+      case SYST_CVR:
+        return systickValue();
+      case SYST_CALIB:
+        return systickCalib;
+      default:
+        return 0;
+    }
+}
+
+void
+CortexMPrivatePeripherals::writeRegister(Addr offset, uint32_t value)
+{
+    switch (offset) {
+      case DWT_CTRL:
+        rebaseCycleCount();
+        // NUMCOMP is read-only
+        dwtCtrl = DWT_CTRL_NUMCOMP | (value & ~(0xFu << 28));
+        break;
+      case DWT_CYCCNT:
+        cyccntBase = value;
+        cyccntStart = curCycle();
+        break;
+      case DEMCR:
+        rebaseCycleCount();
+        demcr = value;
+        break;
+      case DWT_LAR:
+        // the software lock is not modelled, unlocking is a no-op
+        break;
+      case SYST_CSR:
+        rebaseSystick();
+        warn_if_once(value & SYST_CSR_TICKINT,
+                     "%s: SysTick exceptions are not delivered in SE mode",
+                     name());
+        systCsr = (systCsr & SYST_CSR_COUNTFLAG) |
+                  (value & (SYST_CSR_ENABLE | SYST_CSR_TICKINT |
+                            SYST_CSR_CLKSOURCE));
+        break;
+      case SYST_RVR:
+        rebaseSystick();
+        systRvr = value & SYST_MASK;
+        break;
+      case SYST_CVR:
+        // any write clears the counter and COUNTFLAG
+        rebaseSystick();
+        systBase = 0;
+        systCsr &= ~SYST_CSR_COUNTFLAG;
+        break;
+      default:
+        break;
+    }
+}
+
+Tick
+CortexMPrivatePeripherals::read(PacketPtr pkt)
+{
+    Addr offset = pkt->getAddr() - pioAddr;
+    if (pkt->getSize() == 4) {
+        uint32_t value = readRegister(offset);
+        DPRINTF(CortexMPPB, "read  %#x = %#x\n", offset, value);
+        pkt->setLE<uint32_t>(value);
+    } else {
+        warn_once("%s: only word accesses are supported, reading zero",
+                  name());
+        std::memset(pkt->getPtr<uint8_t>(), 0, pkt->getSize());
+    }
+    pkt->makeAtomicResponse();
+    return pioDelay;
+}
+
+Tick
+CortexMPrivatePeripherals::write(PacketPtr pkt)
+{
+    Addr offset = pkt->getAddr() - pioAddr;
+    if (pkt->getSize() == 4) {
+        uint32_t value = pkt->getLE<uint32_t>();
+        DPRINTF(CortexMPPB, "write %#x = %#x\n", offset, value);
+        writeRegister(offset, value);
+    } else {
+        warn_once("%s: only word accesses are supported, ignoring write",
+                  name());
+    }
+    pkt->makeAtomicResponse();
+    return pioDelay;
+}
+
+void
+CortexMPrivatePeripherals::serialize(CheckpointOut &cp) const
+{
+    SERIALIZE_SCALAR(demcr);
+    SERIALIZE_SCALAR(dwtCtrl);
+    SERIALIZE_SCALAR(cyccntBase);
+    paramOut(cp, "cyccntStart", uint64_t(cyccntStart));
+    SERIALIZE_SCALAR(systCsr);
+    SERIALIZE_SCALAR(systRvr);
+    SERIALIZE_SCALAR(systBase);
+    paramOut(cp, "systStart", uint64_t(systStart));
+    SERIALIZE_SCALAR(systZerosSeen);
+}
+
+void
+CortexMPrivatePeripherals::unserialize(CheckpointIn &cp)
+{
+    UNSERIALIZE_SCALAR(demcr);
+    UNSERIALIZE_SCALAR(dwtCtrl);
+    UNSERIALIZE_SCALAR(cyccntBase);
+    uint64_t start;
+    paramIn(cp, "cyccntStart", start);
+    cyccntStart = Cycles(start);
+    UNSERIALIZE_SCALAR(systCsr);
+    UNSERIALIZE_SCALAR(systRvr);
+    UNSERIALIZE_SCALAR(systBase);
+    paramIn(cp, "systStart", start);
+    systStart = Cycles(start);
+    UNSERIALIZE_SCALAR(systZerosSeen);
+}
+
+} // namespace gem5
@@ -0,0 +1,85 @@
+#ifndef __CORTEXM_PRIVATE_PERIPHERALS_HH__
+#define __CORTEXM_PRIVATE_PERIPHERALS_HH__
+
+#include <cstdint>
+
+#include "dev/io_device.hh"
+#include "params/CortexMPrivatePeripherals.hh"
+
+namespace gem5
+{
+
+/**
+ * DWT cycle counter and SysTick timer of the Cortex-M4 private peripheral
+ * bus. The counters are not ticked; their values are computed from the
+ * cycle of the last write when they are read.
+ */
+class CortexMPrivatePeripherals : public BasicPioDevice
+{
+  private:
+    // register offsets from the start of the PPB
+    static constexpr Addr DWT_CTRL = 0x1000;
+    static constexpr Addr DWT_CYCCNT = 0x1004;
+    static constexpr Addr DWT_LAR = 0x1FB0;
+    static constexpr Addr SYST_CSR = 0xE010;
+    static constexpr Addr SYST_RVR = 0xE014;
+    static constexpr Addr SYST_CVR = 0xE018;
+    static constexpr Addr SYST_CALIB = 0xE01C;
+    static constexpr Addr DEMCR = 0xEDFC;
+
+    static constexpr uint32_t DEMCR_TRCENA = 1 << 24;
+    static constexpr uint32_t DWT_CTRL_CYCCNTENA = 1 << 0;
+    // four comparators, as on the Cortex-M4
+    static constexpr uint32_t DWT_CTRL_NUMCOMP = 4u << 28;
+    static constexpr uint32_t SYST_CSR_ENABLE = 1 << 0;
+    static constexpr uint32_t SYST_CSR_TICKINT = 1 << 1;
+    static constexpr uint32_t SYST_CSR_CLKSOURCE = 1 << 2;
+    static constexpr uint32_t SYST_CSR_COUNTFLAG = 1 << 16;
+    static constexpr uint32_t SYST_MASK = 0xFFFFFF;
+
+    const unsigned systickRefDivider;
+    const uint32_t systickCalib;
+
+    uint32_t demcr = 0;
+    uint32_t dwtCtrl = DWT_CTRL_NUMCOMP;
+    /** CYCCNT at cyccntStart */
+    uint32_t cyccntBase = 0;
+    Cycles cyccntStart = Cycles(0);
+
+    uint32_t systCsr = 0;
+    uint32_t systRvr = 0;
+    /** Counter value at systStart */
+    uint32_t systBase = 0;
+    Cycles systStart = Cycles(0);
+    /** Number of times the counter reached zero when CSR was last read */
+    uint64_t systZerosSeen = 0;
+
+    bool cycleCounting() const;
+    uint32_t cycleCount() const;
+    /** Restart the cycle count from its current value */
+    void rebaseCycleCount();
+
+    /** SysTick clock ticks since systStart */
+    uint64_t systickElapsed() const;
+    uint32_t systickValue() const;
+    uint64_t systickZeros() const;
+    /** Restart the SysTick count from its current value */
+    void rebaseSystick();
+
+    uint32_t readRegister(Addr offset);
+    void writeRegister(Addr offset, uint32_t value);
+
+  public:
+    PARAMS(CortexMPrivatePeripherals);
+    CortexMPrivatePeripherals(const Params &p);
+
+    Tick read(PacketPtr pkt) override;
+    Tick write(PacketPtr pkt) override;
+
+    void serialize(CheckpointOut &cp) const override;
+    void unserialize(CheckpointIn &cp) override;
+};
+
+} // namespace gem5
+
+#endif // __CORTEXM_PRIVATE_PERIPHERALS_HH__
@@ -0,0 +1,44 @@
+#include "cortexm/static_bp.hh"
+
+namespace gem5
+{
+
+namespace branch_prediction
+{
+
+CortexMStaticBP::CortexMStaticBP(const CortexMStaticBPParams &p)
+    : BPredUnit(p)
+{
+}
+
+bool
+CortexMStaticBP::lookup(ThreadID tid, Addr pc, void * &bp_history)
+{
+    bp_history = nullptr;
+    return false;
+}
+
+void
+CortexMStaticBP::updateHistories(ThreadID tid, Addr pc, bool uncond,
+                                 bool taken, Addr target,
+                                 void * &bp_history)
+{
+    bp_history = nullptr;
+}
+
+void
+CortexMStaticBP::squash(ThreadID tid, void * &bp_history)
+{
+    bp_history = nullptr;
+}
+
+void
+CortexMStaticBP::update(ThreadID tid, Addr pc, bool taken,
+                        void * &bp_history, bool squashed,
+                        const StaticInstPtr &inst, Addr target)
+{
+    bp_history = nullptr;
+}
+
+} // namespace branch_prediction
+} // namespace gem5
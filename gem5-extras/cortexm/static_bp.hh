@@ -0,0 +1,34 @@
+#ifndef __CORTEXM_STATIC_BP_HH__
+#define __CORTEXM_STATIC_BP_HH__
+
+#include "cpu/pred/bpred_unit.hh"
+#include "params/CortexMStaticBP.hh"
+
+namespace gem5
+{
+
+namespace branch_prediction
+{
+
+/**
+ * Static not-taken direction predictor. It keeps no history, so there is
+ * nothing to update or squash.
+ */
+class CortexMStaticBP : public BPredUnit
+{
+  public:
+    CortexMStaticBP(const CortexMStaticBPParams &p);
+
+    bool lookup(ThreadID tid, Addr pc, void * &bp_history) override;
+    void updateHistories(ThreadID tid, Addr pc, bool uncond, bool taken,
+                         Addr target, void * &bp_history) override;
+    void squash(ThreadID tid, void * &bp_history) override;
+    void update(ThreadID tid, Addr pc, bool taken, void * &bp_history,
+                bool squashed, const StaticInstPtr &inst,
+                Addr target) override;
+};
+
+} // namespace branch_prediction
+} // namespace gem5
+
+#endif // __CORTEXM_STATIC_BP_HH__
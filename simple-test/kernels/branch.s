@@ -0,0 +1,29 @@
+// compare and not-taken branch pairs (2 cycles) and taken branches to the
+// next instruction (3 cycles):
+// 64 iterations x (16 x 2 + 16 x 3 + 4 loop) = 5376 cycles
+    .syntax unified
+    .thumb
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    movs    r5, #1
+    movs    r6, #2
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 16
+    cmp     r5, r6
+    beq     2f
+2:
+    .endr
+    .rept 16
+    b       3f
+3:
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
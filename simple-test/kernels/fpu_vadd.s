@@ -0,0 +1,23 @@
+// dependent single precision adds, 1 cycle each:
+// 64 iterations x (16 vadds + 4 loop) = 1280 cycles
+    .syntax unified
+    .thumb
+    .fpu fpv4-sp-d16
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    vmov.f32 s0, #1.0
+    vmov.f32 s1, #0.5
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 16
+    vadd.f32 s0, s0, s1
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
@@ -0,0 +1,23 @@
+// dependent single precision divides, 14 cycles each:
+// 64 iterations x (8 vdivs x 14 + 4 loop) = 7424 cycles
+    .syntax unified
+    .thumb
+    .fpu fpv4-sp-d16
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    vmov.f32 s0, #2.0
+    vmov.f32 s1, #1.0
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 8
+    vdiv.f32 s0, s0, s1
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
@@ -0,0 +1,24 @@
+// multiply-accumulates into one accumulator, 3 cycles each:
+// 64 iterations x (16 vmlas x 3 + 4 loop) = 3328 cycles
+    .syntax unified
+    .thumb
+    .fpu fpv4-sp-d16
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    vmov.f32 s0, #1.0
+    vmov.f32 s1, #0.5
+    vmov.f32 s2, #0.25
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 16
+    vmla.f32 s0, s1, s2
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
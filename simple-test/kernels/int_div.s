@@ -0,0 +1,23 @@
+// unsigned divides with a full 32-bit quotient, 12 cycles each as the
+// division does not terminate early:
+// 64 iterations x (8 udivs x 12 + 4 loop) = 6400 cycles
+    .syntax unified
+    .thumb
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    mvn     r5, #0          // 0xffffffff
+    movs    r6, #1
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 8
+    udiv    r7, r5, r6
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
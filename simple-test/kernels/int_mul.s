@@ -0,0 +1,22 @@
+// dependent 32-bit multiplies, 1 cycle each:
+// 64 iterations x (32 muls + 4 loop) = 2304 cycles
+    .syntax unified
+    .thumb
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    movs    r5, #1
+    movs    r6, #3
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .rept 32
+    mul     r5, r5, r6
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit
@@ -0,0 +1,32 @@
+// back-to-back word loads and stores to SRAM1. Neighbouring loads (and
+// stores) pipeline their address and data phases, so N of them take N + 1
+// cycles:
+// 64 iterations x (16 ldrs + 1 + 16 strs + 1 + 4 loop) = 2432 cycles
+    .syntax unified
+    .thumb
+    .include "m5ops.inc"
+    .text
+    .p2align 2
+    .globl _start
+    .type _start,%function
+_start:
+    movw    r5, #:lower16:__sram1_start
+    movt    r5, #:upper16:__sram1_start
+    movs    r6, #0
+    work_begin
+    movs    r4, #ITERATIONS
+1:
+    .set offset, 0
+    .rept 16
+    ldr     r7, [r5, #offset]
+    .set offset, offset + 4
+    .endr
+    .set offset, 0
+    .rept 16
+    str     r6, [r5, #offset]
+    .set offset, offset + 4
+    .endr
+    subs    r4, r4, #1
+    bne     1b
+    work_end
+    exit